@@ -74,6 +74,42 @@ class Animal:
         self.already_moved = False
         self.loc = None
 
+    @classmethod
+    def from_state(cls, age, weight, fitness=None):
+        """
+        Creates an animal directly from stored state, without validating the values.
+
+        Parameters
+        ----------
+        age : int
+            The age of the animal
+        weight : float
+            The weight of the animal
+        fitness : float
+            The cached fitness of the animal, None if not yet computed.
+
+        Returns
+        -------
+            Animal instance
+        """
+        animal = cls.__new__(cls)
+        animal.weight = weight
+        animal.age = age
+        animal._fitness = fitness
+        animal.already_moved = False
+        animal.loc = None
+        return animal
+
+    def copy(self):
+        """
+        Creates an independent copy of the animal.
+
+        Returns
+        -------
+            Animal instance
+        """
+        return self.from_state(self.age, self.weight, self._fitness)
+
     def _update_fitness(self):
         if self.weight <= 0:
             self._fitness = 0
@@ -155,6 +191,15 @@ class Animal:
         self.weight = self.weight - self.eta * self.weight
         self._update_fitness()
 
+    def age_and_lose_weight(self):
+        """
+        Animal ages by one year and loses weight, see :meth:`ages` and :meth:`weight_loss`.
+        The fitness is only recomputed once.
+        """
+        self.age += 1
+        self.weight = self.weight - self.eta * self.weight
+        self._update_fitness()
+
     def death(self):
         """
         Decide whether animal dies. An animal dies for certain if  weight: :math:`{w =0}` or
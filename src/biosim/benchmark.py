@@ -0,0 +1,340 @@
+"""
+:mod:`biosim.benchmark` measures how long the object engine takes to simulate a year.
+
+A benchmark case is a square island of a given size, with a border of water and lowland
+everywhere else, and the same number of herbivores in every land cell. A given fraction of
+herbivores is added as carnivores. For each case, the time of :meth:`biosim.island.Island.season`
+and the time of each phase of a year are measured:
+
+* ``feeding_herbs``, ``feeding_carnivores``, ``mating``, ``aging``, ``losing_weight`` and
+  ``dying``, each run for all cells in turn, and
+* ``handle_migration``, run for the whole island.
+
+Times are per simulated year, averaged over the years of a run; the fastest of several runs is
+reported. Results are written as JSON and compared with a baseline. The suite only needs the
+standard library and NumPy, and is run from the command line::
+
+    python -m biosim.benchmark --preset quick
+    python -m biosim.benchmark --preset quick --output results.json --no-baseline
+    python -m biosim.benchmark --preset quick --baseline results.json --threshold 0.2
+
+The first command compares with the baseline of the preset stored with the package, see
+:func:`baseline_path`, the last one with results saved before on the same machine. Both exit
+with status 1 if any time is more than 20 % above the baseline. Times depend on the machine, so
+the stored baseline is a reference for the machine it was recorded on; record a new one with
+``--output`` when moving to a different machine.
+
+The ``quick`` and ``full`` presets run in seconds and minutes. The ``large`` preset times maps
+with hundreds of thousands of cells and needs several GiB of memory, so it only runs when
+selected explicitly.
+"""
+
+import argparse
+import itertools
+import json
+import os
+import platform
+import random
+import sys
+import time
+
+import numpy as np
+
+from .island import Island
+from . import state
+
+PHASES = ('feeding_herbs', 'feeding_carnivores', 'mating', 'handle_migration', 'aging',
+          'losing_weight', 'dying')
+
+PRESETS = {
+    'quick': {'sizes': [3, 10, 25], 'densities': [5, 20], 'ratios': [0.0, 0.2], 'years': 3},
+    'full': {'sizes': [3, 10, 50, 100], 'densities': [1, 10, 50], 'ratios': [0.0, 0.1, 0.5],
+             'years': 3},
+    'large': {'sizes': [200, 500], 'densities': [1, 5], 'ratios': [0.1], 'years': 1},
+}
+"""Matrices of map sizes, herbivores per land cell and carnivores per herbivore."""
+
+_DEFAULT_THRESHOLD = 0.2
+
+_DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data')
+
+
+def baseline_path(preset):
+    """
+    Path of the baseline stored with the package for a preset.
+
+    Parameters
+    ----------
+    preset : str
+        Name of a preset in :data:`PRESETS`.
+
+    Returns
+    -------
+    path : str or None
+        Path of the JSON file, None if no baseline is stored for the preset.
+    """
+    path = os.path.join(_DATA_DIR, f'benchmark_{preset}.json')
+    return path if os.path.exists(path) else None
+
+
+def square_map(size):
+    """
+    Builds a square island of lowland surrounded by water.
+
+    Parameters
+    ----------
+    size : int
+        Number of rows and columns, including the water border. At least 3.
+
+    Returns
+    -------
+    island_map : str
+        Map of the island.
+    """
+    if size < 3:
+        raise ValueError('size must be at least 3')
+    water = 'W' * size
+    land = 'W' + 'L' * (size - 2) + 'W'
+    return '\n'.join([water] + [land] * (size - 2) + [water])
+
+
+def populate(size, density, ratio):
+    """
+    Builds the initial population of a benchmark case.
+
+    Parameters
+    ----------
+    size : int
+        Number of rows and columns of the island, see :func:`square_map`.
+    density : int
+        Number of herbivores in every land cell.
+    ratio : float
+        Number of carnivores per herbivore.
+
+    Returns
+    -------
+    ini_pop : list of dictionaries
+        The population, with age 5 and weight 20 for all animals.
+    """
+    herbs = [{'species': 'Herbivore', 'age': 5, 'weight': 20}] * density
+    carns = [{'species': 'Carnivore', 'age': 5, 'weight': 20}] * int(round(density * ratio))
+    return [{'loc': (row, col), 'pop': herbs + carns}
+            for row in range(2, size) for col in range(2, size)]
+
+
+def case_name(size, density, ratio):
+    """Name of a benchmark case, used as key when comparing results."""
+    return f'map={size}x{size},density={density},ratio={ratio:g}'
+
+
+def _phase_calls(isle):
+    """Returns a function running each phase for the whole island."""
+    cells = [cell for cell in isle.isle_map.values() if cell.habitable]
+
+    def for_cells(method):
+        def run():
+            for cell in cells:
+                getattr(cell, method)()
+        return run
+
+    calls = {phase: for_cells(phase) for phase in PHASES if phase != 'handle_migration'}
+    calls['handle_migration'] = isle.handle_migration
+    return calls
+
+
+def time_case(size, density, ratio, years=3, repeats=3, seed=1):
+    """
+    Times one benchmark case.
+
+    Parameters
+    ----------
+    size : int
+        Number of rows and columns of the island, see :func:`square_map`.
+    density : int
+        Number of herbivores in every land cell.
+    ratio : float
+        Number of carnivores per herbivore.
+    years : int
+        Number of years simulated per run.
+    repeats : int
+        Number of runs, the fastest is reported.
+    seed : int
+        Random number seed, the same for every run.
+
+    Returns
+    -------
+    result : dict
+        Dictionary with the case parameters, the number of animals at the start, and the time
+        per year in seconds of 'season' and of each phase in 'phases'.
+    """
+    island_map = square_map(size)
+    ini_pop = populate(size, density, ratio)
+
+    season_times = []
+    phase_times = {phase: [] for phase in PHASES}
+    with state.preserved_params(state.default_params()):
+        for _ in range(repeats):
+            random.seed(seed)
+            isle = Island(island_map, ini_pop)
+            start = time.perf_counter()
+            for _ in range(years):
+                isle.season()
+            season_times.append((time.perf_counter() - start) / years)
+
+            random.seed(seed)
+            isle = Island(island_map, ini_pop)
+            calls = _phase_calls(isle)
+            elapsed = dict.fromkeys(PHASES, 0.0)
+            for _ in range(years):
+                for phase in PHASES:
+                    start = time.perf_counter()
+                    calls[phase]()
+                    elapsed[phase] += time.perf_counter() - start
+            for phase in PHASES:
+                phase_times[phase].append(elapsed[phase] / years)
+
+    herbs = density * (size - 2) ** 2
+    return {'name': case_name(size, density, ratio), 'size': size, 'density': density,
+            'ratio': ratio, 'herbivores': herbs,
+            'carnivores': int(round(density * ratio)) * (size - 2) ** 2,
+            'years': years, 'repeats': repeats,
+            'season': min(season_times),
+            'phases': {phase: min(times) for phase, times in phase_times.items()}}
+
+
+def run_suite(sizes, densities, ratios, years=3, repeats=3, seed=1, progress=None):
+    """
+    Times all combinations of map sizes, densities and ratios.
+
+    Parameters
+    ----------
+    sizes, densities, ratios : list
+        Values of the case parameters, see :func:`time_case`.
+    years, repeats, seed
+        See :func:`time_case`.
+    progress : callable
+        If given, called with the result of each case when it is finished.
+
+    Returns
+    -------
+    results : dict
+        Dictionary with an entry 'machine' describing the platform and an entry 'cases' with
+        the list of results of :func:`time_case`.
+    """
+    cases = []
+    for size, density, ratio in itertools.product(sizes, densities, ratios):
+        cases.append(time_case(size, density, ratio, years, repeats, seed))
+        if progress is not None:
+            progress(cases[-1])
+    return {'machine': {'python': platform.python_version(), 'numpy': np.__version__,
+                        'platform': platform.platform(), 'processor': platform.processor(),
+                        'time': time.strftime('%Y-%m-%dT%H:%M:%S')},
+            'cases': cases}
+
+
+def compare(results, baseline, threshold=_DEFAULT_THRESHOLD, phase_threshold=None):
+    """
+    Compares benchmark results with a baseline.
+
+    Parameters
+    ----------
+    results, baseline : dict
+        Results of :func:`run_suite`. Only cases present in both are compared.
+    threshold : float
+        A season time more than this fraction above the baseline is a regression.
+    phase_threshold : float
+        The same for phase times, threshold if None. Phase times are shorter and noisier, so a
+        larger threshold may be useful.
+
+    Returns
+    -------
+    regressions : list
+        One dictionary per regression with the keys 'name', 'metric', 'baseline', 'current'
+        and 'ratio'.
+    """
+    if phase_threshold is None:
+        phase_threshold = threshold
+    reference = {case['name']: case for case in baseline['cases']}
+    regressions = []
+    for case in results['cases']:
+        if case['name'] not in reference:
+            continue
+        old = reference[case['name']]
+        metrics = [('season', old['season'], case['season'], threshold)]
+        metrics += [(phase, old['phases'][phase], case['phases'][phase], phase_threshold)
+                    for phase in PHASES if phase in old['phases']]
+        for metric, before, after, limit in metrics:
+            if before > 0 and after > (1 + limit) * before:
+                regressions.append({'name': case['name'], 'metric': metric, 'baseline': before,
+                                    'current': after, 'ratio': after / before})
+    return regressions
+
+
+def main(argv=None):
+    """
+    Runs the benchmark suite from the command line.
+
+    Parameters
+    ----------
+    argv : list
+        Command line arguments, sys.argv[1:] if None.
+
+    Returns
+    -------
+    status : int
+        1 if a regression was found, 0 otherwise.
+    """
+    parser = argparse.ArgumentParser(prog='python -m biosim.benchmark',
+                                     description='Time the phases of a BioSim year.')
+    parser.add_argument('--preset', choices=sorted(PRESETS), default='quick')
+    parser.add_argument('--sizes', type=int, nargs='+', help='map sizes, e.g. 3 10 100')
+    parser.add_argument('--densities', type=int, nargs='+', help='herbivores per land cell')
+    parser.add_argument('--ratios', type=float, nargs='+', help='carnivores per herbivore')
+    parser.add_argument('--years', type=int, help='years simulated per run')
+    parser.add_argument('--repeats', type=int, default=3, help='runs per case, fastest is used')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--output', help='write results to this JSON file')
+    parser.add_argument('--baseline',
+                        help='compare with results in this JSON file (default: the baseline '
+                             'stored for the preset)')
+    parser.add_argument('--no-baseline', action='store_true', help='do not compare')
+    parser.add_argument('--threshold', type=float, default=_DEFAULT_THRESHOLD,
+                        help='allowed relative slowdown of the season time')
+    parser.add_argument('--phase-threshold', type=float,
+                        help='allowed relative slowdown of phase times (default: --threshold)')
+    args = parser.parse_args(argv)
+
+    preset = PRESETS[args.preset]
+    matrix = {key: getattr(args, key) or preset[key]
+              for key in ('sizes', 'densities', 'ratios', 'years')}
+
+    def progress(case):
+        print(f'{case["name"]:<40} season {1000 * case["season"]:10.2f} ms  '
+              + '  '.join(f'{phase} {1000 * seconds:.2f}'
+                          for phase, seconds in case['phases'].items()))
+
+    results = run_suite(matrix['sizes'], matrix['densities'], matrix['ratios'],
+                        matrix['years'], args.repeats, args.seed, progress)
+    if args.output is not None:
+        with open(args.output, 'w') as output:
+            json.dump(results, output, indent=2)
+
+    if args.no_baseline:
+        return 0
+    if args.baseline is None:
+        args.baseline = baseline_path(args.preset)
+        if args.baseline is None:
+            print(f'No baseline stored for preset {args.preset}')
+            return 0
+    with open(args.baseline) as baseline_file:
+        baseline = json.load(baseline_file)
+    regressions = compare(results, baseline, args.threshold, args.phase_threshold)
+    for regression in regressions:
+        print(f'REGRESSION {regression["name"]} {regression["metric"]}: '
+              f'{1000 * regression["baseline"]:.2f} ms -> {1000 * regression["current"]:.2f} ms '
+              f'({regression["ratio"]:.2f}x)')
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
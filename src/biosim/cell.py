@@ -1,6 +1,10 @@
 from .animal import Herbivore, Carnivore
 import random
 
+EVENTS = ('herb_births', 'carn_births', 'herb_deaths', 'carn_deaths', 'kills', 'unfed_herbs',
+          'migrations', 'rejected_migrations')
+"""Names of the demographic events counted by every cell, see :meth:`Cell.take_events`."""
+
 
 class Cell:
     """
@@ -15,6 +19,8 @@ class Cell:
 
     f_max = 0.0
     habitable = True
+    # True while the animals are simulated as arrays, see biosim.hybrid
+    array_mode = False
 
     default_params = {'f_max': f_max}
 
@@ -56,6 +62,7 @@ class Cell:
                     self.carn_pop.append(Carnivore(age=animal['age'], weight=animal['weight']))
         self.herb_migrating = []
         self.carn_migrating = []
+        self.events = dict.fromkeys(EVENTS, 0)
 
     def aging(self):
         """All animals in the populations age by one year. """
@@ -81,6 +88,90 @@ class Cell:
 
         return herb_migrating, carn_migrating
 
+    def emigrate(self, loc, habitable):
+        """
+        Decides which animals leave the cell and where they go, and removes them from the cell.
+        Animals that want to move to a cell that is not habitable stay.
+
+        Parameters
+        ----------
+        loc : tuple
+            Location of the cell
+        habitable : set
+            Locations of all habitable cells
+
+        Returns
+        -------
+        emigrants : dict
+            Dictionary mapping target locations to lists of herbivores and carnivores.
+        """
+        row, col = loc
+        neighbours = [(row, col - 1), (row, col + 1), (row - 1, col), (row + 1, col)]
+        herb_migr, carn_migr = self.migrating()
+        emigrants = {}
+        moved = 0
+        for animals, index in ((herb_migr, 0), (carn_migr, 1)):
+            for animal in animals:
+                new_location = random.choice(neighbours)
+                if new_location in habitable:
+                    emigrants.setdefault(new_location, ([], []))[index].append(animal)
+                    moved += 1
+        self.count_migrations(moved, len(herb_migr) + len(carn_migr) - moved)
+
+        if emigrants:
+            leaving = {id(animal) for herbs, carns in emigrants.values()
+                       for animal in herbs + carns}
+            self.herb_pop = [herb for herb in self.herb_pop if id(herb) not in leaving]
+            self.carn_pop = [carn for carn in self.carn_pop if id(carn) not in leaving]
+        return emigrants
+
+    def count_migrations(self, moved, rejected):
+        """
+        Counts animals that have decided to migrate.
+
+        Parameters
+        ----------
+        moved : int
+            Number of animals leaving the cell.
+        rejected : int
+            Number of animals staying because the cell they chose is not habitable.
+        """
+        self.events['migrations'] += moved
+        self.events['rejected_migrations'] += rejected
+
+    def take_events(self):
+        """
+        Returns the events counted since the last call and starts counting from zero.
+
+        Births and deaths are counted per species. Deaths include herbivores killed by
+        carnivores, which are counted as kills as well. Herbivores that find less fodder than
+        they want to eat get none and are counted as unfed. Cells of an island share their
+        counters, see :func:`biosim.island.share_events`, so the events of all of them are
+        returned.
+
+        Returns
+        -------
+        events : dict
+            Dictionary mapping the names in :data:`EVENTS` to numbers of events.
+        """
+        events = dict(self.events)
+        self.events.update(dict.fromkeys(EVENTS, 0))
+        return events
+
+    def immigrate(self, herbs=(), carns=()):
+        """
+        Adds animals arriving from other cells.
+
+        Parameters
+        ----------
+        herbs : list
+            List of herbivore objects arriving
+        carns : list
+            List of carnivore objects arriving
+        """
+        self.herb_pop.extend(herbs)
+        self.carn_pop.extend(carns)
+
     def move_to(self, herb_list=None, carn_list=None):
         """
         Animals moving to cell.
@@ -145,13 +236,20 @@ class Cell:
             n = len(self.carn_pop)
             new_carns = [nb for carn in self.carn_pop if (nb := carn.birth(n))]
             self.carn_pop.extend(new_carns)
+            self.events['herb_births'] += len(new_herbs)
+            self.events['carn_births'] += len(new_carns)
 
     def feeding_herbs(self):
         """The herbivores in the cell feed in order of fitness. The fittest animals eat first."""
         if self.habitable:
             self.herb_pop.sort(key=lambda h: h.fitness, reverse=True)
-            ([(ix, herb.feeds_herb(self.f_max - herb.F * ix)) for ix, herb in
-              enumerate(self.herb_pop)])
+            unfed = 0
+            for ix, herb in enumerate(self.herb_pop):
+                food_available = self.f_max - herb.F * ix
+                if food_available < herb.F:
+                    unfed += 1
+                herb.feeds_herb(food_available)
+            self.events['unfed_herbs'] += unfed
 
     def feeding_carnivores(self):
         """
@@ -163,15 +261,19 @@ class Cell:
         random.shuffle(self.carn_pop)
         self.herb_pop.sort(key=lambda h: h.fitness)
         if self.habitable:
+            kills = 0
             for carn in self.carn_pop:
                 food_eaten = 0
                 for herb in self.herb_pop:
-                    if food_eaten < carn.F:
-                        ini_weight = carn.weight
-                        carn.feeds_carn(herb.fitness, min(herb.weight, Carnivore.F - food_eaten))
-                        if carn.weight > ini_weight:
-                            food_eaten += herb.weight
-                            herb.weight = 0
+                    if food_eaten >= carn.F:
+                        break
+                    ini_weight = carn.weight
+                    carn.feeds_carn(herb.fitness, min(herb.weight, Carnivore.F - food_eaten))
+                    if carn.weight > ini_weight:
+                        food_eaten += herb.weight
+                        herb.weight = 0
+                        kills += 1
+            self.events['kills'] += kills
 
     def losing_weight(self):
         """The animals in the populations lose weight."""
@@ -181,11 +283,25 @@ class Cell:
             for carn in self.carn_pop:
                 carn.weight_loss()
 
+    def aging_and_losing_weight(self):
+        """
+        All animals age by one year and lose weight. Gives the same result as :meth:`aging`
+        followed by :meth:`losing_weight`, but computes the fitness of each animal only once.
+        """
+        if self.habitable:
+            for herb in self.herb_pop:
+                herb.age_and_lose_weight()
+            for carn in self.carn_pop:
+                carn.age_and_lose_weight()
+
     def dying(self):
         """ The animals in the populations die with given probabilities."""
         if self.habitable:
+            herbs, carns = len(self.herb_pop), len(self.carn_pop)
             self.herb_pop = [herb for herb in self.herb_pop if herb.death() is False]
             self.carn_pop = [car for car in self.carn_pop if car.death() is False]
+            self.events['herb_deaths'] += herbs - len(self.herb_pop)
+            self.events['carn_deaths'] += carns - len(self.carn_pop)
 
     def herb_count(self):
         """
@@ -209,6 +325,18 @@ class Cell:
         """
         return len(self.carn_pop)
 
+    def copy_pop(self, other):
+        """
+        Replaces the populations by copies of the populations of another cell.
+
+        Parameters
+        ----------
+        other : instance
+            Cell instance to copy the animals from.
+        """
+        self.herb_pop = [herb.copy() for herb in other.herb_pop]
+        self.carn_pop = [carn.copy() for carn in other.carn_pop]
+
     def add_pop(self, pop=None):
         """
         Adds additional populations to the cell.
@@ -256,7 +384,7 @@ class Desert(Cell):
     default_params = {'f_max': f_max}
 
     def feeding_herbs(self):
-        pass
+        self.events['unfed_herbs'] += len(self.herb_pop)
 
 
 class Water(Cell):
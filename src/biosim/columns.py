@@ -0,0 +1,159 @@
+"""
+:mod:`biosim.columns` stores animal properties in arrays that grow and shrink in place.
+
+A :class:`Columns` instance holds named arrays of equal length, one element per animal, e.g.
+``age`` and ``weight``. Each array is a view of the first elements of a larger buffer, so:
+
+* appending animals copies only the new animals, unless the buffers are full. Full buffers are
+  replaced by buffers of twice the size, so each animal is copied a constant number of times on
+  average,
+* removing animals moves the remaining animals within the buffers, either keeping their order
+  (:meth:`Columns.keep`) or filling the gaps with the last animals (:meth:`Columns.swap_remove`),
+  which only moves as many animals as are removed,
+* buffers are halved when they are less than a quarter full.
+
+The arrays are attributes named after the columns, and must be modified in place, e.g.
+``herd.age += 1`` or ``herd.weight[index] = 0``. Assigning a new array to an attribute does not
+change the stored values. :class:`biosim.hybrid.Herd` and the populations of
+:class:`biosim.vectorized.ReplicateIsland` are column stores.
+"""
+
+import copy
+
+import numpy as np
+
+_MIN_CAPACITY = 8
+
+
+class Columns:
+    """Named arrays of equal length with room to grow."""
+
+    def __init__(self, **arrays):
+        """
+        Parameters
+        ----------
+        arrays : ndarray
+            Initial values of each column, all of the same length. Copied.
+
+        Raises
+        ------
+        ValueError
+            If the arrays differ in length.
+        """
+        sizes = {len(values) for values in arrays.values()}
+        if len(sizes) > 1:
+            raise ValueError('All columns must have the same length')
+        self._size = sizes.pop() if sizes else 0
+        self._buffers = {}
+        for name, values in arrays.items():
+            values = np.asarray(values)
+            buffer = np.empty(max(self._size, _MIN_CAPACITY), dtype=values.dtype)
+            buffer[:self._size] = values
+            self._buffers[name] = buffer
+        self._refresh()
+
+    def _refresh(self):
+        """Points the column attributes to the used part of the buffers."""
+        for name, buffer in self._buffers.items():
+            setattr(self, name, buffer[:self._size])
+
+    def _resize(self, capacity):
+        """Moves the columns to buffers of the given capacity."""
+        for name, buffer in self._buffers.items():
+            resized = np.empty(capacity, dtype=buffer.dtype)
+            resized[:self._size] = buffer[:self._size]
+            self._buffers[name] = resized
+
+    def __len__(self):
+        return self._size
+
+    @property
+    def capacity(self):
+        """Number of elements the buffers can hold."""
+        return len(next(iter(self._buffers.values()))) if self._buffers else 0
+
+    def append(self, **arrays):
+        """
+        Appends elements at the end.
+
+        Parameters
+        ----------
+        arrays : ndarray
+            Values of every column for the new elements, all of the same length.
+        """
+        num = len(next(iter(arrays.values())))
+        if not num:
+            return
+        size = self._size + num
+        if size > self.capacity:
+            self._resize(max(size, 2 * self.capacity))
+        for name, buffer in self._buffers.items():
+            buffer[self._size:size] = arrays[name]
+        self._size = size
+        self._refresh()
+
+    def extend(self, other):
+        """Appends the elements of another column store with the same columns."""
+        self.append(**{name: getattr(other, name) for name in self._buffers})
+
+    def _shrink(self):
+        """Halves the buffers while they are less than a quarter full."""
+        capacity = self.capacity
+        while capacity > _MIN_CAPACITY and 4 * self._size < capacity:
+            capacity //= 2
+        if capacity < self.capacity:
+            self._resize(capacity)
+
+    def keep(self, mask):
+        """
+        Keeps the elements selected by mask, in their order.
+
+        Parameters
+        ----------
+        mask : ndarray
+            Boolean array with one element per element of the columns.
+        """
+        size = int(np.count_nonzero(mask))
+        if size < self._size:
+            for buffer in self._buffers.values():
+                buffer[:size] = buffer[:self._size][mask]
+            self._size = size
+            self._shrink()
+        self._refresh()
+
+    def swap_remove(self, index):
+        """
+        Removes elements, moving the last elements into the gaps. The order of the remaining
+        elements changes, but only as many elements are moved as are removed.
+
+        Parameters
+        ----------
+        index : ndarray
+            Distinct indices of the elements to remove.
+        """
+        index = np.asarray(index, dtype=np.int64)
+        if not len(index):
+            return
+        size = self._size - len(index)
+        removed = np.zeros(len(index), dtype=bool)
+        removed[index[index >= size] - size] = True
+        gaps = np.sort(index[index < size])
+        movers = size + np.flatnonzero(~removed)
+        for buffer in self._buffers.values():
+            buffer[gaps] = buffer[movers]
+        self._size = size
+        self._shrink()
+        self._refresh()
+
+    def take(self, index):
+        """
+        Returns a copy holding the selected elements, with all other attributes shared.
+
+        Parameters
+        ----------
+        index : ndarray
+            Boolean mask or integer indices of the elements.
+        """
+        taken = copy.copy(self)
+        Columns.__init__(taken, **{name: getattr(self, name)[index] for name in self._buffers})
+        return taken
@@ -0,0 +1,185 @@
+"""
+:mod:`biosim.ensemble` runs many replicates of one simulation with different seeds.
+
+A simulation is described by a configuration dictionary, e.g.::
+
+    config = {'island_map': geogr,
+              'ini_pop': ini_herbs,
+              'animal_params': {'Carnivore': {'DeltaPhiMax': 9.0}},
+              'landscape_params': {'L': {'f_max': 700}},
+              'stages': [{'num_years': 50},
+                         {'population': ini_carns, 'num_years': 251}]}
+
+Each stage optionally adds a population and then simulates a number of years. Instead of
+``stages``, a single ``num_years`` entry may be given. Parameters not given in the configuration
+take their default values, independently of the parameters set in the calling process, which
+are left unchanged.
+
+Replicates run without graphics in a pool of worker processes. Their seeds are derived from one
+master seed with :class:`numpy.random.SeedSequence`, so an ensemble is reproducible and does not
+depend on the number of workers.
+"""
+
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+
+from .simulation import BioSim
+from . import state
+
+
+def derive_seeds(master_seed, num_replicates):
+    """
+    Derives independent seeds for replicates from a master seed.
+
+    Parameters
+    ----------
+    master_seed : int
+        Seed the replicate seeds are derived from.
+    num_replicates : int
+        Number of seeds.
+
+    Returns
+    -------
+    seeds : list
+        List of integer seeds.
+    """
+    children = np.random.SeedSequence(master_seed).spawn(num_replicates)
+    return [int(child.generate_state(1, np.uint64)[0]) for child in children]
+
+
+def _stages(config):
+    """Returns the list of stages of a configuration."""
+    if 'stages' in config:
+        return config['stages']
+    return [{'num_years': config['num_years']}]
+
+
+def make_sim(config, seed, **kwargs):
+    """
+    Creates a simulation from a configuration. The simulation keeps the parameters of the
+    configuration as its own, see :class:`biosim.simulation.BioSim`, and the parameters of the
+    classes are left unchanged.
+
+    Parameters
+    ----------
+    config : dict
+        Simulation configuration, see module documentation.
+    seed : int
+        Random number seed
+    kwargs
+        Further arguments passed on to BioSim, graphics are disabled unless vis_years is given.
+
+    Returns
+    -------
+        BioSim instance
+    """
+    kwargs.setdefault('vis_years', 0)
+    params = state.config_params(config)
+    with state.preserved_params(params):
+        sim = BioSim(config['island_map'], config.get('ini_pop', []), seed=seed, **kwargs)
+        for species in ('Herbivore', 'Carnivore'):
+            sim.set_animal_parameters(species, params[species])
+        for landscape in state.LANDSCAPES:
+            sim.set_landscape_parameters(landscape, params[landscape])
+    return sim
+
+
+def run_replicate(config, seed):
+    """
+    Runs one replicate and records the number of animals per species every year.
+
+    Parameters
+    ----------
+    config : dict
+        Simulation configuration, see module documentation.
+    seed : int
+        Random number seed
+
+    Returns
+    -------
+    counts : ndarray
+        Integer array of shape (num_years + 1, 2) with the number of herbivores and carnivores
+        at the start and after each year.
+    """
+    with state.preserved_params():
+        sim = make_sim(config, seed)
+        counts = [(sim.isle.total_herb_count(), sim.isle.total_carn_count())]
+        for stage in _stages(config):
+            if stage.get('population'):
+                sim.add_population(stage['population'])
+            for _ in range(stage['num_years']):
+                sim.simulate(1)
+                counts.append((sim.isle.total_herb_count(), sim.isle.total_carn_count()))
+    return np.array(counts, dtype=np.int64)
+
+
+def imap(config, seeds, workers=None):
+    """
+    Runs replicates and yields their results as soon as each replicate is finished.
+
+    Parameters
+    ----------
+    config : dict
+        Simulation configuration, see module documentation.
+    seeds : list
+        One seed per replicate.
+    workers : int
+        Number of worker processes. If 1, replicates run in the calling process. If None, one
+        worker per CPU is used.
+
+    Yields
+    ------
+    index : int
+        Position of the replicate's seed in seeds.
+    counts : ndarray
+        Result of :func:`run_replicate`.
+    """
+    if workers == 1:
+        for index, seed in enumerate(seeds):
+            yield index, run_replicate(config, seed)
+        return
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(run_replicate, config, seed): index
+                   for index, seed in enumerate(seeds)}
+        for future in as_completed(futures):
+            yield futures[future], future.result()
+
+
+def run(config, seeds=None, workers=None, master_seed=None, num_replicates=None):
+    """
+    Runs an ensemble of replicates.
+
+    Either seeds or both master_seed and num_replicates must be given.
+
+    Parameters
+    ----------
+    config : dict
+        Simulation configuration, see module documentation.
+    seeds : list
+        One seed per replicate.
+    workers : int
+        Number of worker processes, see :func:`imap`.
+    master_seed : int
+        Seed the replicate seeds are derived from.
+    num_replicates : int
+        Number of replicates derived from master_seed.
+
+    Returns
+    -------
+    seeds : ndarray
+        The seeds of the replicates.
+    counts : ndarray
+        Integer array of shape (replicates, num_years + 1, 2), counts[r] is the result of
+        :func:`run_replicate` for seeds[r].
+    """
+    if seeds is None:
+        if master_seed is None or num_replicates is None:
+            raise ValueError('Either seeds or master_seed and num_replicates must be given')
+        seeds = derive_seeds(master_seed, num_replicates)
+
+    results = [None] * len(seeds)
+    for index, counts in imap(config, seeds, workers):
+        results[index] = counts
+    return np.array(seeds, dtype=np.uint64), np.stack(results)
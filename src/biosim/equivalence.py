@@ -0,0 +1,493 @@
+"""
+:mod:`biosim.equivalence` checks that an alternative engine implements the same model as the
+object engine.
+
+Engines that draw random numbers in a different order, such as the vectorized, per-cell-stream
+and parallel engines, cannot reproduce the trajectories of :class:`biosim.island.Island`. Instead,
+both engines are run for many seeds on the same scenario and their results are compared with
+equivalence tests:
+
+* the number of animals of each species at a few checkpoint years,
+* the fraction of replicates in which a species has died out at the end,
+* the mean and the standard deviation of age, weight and fitness of each species at the end,
+  computed per replicate.
+
+Each replicate contributes one value to each test, so the values are independent. Each quantity
+is tested with two one-sided Welch t-tests (TOST): the engines are only considered equivalent if
+the difference of the means is shown to lie within a margin, in units of the pooled standard
+deviation (Cohen's d) for counts and attributes, and in absolute terms for extinction
+fractions. Equivalently, the ``1 - 2 alpha`` confidence interval of the difference must lie
+within the margin. An engine passes if all quantities are shown to be equivalent, so no
+correction for the number of tests is needed. Too few seeds make the intervals wide, and then
+the engine fails instead of passing; the reports give the power of each test, the probability
+to pass if the engines were exactly equivalent.
+
+An engine is a function ``engine(config, seed)`` returning a sample, see :func:`run_object`.
+Scenarios are configurations as used by :mod:`biosim.ensemble`; the standard scenarios
+``mono_ho``, ``mono_hc`` and ``check_sim`` of ``reference_examples`` are provided in
+:data:`SCENARIOS`::
+
+    reports = run_harness(run_vectorized, num_seeds=200)
+    for name, report in reports.items():
+        print(name, report)
+"""
+
+from concurrent.futures import ProcessPoolExecutor
+import functools
+import textwrap
+
+import numpy as np
+import scipy.stats as stats
+
+from .ensemble import derive_seeds, make_sim, _stages
+from .vectorized import ReplicateIsland
+from . import state
+
+SPECIES = ('Herbivore', 'Carnivore')
+ATTRIBUTES = ('age', 'weight', 'fitness')
+
+_mono_map = textwrap.dedent("""\
+                            WWW
+                            WLW
+                            WWW""")
+
+_check_sim_map = textwrap.dedent("""\
+                                 WWWWWWWWWWWWWWWWWWWWW
+                                 WWWWWWWWHWWWWLLLLLLLW
+                                 WHHHHHLLLLWWLLLLLLLWW
+                                 WHHHHHHHHHWWLLLLLLWWW
+                                 WHHHHHLLLLLLLLLLLLWWW
+                                 WHHHHHLLLDDLLLHLLLWWW
+                                 WHHLLLLLDDDLLLHHHHWWW
+                                 WWHHHHLLLDDLLLHWWWWWW
+                                 WHHHLLLLLDDLLLLLLLWWW
+                                 WHHHHLLLLDDLLLLWWWWWW
+                                 WWHHHHLLLLLLLLWWWWWWW
+                                 WWWHHHHLLLLLLLWWWWWWW
+                                 WWWWWWWWWWWWWWWWWWWWW""")
+
+
+def _animals(loc, species, number):
+    return [{'loc': loc, 'pop': [{'species': species, 'age': 5, 'weight': 20}
+                                 for _ in range(number)]}]
+
+
+SCENARIOS = {
+    'mono_ho': {'island_map': _mono_map,
+                'ini_pop': _animals((2, 2), 'Herbivore', 50),
+                'num_years': 301},
+    'mono_hc': {'island_map': _mono_map,
+                'ini_pop': _animals((2, 2), 'Herbivore', 50),
+                'stages': [{'num_years': 50},
+                           {'population': _animals((2, 2), 'Carnivore', 20),
+                            'num_years': 251}]},
+    'check_sim': {'island_map': _check_sim_map,
+                  'ini_pop': _animals((10, 10), 'Herbivore', 150),
+                  'animal_params': {'Herbivore': {'zeta': 3.2, 'xi': 1.8},
+                                    'Carnivore': {'a_half': 70, 'phi_age': 0.5, 'omega': 0.3,
+                                                  'F': 65, 'DeltaPhiMax': 9.}},
+                  'landscape_params': {'L': {'f_max': 700}},
+                  'stages': [{'num_years': 100},
+                             {'population': _animals((10, 10), 'Carnivore', 40),
+                              'num_years': 100}]},
+}
+"""Standard scenarios, matching the scripts in ``reference_examples`` without graphics."""
+
+
+def shorten(config, num_years):
+    """
+    Cuts a scenario short, e.g., for quick checks.
+
+    Parameters
+    ----------
+    config : dict
+        Simulation configuration, see :mod:`biosim.ensemble`.
+    num_years : int
+        Total number of years of the shortened scenario.
+
+    Returns
+    -------
+    config : dict
+        New configuration with the stages cut after num_years years.
+    """
+    stages = []
+    for stage in _stages(config):
+        if num_years <= 0:
+            break
+        stages.append(dict(stage, num_years=min(stage['num_years'], num_years)))
+        num_years -= stages[-1]['num_years']
+    shortened = {key: value for key, value in config.items() if key != 'num_years'}
+    shortened['stages'] = stages
+    return shortened
+
+
+def _sample(counts, values):
+    """Packs the counts per year and the final attribute values of one replicate."""
+    return {'counts': np.array(counts, dtype=np.int64),
+            'final': {species: {attribute: np.asarray(values[species][attribute], dtype=float)
+                                for attribute in ATTRIBUTES}
+                      for species in SPECIES}}
+
+
+def run_biosim(config, seed, **kwargs):
+    """
+    Runs one replicate with :class:`biosim.simulation.BioSim`.
+
+    Parameters
+    ----------
+    config : dict
+        Simulation configuration, see :mod:`biosim.ensemble`.
+    seed : int
+        Random number seed
+    kwargs
+        Further arguments passed on to BioSim, e.g., fast, cell_streams or workers.
+
+    Returns
+    -------
+    sample : dict
+        Dictionary with the entries 'counts', an integer array of shape (num_years + 1, 2) with
+        the number of herbivores and carnivores at the start and after each year, and 'final',
+        mapping each species to a dictionary mapping 'age', 'weight' and 'fitness' to arrays with
+        the values of all animals at the end.
+    """
+    sim = make_sim(config, seed, **kwargs)
+    isle = sim.isle
+    try:
+        with state.preserved_params():
+            counts = [(isle.total_herb_count(), isle.total_carn_count())]
+            for stage in _stages(config):
+                if stage.get('population'):
+                    sim.add_population(stage['population'])
+                for _ in range(stage['num_years']):
+                    sim.simulate(1)
+                    counts.append((isle.total_herb_count(), isle.total_carn_count()))
+        values = {'Herbivore': {'age': isle.get_herb_age(), 'weight': isle.get_herb_weight(),
+                                'fitness': isle.get_herb_fitness()},
+                  'Carnivore': {'age': isle.get_carn_age(), 'weight': isle.get_carn_weight(),
+                                'fitness': isle.get_carn_fitness()}}
+    finally:
+        if hasattr(isle, 'close'):
+            isle.close()
+    return _sample(counts, values)
+
+
+def run_object(config, seed):
+    """Runs one replicate with the object engine, the reference, see :func:`run_biosim`."""
+    return run_biosim(config, seed)
+
+
+def run_cell_streams(config, seed):
+    """Runs one replicate with per-cell random number streams, see :func:`run_biosim`."""
+    return run_biosim(config, seed, cell_streams=True)
+
+
+def run_hybrid(config, seed, cell_threshold=0):
+    """
+    Runs one replicate with hybrid cells, see :mod:`biosim.hybrid` and :func:`run_biosim`. By
+    default, every populated cell is simulated with arrays.
+    """
+    return run_biosim(config, seed, cell_threshold=cell_threshold)
+
+
+def run_parallel(config, seed, workers=2):
+    """Runs one replicate with :class:`biosim.parallel.ParallelIsland`, see :func:`run_biosim`."""
+    return run_biosim(config, seed, workers=workers)
+
+
+def run_vectorized(config, seed):
+    """
+    Runs one replicate with :class:`biosim.vectorized.ReplicateIsland`, see :func:`run_biosim`.
+    """
+    with state.preserved_params(state.config_params(config)):
+        isle = ReplicateIsland(config['island_map'], config.get('ini_pop'), seed=seed)
+        counts = [(isle.total_herb_count()[0], isle.total_carn_count()[0])]
+        for stage in _stages(config):
+            if stage.get('population'):
+                isle.add_pop(stage['population'])
+            for _ in range(stage['num_years']):
+                isle.season()
+                counts.append((isle.total_herb_count()[0], isle.total_carn_count()[0]))
+    values = {name: {attribute: getattr(population, attribute) for attribute in ATTRIBUTES}
+              for name, population in (('Herbivore', isle.herbs), ('Carnivore', isle.carns))}
+    return _sample(counts, values)
+
+
+def run_engine(engine, config, seeds, workers=None):
+    """
+    Runs an engine for several seeds.
+
+    Parameters
+    ----------
+    engine : callable
+        Function running one replicate, see :func:`run_object`.
+    config : dict
+        Simulation configuration, see :mod:`biosim.ensemble`.
+    seeds : list
+        One seed per replicate.
+    workers : int
+        Number of worker processes. If 1, replicates run in the calling process. If None, one
+        worker per CPU is used.
+
+    Returns
+    -------
+    samples : list
+        One sample per seed.
+    """
+    if workers == 1:
+        return [engine(config, seed) for seed in seeds]
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(functools.partial(engine, config), seeds))
+
+
+def _pooled_std(first, second):
+    """Pooled standard deviation of two samples."""
+    dof = len(first) + len(second) - 2
+    return np.sqrt(((len(first) - 1) * np.var(first, ddof=1)
+                    + (len(second) - 1) * np.var(second, ddof=1)) / dof)
+
+
+def cohens_d(first, second):
+    """
+    Difference of the means of two samples in units of their pooled standard deviation.
+
+    Parameters
+    ----------
+    first, second : array_like
+        The samples.
+
+    Returns
+    -------
+    d : float
+        Cohen's d, 0 if both samples are constant and equal, infinite if they are constant and
+        different.
+    """
+    first = np.asarray(first, dtype=float)
+    second = np.asarray(second, dtype=float)
+    diff = np.mean(first) - np.mean(second)
+    pooled = _pooled_std(first, second)
+    if pooled == 0:
+        return 0.0 if diff == 0 else np.copysign(np.inf, diff)
+    return diff / pooled
+
+
+def tost(first, second, margin, alpha=0.05, standardized=True):
+    """
+    Two one-sided Welch t-tests of the hypotheses that the mean of first lies at least margin
+    below, or at least margin above, the mean of second. Rejecting both shows equivalence.
+
+    Parameters
+    ----------
+    first, second : array_like
+        The samples, NaN values are left out.
+    margin : float
+        Equivalence margin.
+    alpha : float
+        Significance level, used for the confidence interval and the power.
+    standardized : bool
+        If True, margin, effect size and interval are in units of the pooled standard
+        deviation, see :func:`cohens_d`. Otherwise, they are differences of the means.
+
+    Returns
+    -------
+    result : dict or None
+        Dictionary with the keys 'p_value', the larger p-value of the two tests,
+        'effect_size', the difference of the means in the units of margin, 'lower' and
+        'upper', the bounds of its
+        ``1 - 2 alpha`` confidence interval, and 'power', the probability of showing equivalence
+        if the means were equal. None if a sample has fewer than two values.
+    """
+    first = np.asarray(first, dtype=float)
+    second = np.asarray(second, dtype=float)
+    first = first[~np.isnan(first)]
+    second = second[~np.isnan(second)]
+    if len(first) < 2 or len(second) < 2:
+        return None
+    diff = np.mean(first) - np.mean(second)
+    first_var = np.var(first, ddof=1) / len(first)
+    second_var = np.var(second, ddof=1) / len(second)
+    std_err = np.sqrt(first_var + second_var)
+    if std_err == 0:
+        effect = cohens_d(first, second) if standardized else diff
+        equivalent = abs(effect) < margin
+        return {'p_value': 0.0 if equivalent else 1.0, 'effect_size': float(effect),
+                'lower': float(effect), 'upper': float(effect), 'power': 1.0}
+
+    scale = _pooled_std(first, second) if standardized else 1.0
+    dof = (first_var + second_var) ** 2 / (first_var ** 2 / (len(first) - 1)
+                                           + second_var ** 2 / (len(second) - 1))
+    bound = margin * scale
+    p_value = max(stats.t.sf((diff + bound) / std_err, dof),
+                  stats.t.cdf((diff - bound) / std_err, dof))
+    critical = stats.t.ppf(1 - alpha, dof)
+    power = max(0.0, 2 * stats.t.cdf(bound / std_err - critical, dof) - 1)
+    return {'p_value': float(p_value), 'effect_size': float(diff / scale),
+            'lower': float((diff - critical * std_err) / scale),
+            'upper': float((diff + critical * std_err) / scale), 'power': float(power)}
+
+
+def _summary(samples, species, attribute, function):
+    """Per-replicate summary of the final values, NaN for replicates without animals."""
+    return [function(sample['final'][species][attribute])
+            if len(sample['final'][species][attribute]) else np.nan
+            for sample in samples]
+
+
+def checkpoint_years(num_years, num_checkpoints=5):
+    """
+    Evenly spaced years at which population counts are compared, ending with the last year.
+
+    Parameters
+    ----------
+    num_years : int
+        Number of simulated years.
+    num_checkpoints : int
+        Number of years.
+
+    Returns
+    -------
+    years : list
+        Sorted list of distinct years between 1 and num_years.
+    """
+    return sorted({int(round(year))
+                   for year in np.linspace(num_years / num_checkpoints, num_years,
+                                           num_checkpoints)})
+
+
+class EquivalenceReport:
+    """Results of the equivalence tests comparing a candidate engine with the reference."""
+
+    def __init__(self, results, alpha):
+        """
+        Parameters
+        ----------
+        results : list
+            One dictionary per test with the keys 'quantity', 'test', 'margin' and the entries
+            returned by :func:`tost`.
+        alpha : float
+            Significance level of each test.
+        """
+        self.alpha = alpha
+        self.results = results
+        for result in results:
+            result['passed'] = bool(result['p_value'] < alpha)
+
+    @property
+    def passed(self):
+        """True if every test shows equivalence."""
+        return all(result['passed'] for result in self.results)
+
+    @property
+    def failures(self):
+        """Results of the tests that do not show equivalence."""
+        return [result for result in self.results if not result['passed']]
+
+    @property
+    def min_power(self):
+        """Lowest power of the tests, the probability to pass if the engines were equivalent."""
+        return min((result['power'] for result in self.results), default=1.0)
+
+    def __str__(self):
+        lines = [f'{"PASS" if self.passed else "FAIL"}: {len(self.results)} tests, '
+                 f'{len(self.failures)} failed at alpha={self.alpha}, '
+                 f'lowest power {self.min_power:.2f}']
+        for result in self.results:
+            lines.append(f'  {"ok  " if result["passed"] else "FAIL"} '
+                         f'{result["quantity"]:<32} {result["test"]:<6} '
+                         f'effect={result["effect_size"]:<7.3g} '
+                         f'interval=[{result["lower"]:.3g}, {result["upper"]:.3g}] '
+                         f'margin={result["margin"]:<5g} power={result["power"]:.2f}')
+        return '\n'.join(lines)
+
+
+def compare(reference, candidate, alpha=0.05, margin=0.5, extinction_margin=0.1,
+            num_checkpoints=5):
+    """
+    Compares samples of a candidate engine with samples of the reference engine.
+
+    Parameters
+    ----------
+    reference, candidate : list
+        Samples of the same scenario, see :func:`run_biosim`.
+    alpha : float
+        Significance level of each test.
+    margin : float
+        Equivalence margin of counts and attributes, as Cohen's d.
+    extinction_margin : float
+        Equivalence margin of the fractions of replicates in which a species died out.
+    num_checkpoints : int
+        Number of years at which the population counts are compared.
+
+    Returns
+    -------
+        EquivalenceReport instance
+    """
+    results = []
+
+    def add(quantity, test, first, second, test_margin, standardized=True):
+        outcome = tost(first, second, test_margin, alpha, standardized)
+        if outcome is not None:
+            results.append(dict(outcome, quantity=quantity, test=test, margin=test_margin))
+
+    ref_counts = np.stack([sample['counts'] for sample in reference])
+    cand_counts = np.stack([sample['counts'] for sample in candidate])
+    num_years = ref_counts.shape[1] - 1
+    for year in checkpoint_years(num_years, num_checkpoints):
+        for index, species in enumerate(SPECIES):
+            add(f'{species} count, year {year}', 'd', cand_counts[:, year, index],
+                ref_counts[:, year, index], margin)
+
+    for index, species in enumerate(SPECIES):
+        add(f'{species} extinct', 'diff', cand_counts[:, -1, index] == 0,
+            ref_counts[:, -1, index] == 0, extinction_margin, standardized=False)
+
+    for species in SPECIES:
+        for attribute in ATTRIBUTES:
+            for name, function in (('mean', np.mean), ('std', np.std)):
+                add(f'{species} {attribute} {name}', 'd',
+                    _summary(candidate, species, attribute, function),
+                    _summary(reference, species, attribute, function), margin)
+
+    return EquivalenceReport(results, alpha)
+
+
+def run_harness(candidate, scenarios=None, num_seeds=200, master_seed=2022, reference=run_object,
+                alpha=0.05, margin=0.5, workers=None):
+    """
+    Runs a candidate engine and the reference engine on scenarios and compares them.
+
+    The reference and the candidate are run with different seeds, derived from master_seed, so
+    that the samples are independent.
+
+    Parameters
+    ----------
+    candidate : callable
+        Engine to check, see :func:`run_object`.
+    scenarios : dict
+        Dictionary mapping names to configurations, :data:`SCENARIOS` if None.
+    num_seeds : int
+        Number of replicates per engine and scenario.
+    master_seed : int
+        Seed the replicate seeds are derived from.
+    reference : callable
+        Reference engine.
+    alpha : float
+        Significance level of each test.
+    margin : float
+        Equivalence margin of counts and attributes as Cohen's d, see :func:`compare`.
+    workers : int
+        Number of worker processes, see :func:`run_engine`.
+
+    Returns
+    -------
+    reports : dict
+        Dictionary mapping scenario names to EquivalenceReport instances.
+    """
+    if scenarios is None:
+        scenarios = SCENARIOS
+    seeds = derive_seeds(master_seed, 2 * num_seeds)
+    reports = {}
+    for name, config in scenarios.items():
+        reference_samples = run_engine(reference, config, seeds[:num_seeds], workers)
+        candidate_samples = run_engine(candidate, config, seeds[num_seeds:], workers)
+        reports[name] = compare(reference_samples, candidate_samples, alpha, margin)
+    return reports
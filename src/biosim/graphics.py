@@ -28,6 +28,9 @@ from matplotlib import gridspec
 import numpy as np
 import subprocess
 import os
+import time
+
+from .islandmap import IslandMap, LETTERS
 
 # Update these variables to point to your ffmpeg and convert binaries
 # If you installed ffmpeg using conda or installed both softwares in
@@ -52,8 +55,8 @@ class Graphics:
         ----------
         island : instance
             An Island instance
-        geogr : str
-            multiline string specifying the map layout
+        geogr : str or instance
+            multiline string specifying the map layout, or the compiled map
         img_dir : str
             directory for image files; no images if None
         img_name : str
@@ -100,11 +103,12 @@ class Graphics:
         self._weight_hist_carn = None
         self._spec = None
         self._island = island
-        self._geogr = geogr
+        self._geogr = IslandMap.compile(geogr)
         self._cmax = None
         self._ymax = None
         self._hist_specs = None
         self._final_step = None
+        self.save_time = 0.0
 
     def update(self, step, year):
         """
@@ -117,12 +121,9 @@ class Graphics:
             current year
         """
 
-        herb_distr = [cell.herb_count() for cell in self._island.isle_map.values()]
-        map_dims = ((len(self._geogr.splitlines())), len(list(self._geogr.splitlines()[0])))
-        herb_distr = np.reshape(herb_distr, map_dims)
-        carn_distr = [cell.carn_count() for cell in self._island.isle_map.values()]
-        carn_distr = np.reshape(carn_distr, map_dims)
-        self._update_island_map(self._geogr)
+        herb_distr = self._island.herb_distribution()
+        carn_distr = self._island.carn_distribution()
+        self._update_island_map()
         self._update_animal_lines(self._island.total_herb_count(), self._island.total_carn_count(),
                                   step)
         self._update_herb_distr(herb_distr)
@@ -134,7 +135,9 @@ class Graphics:
         self._fig.canvas.flush_events()  # ensure every thing is drawn
         plt.pause(1e-6)  # pause required to pass control to GUI
 
+        start = time.perf_counter()
         self._save_graphics(step)
+        self.save_time = time.perf_counter() - start
 
     def make_movie(self, movie_fmt=None):
         """
@@ -177,6 +180,11 @@ class Graphics:
         else:
             raise ValueError('Unknown movie format: ' + movie_fmt)
 
+    @property
+    def figure(self):
+        """The matplotlib figure, None before :meth:`setup` has been called."""
+        return self._fig
+
     def setup(self, final_step=0, img_step=0, ymax=None, cmax=None, hist_specs=None):
         """
         Prepare graphics.
@@ -305,20 +313,18 @@ class Graphics:
         if self._final_step is None:
             self._final_step = final_step
 
-    def _update_island_map(self, geogr):
+    def _update_island_map(self):
+        # The map does not change, so it is only drawn once
+        if self._img_axis is not None:
+            return
         #                   R    G    B
         rgb_value = {'W': (0.0, 0.0, 1.0),  # blue
                      'L': (0.0, 0.6, 0.0),  # dark green
                      'H': (0.5, 1.0, 0.5),  # light green
                      'D': (1.0, 1.0, 0.5)}  # light yellow
 
-        map_rgb = [[rgb_value[column] for column in row]
-                   for row in geogr.splitlines()]
-
-        if self._img_axis is not None:
-            self._img_axis.set_data(map_rgb)
-        else:
-            self._img_axis = self._map_ax.imshow(map_rgb)
+        palette = np.array([rgb_value[letter] for letter in LETTERS])
+        self._img_axis = self._map_ax.imshow(palette[self._geogr.types])
 
     def _update_herb_distr(self, distr_map):
         if self._herb_img_axis is not None:
@@ -0,0 +1,443 @@
+"""
+:mod:`biosim.hybrid` provides cells that simulate large populations with arrays.
+
+A hybrid cell keeps its animals as :class:`biosim.animal.Animal` objects while it holds few of
+them. At the start of each year, when feeding begins, it decides how to simulate the year:
+
+* with at least ``threshold`` animals, the cell switches to array mode. Feeding, mating,
+  migration, aging and dying are then carried out by NumPy operations on one :class:`Herd` per
+  species, which holds the ages, weights and fitness of all animals of the species,
+* with fewer than ``HYSTERESIS * threshold`` animals, the cell switches back to object mode and
+  runs the phases of :class:`biosim.cell.Cell`,
+* in between, it stays in its mode, so cells near the threshold do not switch back and forth.
+
+The animals are converted between objects and arrays only when needed. Reading ``herb_pop`` or
+``carn_pop`` of a cell in array mode returns the usual lists of animal objects, and the next
+phase converts them back. Conversions keep the order and all properties of the animals, so
+reading the animals, e.g., for graphics or checkpoints, does not change the results.
+
+In array mode, every phase draws its random numbers from a NumPy generator seeded from the
+:mod:`random` module, so a seed still determines the result and per-cell streams, see
+:mod:`biosim.rng`, still work. The random numbers differ from those of object mode, so results
+agree with those of plain cells in distribution, not in individual trajectories, see
+:mod:`biosim.equivalence`.
+
+:class:`biosim.simulation.BioSim` uses hybrid cells if ``cell_threshold`` is given. With
+``cell_threshold='auto'``, the threshold is measured on the current machine by :func:`autotune`.
+"""
+
+import functools
+import math
+import random
+import time
+
+import numpy as np
+
+from .animal import Herbivore, Carnivore
+from .cell import Cell, Lowland, Highland, Desert, Water
+from .columns import Columns
+from .vectorized import fitness
+from . import state
+
+DEFAULT_THRESHOLD = 200
+"""Number of animals from which a cell switches to array mode."""
+
+HYSTERESIS = 0.5
+"""Fraction of the threshold below which a cell in array mode switches back."""
+
+_TUNING_SIZES = (16, 32, 64, 128, 256, 512, 1024)
+
+# Carnivores per herbivore in the cells timed by autotune
+_TUNING_RATIO = 0.1
+
+
+class Herd(Columns):
+    """
+    Ages, weights and fitness of the animals of one species in one cell, stored in growable
+    arrays, see :mod:`biosim.columns`.
+    """
+
+    def __init__(self, species, age, weight, fitness_values):
+        """
+        Parameters
+        ----------
+        species : class
+            Herbivore or Carnivore
+        age, weight, fitness_values : ndarray
+            Properties of the animals.
+        """
+        self.species = species
+        super().__init__(age=age, weight=weight, fitness=fitness_values)
+
+    @classmethod
+    def from_animals(cls, species, animals):
+        """
+        Stores animal objects, computing fitness not computed yet.
+
+        Parameters
+        ----------
+        species : class
+            Herbivore or Carnivore
+        animals : list
+            List of animal instances.
+        """
+        age, weight, fitness_values = state.animals_to_arrays(animals)
+        stale = np.isnan(fitness_values)
+        fitness_values[stale] = fitness(species, age[stale], weight[stale])
+        return cls(species, age, weight, fitness_values)
+
+    def to_animals(self):
+        """Returns the animals as list of animal instances."""
+        return state.animals_from_arrays(self.species, self.age, self.weight, self.fitness)
+
+    def update_fitness(self, index=slice(None)):
+        """Recomputes the fitness of the animals selected by index."""
+        self.fitness[index] = fitness(self.species, self.age[index], self.weight[index])
+
+
+def _generator():
+    """NumPy generator for one phase, seeded from the random module."""
+    return np.random.default_rng(random.getrandbits(64))
+
+
+class HybridCell(Cell):
+    """
+    Cell simulating its animals as objects or as arrays, depending on their number.
+
+    Combined with a landscape type, e.g., ``HybridLowland(HybridCell, Lowland)``.
+    """
+
+    def __init__(self, ini_pop=None, threshold=DEFAULT_THRESHOLD):
+        """
+        Parameters
+        ----------
+        ini_pop : list of dictionaries
+            The initial animal population.
+        threshold : float
+            Number of animals from which the cell switches to array mode. 0 gives array mode
+            for every populated cell, math.inf object mode only.
+        """
+        self.threshold = threshold
+        self.array_mode = False
+        self._herds = None
+        super().__init__(ini_pop)
+
+    @property
+    def herb_pop(self):
+        """Herbivores in the cell, as list of animal instances."""
+        if self._herds is not None:
+            self._to_objects()
+        return self._herb_pop
+
+    @herb_pop.setter
+    def herb_pop(self, animals):
+        if self._herds is not None:
+            self._to_objects()
+        self._herb_pop = animals
+
+    @property
+    def carn_pop(self):
+        """Carnivores in the cell, as list of animal instances."""
+        if self._herds is not None:
+            self._to_objects()
+        return self._carn_pop
+
+    @carn_pop.setter
+    def carn_pop(self, animals):
+        if self._herds is not None:
+            self._to_objects()
+        self._carn_pop = animals
+
+    def _to_objects(self):
+        """Stores the animals as objects."""
+        herbs, carns = self._herds
+        self._herds = None
+        self._herb_pop = herbs.to_animals()
+        self._carn_pop = carns.to_animals()
+
+    def _arrays(self):
+        """Stores the animals as arrays, returns the herbivore and carnivore herds."""
+        if self._herds is None:
+            self._herds = (Herd.from_animals(Herbivore, self._herb_pop),
+                           Herd.from_animals(Carnivore, self._carn_pop))
+            self._herb_pop = self._carn_pop = None
+        return self._herds
+
+    def herb_count(self):
+        """Number of herbivores in the cell."""
+        return len(self._herb_pop if self._herds is None else self._herds[0])
+
+    def carn_count(self):
+        """Number of carnivores in the cell."""
+        return len(self._carn_pop if self._herds is None else self._herds[1])
+
+    def _start_year(self):
+        """Chooses the mode for the year from the number of animals."""
+        num = self.herb_count() + self.carn_count()
+        if num >= self.threshold:
+            self.array_mode = True
+        elif num < HYSTERESIS * self.threshold:
+            self.array_mode = False
+
+    def immigrate(self, herbs=(), carns=()):
+        """
+        Adds animals arriving from other cells, as lists of animal instances or herds.
+
+        Parameters
+        ----------
+        herbs, carns : list or instance
+            Arriving herbivores and carnivores.
+        """
+        if self._herds is None:
+            self._herb_pop.extend(herbs.to_animals() if isinstance(herbs, Herd) else herbs)
+            self._carn_pop.extend(carns.to_animals() if isinstance(carns, Herd) else carns)
+            return
+        for herd, animals in zip(self._herds, (herbs, carns)):
+            if len(animals):
+                herd.extend(animals if isinstance(animals, Herd)
+                            else Herd.from_animals(herd.species, animals))
+
+    def copy_pop(self, other):
+        """
+        Replaces the populations by copies of the populations of another cell, and takes over
+        its mode.
+
+        Parameters
+        ----------
+        other : instance
+            Cell instance to copy the animals from.
+        """
+        super().copy_pop(other)
+        self.array_mode = other.array_mode
+
+    def feeding_herbs(self):
+        """The herbivores in the cell feed in order of fitness. The fittest animals eat first."""
+        self._start_year()
+        if not self.array_mode:
+            super().feeding_herbs()
+            return
+        herbs, _ = self._arrays()
+        order = np.argsort(-herbs.fitness, kind='stable')
+        food = self.f_max - Herbivore.F * np.arange(len(herbs))
+        fed = order[food >= Herbivore.F]
+        herbs.weight[fed] += Herbivore.beta * Herbivore.F
+        herbs.update_fitness(fed)
+        self.events['unfed_herbs'] += len(herbs) - len(fed)
+
+    def feeding_carnivores(self):
+        """
+        The carnivores in the cell eat in random order. Each carnivore tries to kill the
+        herbivores from the least fit upwards until it has eaten enough or no herbivore less
+        fit than itself is left.
+        """
+        if not self.array_mode:
+            super().feeding_carnivores()
+            return
+        herbs, carns = self._arrays()
+        if not len(herbs) or not len(carns):
+            return
+        gen = _generator()
+        order = np.argsort(herbs.fitness, kind='stable')
+        prey_fitness = herbs.fitness[order]
+        prey_weight = herbs.weight[order]
+        kills = 0
+        for hunter in gen.permutation(len(carns)).tolist():
+            eaten, start = 0.0, 0
+            while eaten < Carnivore.F:
+                # Only herbivores less fit than the carnivore can be killed
+                stop = int(np.searchsorted(prey_fitness, carns.fitness[hunter]))
+                if start >= stop:
+                    break
+                p_kill = np.minimum((carns.fitness[hunter] - prey_fitness[start:stop])
+                                    / Carnivore.DeltaPhiMax, 1.0)
+                hits = (gen.random(stop - start) < p_kill) & (prey_weight[start:stop] > 0)
+                if not hits.any():
+                    break
+                prey = start + int(hits.argmax())
+                carns.weight[hunter] += Carnivore.beta * min(prey_weight[prey],
+                                                             Carnivore.F - eaten)
+                carns.update_fitness(hunter)
+                eaten += prey_weight[prey]
+                prey_weight[prey] = 0
+                kills += 1
+                start = prey + 1
+        herbs.weight[order] = prey_weight
+        self.events['kills'] += kills
+
+    def mating(self):
+        """The animals in the cell mate with given probability. Newborns join the herds."""
+        if not self.array_mode:
+            super().mating()
+            return
+        for herd, event in zip(self._arrays(), ('herb_births', 'carn_births')):
+            num = len(herd)
+            if not num:
+                continue
+            cls = herd.species
+            gen = _generator()
+            newborn = np.maximum(gen.normal(cls.w_birth, cls.sigma_birth, num), 0)
+            births = ((herd.weight > cls.zeta * (cls.w_birth + cls.sigma_birth))
+                      & (herd.weight > cls.xi * newborn)
+                      & (gen.random(num) < np.minimum(1.0, cls.gamma * herd.fitness * (num - 1))))
+            newborn = newborn[births]
+            # Like animal objects, mothers keep their fitness until it is next updated
+            herd.weight[births] -= cls.xi * newborn
+            age = np.zeros(len(newborn), dtype=np.int64)
+            herd.append(age=age, weight=newborn, fitness=fitness(cls, age, newborn))
+            self.events[event] += len(newborn)
+
+    def emigrate(self, loc, habitable):
+        """
+        Decides which animals leave the cell and where they go, and removes them from the cell.
+        Animals that want to move to a cell that is not habitable stay.
+
+        Parameters
+        ----------
+        loc : tuple
+            Location of the cell
+        habitable : set
+            Locations of all habitable cells
+
+        Returns
+        -------
+        emigrants : dict
+            Dictionary mapping target locations to herds of herbivores and carnivores in array
+            mode, or to lists of animal instances in object mode.
+        """
+        if not self.array_mode:
+            return super().emigrate(loc, habitable)
+        row, col = loc
+        neighbours = [(row, col - 1), (row, col + 1), (row - 1, col), (row + 1, col)]
+        open_to = np.array([neighbour in habitable for neighbour in neighbours])
+        herds = self._arrays()
+        emigrants = {}
+        moved = wanting = 0
+        for index, herd in enumerate(herds):
+            num = len(herd)
+            if not num:
+                continue
+            gen = _generator()
+            leaving = gen.random(num) <= herd.species.mu * herd.fitness
+            direction = gen.integers(0, 4, num)
+            wanting += int(leaving.sum())
+            leaving &= open_to[direction]
+            for target in np.unique(direction[leaving]).tolist():
+                moves = emigrants.setdefault(neighbours[target], [None, None])
+                moves[index] = herd.take(leaving & (direction == target))
+            moved += int(leaving.sum())
+            herd.swap_remove(np.flatnonzero(leaving))
+        self.count_migrations(moved, wanting - moved)
+        empty = [herd.take(slice(0)) for herd in herds]
+        return {target: tuple(empty[index] if moves[index] is None else moves[index]
+                              for index in range(2))
+                for target, moves in emigrants.items()}
+
+    def aging_and_losing_weight(self):
+        """All animals age by one year and lose weight."""
+        if not self.array_mode:
+            super().aging_and_losing_weight()
+            return
+        for herd in self._arrays():
+            herd.age += 1
+            herd.weight -= herd.species.eta * herd.weight
+            herd.update_fitness()
+
+    def dying(self):
+        """The animals in the populations die with given probabilities."""
+        if not self.array_mode:
+            super().dying()
+            return
+        for herd, event in zip(self._arrays(), ('herb_deaths', 'carn_deaths')):
+            num = len(herd)
+            if not num:
+                continue
+            p_death = herd.species.omega * (1 - herd.fitness)
+            dies = (herd.weight == 0) | (_generator().random(num) < p_death)
+            herd.keep(~dies)
+            self.events[event] += int(dies.sum())
+
+
+class HybridLowland(HybridCell, Lowland):
+    """Lowland cell switching between objects and arrays."""
+
+
+class HybridHighland(HybridCell, Highland):
+    """Highland cell switching between objects and arrays."""
+
+
+class HybridDesert(HybridCell, Desert):
+    """Desert cell switching between objects and arrays."""
+
+    def feeding_herbs(self):
+        self._start_year()
+        self.events['unfed_herbs'] += self.herb_count()
+
+
+def cell_dict(threshold=DEFAULT_THRESHOLD):
+    """
+    Cell types of an island with hybrid land cells, see :class:`biosim.island.Island`.
+
+    Parameters
+    ----------
+    threshold : float
+        Number of animals from which a cell switches to array mode.
+
+    Returns
+    -------
+    cells : dict
+        Dictionary mapping landscape letters to functions creating cells.
+    """
+    return {'W': Water,
+            'L': functools.partial(HybridLowland, threshold=threshold),
+            'H': functools.partial(HybridHighland, threshold=threshold),
+            'D': functools.partial(HybridDesert, threshold=threshold)}
+
+
+def _year_seconds(size, threshold, repeats):
+    """Shortest time of one year of a lowland cell with size animals, over repeats."""
+    carns = int(size * _TUNING_RATIO)
+    pop = ([{'species': 'Herbivore', 'age': 5, 'weight': 20}] * (size - carns)
+           + [{'species': 'Carnivore', 'age': 5, 'weight': 20}] * carns)
+    best = math.inf
+    for _ in range(repeats):
+        cell = HybridLowland(pop, threshold)
+        start = time.perf_counter()
+        cell.feeding_herbs()
+        cell.feeding_carnivores()
+        cell.mating()
+        for herbs, carns in cell.emigrate((2, 2), {(1, 2), (2, 1)}).values():
+            cell.immigrate(herbs, carns)
+        cell.aging_and_losing_weight()
+        cell.dying()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+@functools.lru_cache(maxsize=None)
+def autotune(sizes=_TUNING_SIZES, repeats=3):
+    """
+    Measures from which number of animals array mode is faster than object mode on this
+    machine, using the current animal and landscape parameters. Measured once per process for
+    each set of arguments. The state of the :mod:`random` module is restored afterwards.
+
+    Parameters
+    ----------
+    sizes : tuple
+        Increasing numbers of animals to try.
+    repeats : int
+        Number of times each year is timed, the shortest time counts.
+
+    Returns
+    -------
+    threshold : int
+        The smallest size for which array mode is faster, or the largest size if there is
+        none.
+    """
+    saved = random.getstate()
+    try:
+        for size in sizes:
+            if _year_seconds(size, 0, repeats) < _year_seconds(size, math.inf, repeats):
+                return size
+        return sizes[-1]
+    finally:
+        random.setstate(saved)
@@ -1,7 +1,185 @@
 from collections import defaultdict
+from operator import itemgetter
 import random
+import time
 
-from .cell import Lowland, Highland, Desert, Water
+import numpy as np
+
+from .cell import EVENTS, Lowland, Highland, Desert, Water
+from .islandmap import IslandMap, LocationMask, LETTERS
+from . import population, rng
+
+
+def _populated(cell):
+    """Returns True if there are animals in the cell."""
+    return bool(cell.herb_count() or cell.carn_count())
+
+
+def share_events(cells):
+    """
+    Lets the cells count their events in one shared dictionary, so the events of all cells are
+    collected without visiting them, see :func:`collect_events`.
+
+    Parameters
+    ----------
+    cells : iterable
+        Cells.
+
+    Returns
+    -------
+    events : dict
+        The shared dictionary, mapping the names in :data:`biosim.cell.EVENTS` to zero.
+    """
+    events = dict.fromkeys(EVENTS, 0)
+    for cell in cells:
+        cell.events = events
+    return events
+
+
+def collect_events(events):
+    """
+    Returns the events counted in a shared dictionary and starts counting from zero, see
+    :func:`share_events`.
+
+    Parameters
+    ----------
+    events : dict
+        Dictionary returned by :func:`share_events`.
+
+    Returns
+    -------
+    events : dict
+        Dictionary mapping the names in :data:`biosim.cell.EVENTS` to numbers of events.
+    """
+    counted = dict(events)
+    events.update(dict.fromkeys(EVENTS, 0))
+    return counted
+
+
+def local_phase(cells, master_seed, year, habitable):
+    """
+    Lets the animals in the cells feed, mate and decide where to migrate.
+
+    Every phase of every cell draws from its own random number stream, see :mod:`biosim.rng`.
+    Cells without animals draw no random numbers and are skipped.
+
+    Parameters
+    ----------
+    cells : dict
+        Dictionary mapping locations to habitable cells.
+    master_seed : int
+        Seed of the simulation.
+    year : int
+        The year being simulated.
+    habitable : set
+        Locations of all habitable cells of the island.
+
+    Returns
+    -------
+    emigrants : list
+        List of (target, source, herbivores, carnivores) tuples. The emigrants have been removed
+        from their cells.
+    """
+    emigrants = []
+    for loc, cell in cells.items():
+        if not _populated(cell):
+            continue
+        rng.seed_cell(master_seed, year, loc, rng.FEEDING)
+        cell.feeding_herbs()
+        cell.feeding_carnivores()
+        rng.seed_cell(master_seed, year, loc, rng.MATING)
+        cell.mating()
+        rng.seed_cell(master_seed, year, loc, rng.MIGRATION)
+        for target, (herbs, carns) in cell.emigrate(loc, habitable).items():
+            emigrants.append((target, loc, herbs, carns))
+    return emigrants
+
+
+def settle_phase(cells, arrivals, master_seed, year):
+    """
+    Places arriving animals and lets all animals age, lose weight and die.
+
+    Arrivals are placed in the order of the cells they come from, so the result does not depend
+    on the order of the arrivals list.
+
+    Parameters
+    ----------
+    cells : dict
+        Dictionary mapping locations to habitable cells.
+    arrivals : list
+        List of (target, source, herbivores, carnivores) tuples for targets in cells.
+    master_seed : int
+        Seed of the simulation.
+    year : int
+        The year being simulated.
+    """
+    for target, _, herbs, carns in sorted(arrivals, key=lambda arrival: arrival[1]):
+        cells[target].immigrate(herbs, carns)
+    for loc, cell in cells.items():
+        if not _populated(cell):
+            continue
+        cell.aging_and_losing_weight()
+        rng.seed_cell(master_seed, year, loc, rng.DEATH)
+        cell.dying()
+
+
+class SparseCells(dict):
+    """
+    Cells of a sparse island, see :class:`Island`.
+
+    Only land cells that have been looked up are stored. Looking up another land cell creates
+    an empty cell of its landscape type and stores it, looking up a water cell returns a water
+    cell shared by all water locations, and looking up a location outside the map raises
+    KeyError. Iteration visits the stored cells in map order, like the cells of a dense
+    island, and membership tests only see stored cells.
+    """
+
+    def __init__(self, island_map, create):
+        """
+        Parameters
+        ----------
+        island_map : instance
+            Compiled map, see :class:`biosim.islandmap.IslandMap`.
+        create : callable
+            Called with a location, returns the cell to use for it.
+        """
+        super().__init__()
+        self.island_map = island_map
+        self._create = create
+        self._unordered = False
+
+    def __missing__(self, loc):
+        if loc not in self.island_map:
+            raise KeyError(loc)
+        cell = self._create(loc)
+        if cell.habitable:
+            dict.__setitem__(self, loc, cell)
+            self._unordered = True
+        return cell
+
+    def _order(self):
+        """Restores map order after cells have been created."""
+        if self._unordered:
+            cells = sorted(dict.items(self), key=itemgetter(0))
+            dict.clear(self)
+            dict.update(self, cells)
+            self._unordered = False
+
+    def __iter__(self):
+        self._order()
+        return dict.__iter__(self)
+
+    def keys(self):
+        self._order()
+        return dict.keys(self)
+
+    def values(self):
+        self._order()
+        return dict.values(self)
+
+    def items(self):
+        self._order()
+        return dict.items(self)
 
 
 class Island:
@@ -10,39 +188,86 @@ class Island:
     """
     cell_dict = {'W': Water, 'H': Highland, 'D': Desert, 'L': Lowland}
 
-    def __init__(self, island_map, ini_pop=None):
+    def __init__(self, island_map, ini_pop=None, seed=None, fast=False, sparse=False,
+                 cell_dict=None):
         """
 
         Parameters
         ----------
-        island_map : str
-            Map of the island with a letter representing each cell.
+        island_map : str or instance
+            Map of the island with a letter representing each cell, or the map compiled by
+            :class:`biosim.islandmap.IslandMap`.
             Legal letters: {'W', 'H', 'D', 'L'}
         ini_pop : list of dictionaries
-            The initial population
+            The initial population, or a columnar population, see :meth:`add_columns`.
+        seed : int
+            If given, every phase of every cell in every year draws from its own random number
+            stream derived from this master seed, see :mod:`biosim.rng`. The result then does
+            not depend on the order in which cells are visited, and equals the result of
+            :class:`biosim.parallel.ParallelIsland` with the same seed. Otherwise all cells
+            share the global stream of the :mod:`random` module.
+        fast : bool
+            If True and seed is None, cells without animals and water cells are skipped and
+            migrants are moved in linear time. All random numbers are drawn in the same order as
+            with fast=False, so the result is identical, see :meth:`_season_fast`.
+        sparse : bool
+            If True, water cells and land cells that have never held animals take no memory,
+            see :class:`SparseCells`, and the island is built in time proportional to the
+            initial population instead of the map area. Without seed, the island is simulated
+            as with fast=True. The result is the same as without sparse. The cell by cell
+            migration of :meth:`handle_migration` is not available.
+        cell_dict : dict
+            Dictionary mapping landscape letters to cell classes, or to functions creating a
+            cell from a list of animal dictionaries, e.g., :func:`biosim.hybrid.cell_dict`.
+            :attr:`cell_dict` if None.
         """
         self.isle_map = {}
+        self.seed = seed
+        self.fast = fast
+        self.sparse = sparse
+        self.year = 0
+        self.timer = None
 
         pop = defaultdict(list)
+        columns = None
+        if population.is_columnar(ini_pop):
+            columns, ini_pop = ini_pop, None
         if ini_pop is not None:
             for elm in ini_pop:
                 pop[elm['loc']] += elm['pop']
 
-        lines = [i.strip() for i in island_map.splitlines()]
-        types = [list(j) for j in lines]
-
-        is_edges_water = (types[0] + types[-1] + [c[0] for c in types[1:-1]] + [c[-1] for c in
-                                                                                types[1:-1]])
-
-        if is_edges_water.count('W') != len(is_edges_water):
-            raise ValueError('Island is not surrounded by water')
-
-        for i, row in enumerate(island_map.splitlines()):
-            for j, col in enumerate(list(row)):
-                if col in self.cell_dict:
-                    self.isle_map[(i+1, j+1)] = self.cell_dict[col](pop.get((i+1, j+1)))
-                else:
-                    raise ValueError(f'This is not a valid landscape type: {col}')
+        island_map = IslandMap.compile(island_map)
+        self.island_map = island_map
+        self.map_dims = island_map.shape
+        if cell_dict is not None:
+            self.cell_dict = cell_dict
+        self._classes = [self.cell_dict[letter] for letter in LETTERS]
+        if sparse:
+            self._water = Water(None)
+            self.isle_map = SparseCells(island_map, self._new_cell)
+            for loc in sorted(pop):
+                if loc in island_map and island_map.type_at(loc) != 0:
+                    self.isle_map[loc] = self._classes[island_map.type_at(loc)](pop[loc])
+            self._habitable = LocationMask(island_map.habitable)
+            self._events = share_events(list(self.isle_map.values()) + [self._water])
+        else:
+            for i, row in enumerate(island_map.types.tolist()):
+                for j, code in enumerate(row):
+                    self.isle_map[(i+1, j+1)] = self._classes[code](pop.get((i+1, j+1)))
+            self._land = island_map.locations()
+            self._habitable = set(self._land)
+            self._events = share_events(self.isle_map.values())
+        if columns is not None:
+            self.add_columns(columns)
+
+    def _new_cell(self, loc):
+        """Creates an empty cell for loc on a sparse island, sharing one water cell."""
+        code = self.island_map.type_at(loc)
+        if not code:
+            return self._water
+        cell = self._classes[code]()
+        cell.events = self._events
+        return cell
 
     def _set_loc(self):
         """Sets the location of the animals. Helper method to handle_migration."""
@@ -137,12 +362,16 @@ class Island:
                 south = (loc[0]+1, loc[1])
                 west = (loc[0], loc[1]-1)
                 east = (loc[0], loc[1]+1)
+                moved = 0
                 for herb in herb_migr:
                     new_location = random.choice([west, east, north, south])
                     moving_to_herb[new_location] += [herb]
+                    moved += new_location in self._habitable
                 for carn in carn_migr:
                     new_location = random.choice([west, east, north, south])
                     moving_to_carn[new_location] += [carn]
+                    moved += new_location in self._habitable
+                cell.count_migrations(moved, len(herb_migr) + len(carn_migr) - moved)
 
         self._set_loc()
         remove_herb, remove_carn = self._move(moving_to_herb, moving_to_carn)
@@ -158,6 +387,18 @@ class Island:
         """
         Represents a year passing.
         """
+        if self.timer is not None:
+            self._season_timed()
+            return
+
+        self.year += 1
+        if self.seed is not None:
+            self._season_cell_streams()
+            return
+        if self.fast or self.sparse:
+            self._season_fast()
+            return
+
         for cell in self.isle_map.values():
             if cell.habitable:
                 cell.feeding_herbs()
@@ -171,6 +412,92 @@ class Island:
                 cell.losing_weight()
                 cell.dying()
 
+    def _season_cell_streams(self):
+        """Represents a year passing, with one random number stream per cell and phase."""
+        if self.sparse:
+            cells = self.isle_map
+        else:
+            cells = {loc: cell for loc, cell in self.isle_map.items() if cell.habitable}
+        emigrants = local_phase(cells, self.seed, self.year, self._habitable)
+        settle_phase(cells, emigrants, self.seed, self.year)
+
+    def _season_timed(self):
+        """
+        Represents a year passing while the timer records the time of each phase, see
+        :mod:`biosim.timing`. Random numbers are drawn exactly as without timer.
+        """
+        timer, cells = self.timer, self.isle_map
+        timer.start_year(self.year + 1)
+        self.timer = None
+
+        def wrap(cell):
+            return timer.wrap(cell) if cell.habitable else cell
+        if self.sparse:
+            self.isle_map = SparseCells(self.island_map, lambda loc: wrap(cells[loc]))
+            self.isle_map.update({loc: wrap(cell) for loc, cell in cells.items()})
+        else:
+            self.isle_map = {loc: wrap(cell) for loc, cell in cells.items()}
+        self.handle_migration = self._timed_migration(timer)
+        start = time.perf_counter()
+        try:
+            self.season()
+        finally:
+            timer.add('season', time.perf_counter() - start)
+            del self.handle_migration
+            self.isle_map = cells
+            self.timer = timer
+
+    def _timed_migration(self, timer):
+        """Returns handle_migration recording its time as migration phase."""
+        def handle_migration():
+            start = time.perf_counter()
+            type(self).handle_migration(self)
+            timer.add('migration', time.perf_counter() - start)
+        return handle_migration
+
+    def _season_fast(self):
+        """
+        Represents a year passing, drawing the same random numbers in the same order as the
+        cell-by-cell implementation in :meth:`season` and :meth:`handle_migration`.
+
+        Migrants are removed from their cells at once instead of by list search, and are added
+        to their new cells in the same order, herbivores and carnivores separately, once all
+        cells have decided. The flags and locations used by :meth:`handle_migration` are not
+        needed, since no animal can be visited twice.
+        """
+        cells = [(loc, cell) for loc, cell in self.isle_map.items()
+                 if cell.habitable and _populated(cell)]
+        for _, cell in cells:
+            cell.feeding_herbs()
+            cell.feeding_carnivores()
+            cell.mating()
+
+        emigrants = [cell.emigrate(loc, self._habitable) for loc, cell in cells]
+        for moves in emigrants:
+            for target, (herbs, _) in moves.items():
+                self.isle_map[target].immigrate(herbs=herbs)
+        for moves in emigrants:
+            for target, (_, carns) in moves.items():
+                self.isle_map[target].immigrate(carns=carns)
+
+        for cell in self.isle_map.values():
+            if cell.habitable and _populated(cell):
+                cell.aging_and_losing_weight()
+                cell.dying()
+
+    def collect_events(self):
+        """
+        Demographic events since the last call, e.g., births, deaths and migrations, summed over
+        the island. Counting starts again from zero. The cells count into one dictionary of the
+        island, so this takes constant time.
+
+        Returns
+        -------
+        events : dict
+            Dictionary mapping the names in :data:`biosim.cell.EVENTS` to numbers of events.
+        """
+        return collect_events(self._events)
+
     def total_herb_count(self):
         """
         Counts total amount of Herbivores across the whole island.
@@ -205,6 +532,39 @@ class Island:
                 continue
         return num
 
+    def herb_distribution(self):
+        """
+        Number of herbivores in each cell, laid out like the map.
+
+        Returns
+        -------
+        distr : ndarray
+            Integer array of shape map_dims, where element [i, j] is the count in cell (i+1, j+1).
+        """
+        return self._distribution('herb_count')
+
+    def carn_distribution(self):
+        """
+        Number of carnivores in each cell, laid out like the map.
+
+        Returns
+        -------
+        distr : ndarray
+            Integer array of shape map_dims, where element [i, j] is the count in cell (i+1, j+1).
+        """
+        return self._distribution('carn_count')
+
+    def _distribution(self, method):
+        """Lays out the results of a counting method of the land cells like the map."""
+        distr = np.zeros(self.map_dims, dtype=np.int64)
+        if self.sparse:
+            for (row, col), cell in self.isle_map.items():
+                distr[row - 1, col - 1] = getattr(cell, method)()
+        else:
+            distr[self.island_map.habitable] = [getattr(self.isle_map[loc], method)()
+                                                for loc in self._land]
+        return distr
+
     def add_pop(self, pop):
         """
         Add population to island.
@@ -212,11 +572,56 @@ class Island:
         Parameters
         ----------
         pop : list of dictionaries
-            The population to be added.
+            The population to be added, or a columnar population, see :meth:`add_columns`.
         """
+        if population.is_columnar(pop):
+            self.add_columns(pop)
+            return
         for pop_dict in pop:
             self.isle_map[pop_dict['loc']].add_pop(pop_dict['pop'])
 
+    def add_columns(self, columns):
+        """
+        Adds a columnar population in one step, see :mod:`biosim.population`. All values are
+        checked before any animal is added. Animals in water cells are left out, like with
+        :meth:`add_pop`.
+
+        Parameters
+        ----------
+        columns : dict or str
+            Columnar population, or path of a ``.npz`` or CSV file holding one.
+
+        Raises
+        ------
+        KeyError, ValueError
+        """
+        cells = population.cell_populations(population.load_columns(columns))
+        for loc in cells:
+            if loc not in self.island_map:
+                raise KeyError(f'Location outside the map: {loc}')
+        for loc, animals in cells.items():
+            cell = self.isle_map[loc]
+            if cell.habitable:
+                cell.immigrate(animals.get('Herbivore', []), animals.get('Carnivore', []))
+
+    def copy_pop(self, other):
+        """
+        Replaces all animals by copies of the animals on another island with the same map.
+        Either island may be sparse.
+
+        Parameters
+        ----------
+        other : instance
+            Island instance to copy the animals from.
+        """
+        cells = other.isle_map
+        for loc, cell in self.isle_map.items():
+            if loc not in cells:
+                cell.herb_pop, cell.carn_pop = [], []
+        for loc, cell in cells.items():
+            if _populated(cell) or loc in self.isle_map:
+                self.isle_map[loc].copy_pop(cell)
+
     def get_herb_fitness(self):
         """
         Gets fitness for all herbivores in the cell.
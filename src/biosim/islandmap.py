@@ -0,0 +1,144 @@
+"""
+:mod:`biosim.islandmap` parses the map of an island once for all parts of a simulation.
+
+An :class:`IslandMap` holds the landscape of every cell as a NumPy grid, together with the
+habitable cells and their locations::
+
+    island_map = IslandMap('WWWW\\nWLHW\\nWWWW')
+    island_map.types          # array([[0, 0, 0, 0], [0, 1, 2, 0], [0, 0, 0, 0]], dtype=int8)
+    island_map.locations()    # [(2, 2), (2, 3)]
+
+Landscape types are numbered by their position in :data:`LETTERS`, so water is 0. The map is
+checked when it is compiled. :class:`biosim.simulation.BioSim` compiles the map once and passes
+the compiled map on to the island and the graphics, which accept map strings as well.
+
+A :class:`LocationMask` answers whether a location is habitable from one byte per cell, for
+sparse islands that keep no set of land locations, see :class:`biosim.island.Island`.
+"""
+
+import numpy as np
+
+LETTERS = 'WLHD'
+"""Landscape letters, in the order of their type numbers."""
+
+# Type number of each byte value, -1 for bytes that are not landscape letters
+_TYPE_OF_BYTE = np.full(256, -1, dtype=np.int8)
+_TYPE_OF_BYTE[np.frombuffer(LETTERS.encode('ascii'), dtype=np.uint8)] = np.arange(len(LETTERS))
+
+
+class IslandMap:
+    """Landscape grid of an island, parsed and checked once."""
+
+    def __init__(self, island_map):
+        """
+        Parameters
+        ----------
+        island_map : str
+            Map of the island with a letter representing each cell.
+            Legal letters: {'W', 'H', 'D', 'L'}
+
+        Raises
+        ------
+        ValueError
+            If the rows differ in length, a letter is not a landscape type, or the island is
+            not surrounded by water.
+        """
+        lines = island_map.splitlines()
+        width = len(lines[0]) if lines else 0
+        if width == 0 or any(len(line) != width for line in lines):
+            raise ValueError('The rows of the island map must all be the same length.')
+
+        text = ''.join(lines)
+        try:
+            raw = np.frombuffer(text.encode('ascii'), dtype=np.uint8)
+        except UnicodeEncodeError:
+            raw = np.frombuffer(text.encode('utf-32-le'), dtype=np.uint32)
+        types = np.where(raw < 256, _TYPE_OF_BYTE[np.minimum(raw, 255)], -1)
+        invalid = np.flatnonzero(types < 0)
+        if len(invalid):
+            raise ValueError(f'This is not a valid landscape type: {text[invalid[0]]}')
+
+        self.types = types.astype(np.int8).reshape(len(lines), width)
+        self.types.flags.writeable = False
+        edges = np.concatenate([self.types[0], self.types[-1], self.types[:, 0],
+                                self.types[:, -1]])
+        if np.any(edges != 0):
+            raise ValueError('Island is not surrounded by water')
+
+        self.text = '\n'.join(lines)
+        self.shape = self.types.shape
+        self.habitable = self.types != 0
+        self.habitable.flags.writeable = False
+
+    @classmethod
+    def compile(cls, island_map):
+        """
+        Returns island_map if it is already compiled, else the compiled map.
+
+        Parameters
+        ----------
+        island_map : str or instance
+            Map string or IslandMap instance.
+        """
+        return island_map if isinstance(island_map, cls) else cls(island_map)
+
+    def __str__(self):
+        return self.text
+
+    def __contains__(self, loc):
+        """Returns True if loc is a location (row, col) on the map, counted from 1."""
+        row, col = loc
+        return 0 < row <= self.shape[0] and 0 < col <= self.shape[1]
+
+    def type_at(self, loc):
+        """Type number of the cell at loc, see :data:`LETTERS`."""
+        return int(self.types[loc[0] - 1, loc[1] - 1])
+
+    @property
+    def letters(self):
+        """Grid of landscape letters."""
+        return np.array(list(LETTERS))[self.types]
+
+    def locations(self, landscapes='LHD'):
+        """
+        Locations of the cells of given landscape types.
+
+        Parameters
+        ----------
+        landscapes : str
+            Letters of the landscape types to include.
+
+        Returns
+        -------
+        locs : list
+            Locations (row, col), counted from 1, in map order.
+        """
+        wanted = np.isin(self.types, [LETTERS.index(letter) for letter in landscapes])
+        rows, cols = np.nonzero(wanted)
+        return list(zip((rows + 1).tolist(), (cols + 1).tolist()))
+
+
+class LocationMask:
+    """
+    Set of the locations marked in a boolean grid, taking one byte per cell instead of one tuple
+    per location. Only supports membership tests and len.
+    """
+
+    def __init__(self, mask):
+        """
+        Parameters
+        ----------
+        mask : ndarray
+            Boolean grid, element [i, j] marks location (i+1, j+1).
+        """
+        self._rows, self._cols = mask.shape
+        self._flags = np.ascontiguousarray(mask, dtype=np.uint8).tobytes()
+        self._count = int(np.count_nonzero(mask))
+
+    def __contains__(self, loc):
+        row, col = loc
+        return (0 < row <= self._rows and 0 < col <= self._cols
+                and self._flags[(row - 1) * self._cols + col - 1] == 1)
+
+    def __len__(self):
+        return self._count
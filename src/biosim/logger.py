@@ -0,0 +1,163 @@
+"""
+:mod:`biosim.logger` provides buffered, machine-readable logging for BioSim.
+
+The log is a CSV file with one row per simulated year and one column per species::
+
+    year,Herbivore,Carnivore
+    1,52,0
+    2,57,0
+
+If event logging is enabled, the numbers of births, deaths, kills, unfed herbivores and
+migrations of each year follow the counts, one column per name in :data:`biosim.cell.EVENTS`::
+
+    year,Herbivore,Carnivore,herb_births,carn_births,herb_deaths,...
+    1,52,0,9,0,7,...
+
+If per-cell logging is enabled, a companion file with the suffix ``_cells`` is written next to
+the main log. It holds one row per year and populated cell::
+
+    year,row,col,Herbivore,Carnivore
+    1,2,2,52,0
+
+Rows are kept in memory and written in blocks, so a long simulation does not open the log file
+once per year. Rows are appended to existing log files, e.g., when a simulation is resumed from a
+checkpoint, if their header matches.
+"""
+
+import os
+
+import numpy as np
+
+from .cell import EVENTS
+
+_DEFAULT_FLUSH_YEARS = 100
+
+
+class LogWriter:
+    """Buffered CSV writer for animal counts."""
+
+    species = ('Herbivore', 'Carnivore')
+
+    def __init__(self, log_file, cells=False, flush_years=None, events=False):
+        """
+        Parameters
+        ----------
+        log_file : str
+            Path to the CSV file with the total counts per species.
+        cells : bool
+            If True, per-cell counts are written to a companion file.
+        flush_years : int
+            Number of years buffered in memory before the rows are written to file.
+        events : bool
+            If True, the demographic events of each year are written to the main log.
+        """
+        if flush_years is None:
+            flush_years = _DEFAULT_FLUSH_YEARS
+        if flush_years < 1:
+            raise ValueError('flush_years must be a positive integer')
+
+        self.log_file = log_file
+        if cells:
+            root, ext = os.path.splitext(log_file)
+            self.cell_file = f'{root}_cells{ext or ".csv"}'
+        else:
+            self.cell_file = None
+        self._flush_years = flush_years
+        self.events = events
+        self._rows = []
+        self._cell_rows = []
+
+    @property
+    def header(self):
+        """Header line of the main log file."""
+        names = ('year',) + self.species + (EVENTS if self.events else ())
+        return ','.join(names) + '\n'
+
+    @property
+    def cell_header(self):
+        """Header line of the per-cell log file."""
+        return ','.join(('year', 'row', 'col') + self.species) + '\n'
+
+    def write(self, year, island, events=None):
+        """
+        Add the counts for one year to the buffer.
+
+        Parameters
+        ----------
+        year : int
+            The year the counts belong to.
+        island : instance
+            An Island instance
+        events : dict
+            Demographic events of the year, see :meth:`biosim.island.Island.collect_events`.
+            Required if events are logged.
+        """
+        row = f'{year},{island.total_herb_count()},{island.total_carn_count()}'
+        if self.events:
+            row += ''.join(f',{events[name]}' for name in EVENTS)
+        self._rows.append(row + '\n')
+
+        if self.cell_file is not None:
+            herb_distr = island.herb_distribution()
+            carn_distr = island.carn_distribution()
+            for i, j in zip(*np.nonzero(herb_distr + carn_distr)):
+                self._cell_rows.append(f'{year},{i + 1},{j + 1},{herb_distr[i, j]},'
+                                       f'{carn_distr[i, j]}\n')
+
+        if len(self._rows) >= self._flush_years:
+            self.flush()
+
+    def flush(self):
+        """Write all buffered rows to file."""
+        self._write_rows(self.log_file, self.header, self._rows)
+        self._rows = []
+        if self.cell_file is not None:
+            self._write_rows(self.cell_file, self.cell_header, self._cell_rows)
+            self._cell_rows = []
+
+    @staticmethod
+    def _write_rows(path, header, rows):
+        """
+        Appends rows to file, starting with the header if the file is new or empty.
+
+        Raises
+        ------
+        ValueError
+            If the file has a different header, e.g., a log written without events.
+        """
+        new_file = not os.path.exists(path) or os.path.getsize(path) == 0
+        if not rows and not new_file:
+            return
+        if not new_file:
+            with open(path) as logfile:
+                existing = logfile.readline()
+            if existing != header:
+                raise ValueError(f'{path} has the header {existing.strip()!r}, '
+                                 f'expected {header.strip()!r}')
+        with open(path, 'a') as logfile:
+            if new_file:
+                logfile.write(header)
+            logfile.writelines(rows)
+
+
+def read_log(log_file):
+    """
+    Read a log file written by :class:`LogWriter`.
+
+    Parameters
+    ----------
+    log_file : str
+        Path to the log file.
+
+    Returns
+    -------
+    columns : dict
+        Dictionary mapping each column name to a list of integers.
+    """
+    with open(log_file) as logfile:
+        names = logfile.readline().strip().split(',')
+        columns = {name: [] for name in names}
+        for line in logfile:
+            for name, value in zip(names, line.strip().split(',')):
+                columns[name].append(int(value))
+    return columns
@@ -0,0 +1,177 @@
+"""
+:mod:`biosim.mapgen` generates islands of any size for benchmarks and stress tests.
+
+The landscape is drawn from smoothed random noise, so that cells of the same type form
+connected regions instead of a salt-and-pepper pattern. The cells inside the water border are
+ranked by their noise value and assigned to landscape types in order, which gives exactly the
+requested fraction of each type::
+
+    island_map = generate_map(200, 300, fractions={'L': 0.5, 'H': 0.3, 'D': 0.1, 'W': 0.1},
+                              seed=3)
+    ini_pop = generate_population(island_map, herbivores=20, carnivores=5)
+
+The generated maps always have water along their edges, as required by
+:class:`biosim.island.Island`, and the same seed always gives the same map.
+"""
+
+import numpy as np
+
+from .islandmap import IslandMap
+
+DEFAULT_FRACTIONS = {'L': 0.6, 'H': 0.25, 'D': 0.15}
+
+# Order in which types are assigned from low to high noise values, so that water lies next to
+# lowland and desert next to highland
+_TYPE_ORDER = 'WLHD'
+
+
+def _smooth(noise, passes):
+    """Averages each value with its four neighbours, repeated the given number of times."""
+    for _ in range(passes):
+        padded = np.pad(noise, 1, mode='edge')
+        noise = (padded[1:-1, 1:-1] + padded[:-2, 1:-1] + padded[2:, 1:-1]
+                 + padded[1:-1, :-2] + padded[1:-1, 2:]) / 5
+    return noise
+
+
+def generate_map(rows, cols, fractions=None, seed=None, smoothness=4):
+    """
+    Generates the map of an island surrounded by water.
+
+    Parameters
+    ----------
+    rows, cols : int
+        Size of the map including the water border, both at least 3.
+    fractions : dict
+        Fraction of the cells inside the border for each landscape type, with letters from
+        {'W', 'H', 'D', 'L'} as keys. Fractions are normalised to sum to one.
+        :data:`DEFAULT_FRACTIONS` if None.
+    seed : int
+        Seed of the layout.
+    smoothness : int
+        Number of smoothing passes over the noise. Larger values give larger regions, 0 gives
+        independent cells.
+
+    Returns
+    -------
+    island_map : str
+        Map of the island with one line per row.
+
+    Raises
+    ------
+    ValueError, KeyError
+    """
+    if rows < 3 or cols < 3:
+        raise ValueError('The map must have at least 3 rows and 3 columns')
+    if fractions is None:
+        fractions = DEFAULT_FRACTIONS
+    for key, val in fractions.items():
+        if key not in _TYPE_ORDER:
+            raise KeyError(f'This is not a valid landscape type: {key}')
+        if val < 0:
+            raise ValueError('Fractions must be greater than or equal to 0')
+    total = sum(fractions.values())
+    if total <= 0:
+        raise ValueError('At least one fraction must be positive')
+
+    rng = np.random.default_rng(seed)
+    noise = _smooth(rng.random((rows - 2, cols - 2)), smoothness)
+    num_cells = noise.size
+
+    types = [letter for letter in _TYPE_ORDER if fractions.get(letter, 0) > 0]
+    bounds = np.round(np.cumsum([fractions[letter] for letter in types]) / total * num_cells)
+    letters = np.repeat(np.array(types), np.diff(np.r_[0, bounds]).astype(np.int64))
+
+    interior = np.empty(num_cells, dtype='<U1')
+    interior[np.argsort(noise, axis=None, kind='stable')] = letters
+    grid = np.full((rows, cols), 'W')
+    grid[1:-1, 1:-1] = interior.reshape(noise.shape)
+    return '\n'.join(''.join(row) for row in grid)
+
+
+def land_locations(island_map, landscapes='LHD'):
+    """
+    Locations of the cells of given landscape types.
+
+    Parameters
+    ----------
+    island_map : str or instance
+        Map of the island, or the compiled map.
+    landscapes : str
+        Letters of the landscape types to include.
+
+    Returns
+    -------
+    locs : list
+        Locations in map order.
+    """
+    return IslandMap.compile(island_map).locations(landscapes)
+
+
+def generate_population(island_map, herbivores=0, carnivores=0, age=5, weight=20,
+                        landscapes='LHD'):
+    """
+    Generates an initial population with the same animals in every land cell.
+
+    Every cell shares one list of animal dictionaries, and the list repeats one dictionary per
+    species, so even populations of millions of animals take little memory and time to build.
+    The result must therefore not be modified in place.
+
+    Parameters
+    ----------
+    island_map : str
+        Map of the island.
+    herbivores, carnivores : int
+        Number of animals of each species per cell.
+    age : int
+        Age of all animals.
+    weight : float
+        Weight of all animals.
+    landscapes : str
+        Letters of the landscape types that get animals.
+
+    Returns
+    -------
+    ini_pop : list of dictionaries
+        Population in the format expected by :class:`biosim.island.Island`.
+    """
+    pop = ([{'species': 'Herbivore', 'age': age, 'weight': weight}] * herbivores
+           + [{'species': 'Carnivore', 'age': age, 'weight': weight}] * carnivores)
+    if not pop:
+        return []
+    return [{'loc': loc, 'pop': pop} for loc in land_locations(island_map, landscapes)]
+
+
+def generate_columns(island_map, herbivores=0, carnivores=0, age=5, weight=20,
+                     landscapes='LHD'):
+    """
+    Generates the same population as :func:`generate_population`, column-wise.
+
+    Parameters
+    ----------
+    island_map : str
+        Map of the island.
+    herbivores, carnivores : int
+        Number of animals of each species per cell.
+    age : int
+        Age of all animals.
+    weight : float
+        Weight of all animals.
+    landscapes : str
+        Letters of the landscape types that get animals.
+
+    Returns
+    -------
+    columns : dict
+        Dictionary mapping 'Herbivore' and 'Carnivore' to dictionaries with the integer arrays
+        'row', 'col' and 'age' and the float array 'weight', one element per animal.
+    """
+    locs = np.array(land_locations(island_map, landscapes), dtype=np.int64).reshape(-1, 2)
+    columns = {}
+    for species, number in (('Herbivore', herbivores), ('Carnivore', carnivores)):
+        size = len(locs) * number
+        columns[species] = {'row': np.repeat(locs[:, 0], number),
+                            'col': np.repeat(locs[:, 1], number),
+                            'age': np.full(size, age, dtype=np.int64),
+                            'weight': np.full(size, weight, dtype=np.float64)}
+    return columns
@@ -0,0 +1,360 @@
+"""
+:mod:`biosim.memory_benchmark` measures the memory used by simulations, year by year.
+
+Standard scenarios are simulated with :class:`biosim.simulation.BioSim` under
+:mod:`tracemalloc`. Each scenario is a benchmark island, see :func:`biosim.benchmark.square_map`,
+with the same number of herbivores in every land cell and carnivores added in a given ratio. For
+every scenario, the following is reported:
+
+* ``peak_bytes``, the highest memory use during any year,
+* ``transient_bytes_per_year``, how far the memory use rises above its level at the start of a
+  year during the year, averaged over the years. It shows memory that is allocated and freed
+  again within the year, e.g., the lists built by ``mating`` and ``dying``,
+* ``bytes_per_animal``, the memory held at the end divided by the number of live animals.
+
+The memory held at the end of each year is broken down by module: every memory block is assigned
+to the innermost module of the package on the call stack that allocated it, and
+:data:`MODULES` are reported separately, all other modules as ``other``. For each module,
+``peak_bytes``, ``bytes_per_animal`` and ``net_blocks_per_year`` are reported. The latter is the
+change of the number of blocks held from the end of one year to the end of the next, not a
+count of allocations: :mod:`tracemalloc` only knows the blocks still held, so blocks allocated
+and freed within a year do not show up in the module figures. Such short-lived memory only
+shows up in ``transient_bytes_per_year``.
+
+Results are written as JSON and compared with a baseline::
+
+    python -m biosim.memory_benchmark --preset quick
+    python -m biosim.memory_benchmark --preset quick --output memory.json --no-baseline
+    python -m biosim.memory_benchmark --preset quick --baseline memory.json --threshold 0.1
+
+The first command compares with the baseline of the preset stored with the package, see
+:func:`baseline_path`, the last one with results saved before. Both exit with status 1 if any
+metric is more than 10 % above the baseline. Memory use depends on the versions of Python,
+NumPy and matplotlib, so record a new baseline with ``--output`` after changing them. Scenarios
+with graphics need a non-interactive matplotlib backend, e.g. ``MPLBACKEND=Agg``.
+"""
+
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+import tracemalloc
+
+import matplotlib.pyplot as plt
+import numpy as np
+
+from .benchmark import populate, square_map, _DATA_DIR
+from .simulation import BioSim
+from . import state
+
+MODULES = ('animal.py', 'cell.py', 'island.py', 'graphics.py')
+
+SCENARIOS = {
+    'herbivores': {'size': 10, 'density': 20, 'ratio': 0.0, 'vis_years': 0},
+    'predators': {'size': 10, 'density': 20, 'ratio': 0.2, 'vis_years': 0},
+    'explosion': {'size': 20, 'density': 2, 'ratio': 0.0, 'vis_years': 0},
+    'graphics': {'size': 6, 'density': 10, 'ratio': 0.2, 'vis_years': 5},
+}
+"""Island size, herbivores per land cell, carnivores per herbivore and graphics interval."""
+
+PRESETS = {
+    'quick': {'scenarios': list(SCENARIOS), 'years': 5},
+    'full': {'scenarios': list(SCENARIOS), 'years': 30},
+}
+
+_DEFAULT_THRESHOLD = 0.1
+
+# Changes of block counts smaller than this are not regressions, as caches of Python and NumPy
+# add a few blocks now and then
+_BLOCK_SLACK = 16
+
+# Number of frames stored per memory block, enough to reach a module of the package from the
+# inside of matplotlib. Deep tracebacks make tracing matplotlib slow, so the graphics scenario
+# only draws every few years.
+_DEFAULT_FRAMES = 30
+
+_PACKAGE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def baseline_path(preset):
+    """
+    Path of the baseline stored with the package for a preset.
+
+    Parameters
+    ----------
+    preset : str
+        Name of a preset in :data:`PRESETS`.
+
+    Returns
+    -------
+    path : str or None
+        Path of the JSON file, None if no baseline is stored for the preset.
+    """
+    path = os.path.join(_DATA_DIR, f'memory_{preset}.json')
+    return path if os.path.exists(path) else None
+
+
+def _module(traceback, packaged):
+    """
+    Name of the innermost module of the package in a traceback, or 'other'. packaged caches
+    the module name, or None, of every file name seen.
+    """
+    for frame in reversed(traceback):
+        filename = frame.filename
+        if filename not in packaged:
+            in_package = os.path.dirname(filename) == _PACKAGE_DIR
+            packaged[filename] = os.path.basename(filename) if in_package else None
+        if packaged[filename] is not None:
+            return packaged[filename]
+    return 'other'
+
+
+def module_usage(snapshot):
+    """
+    Memory held per module.
+
+    Parameters
+    ----------
+    snapshot : instance
+        :class:`tracemalloc.Snapshot` instance.
+
+    Returns
+    -------
+    usage : dict
+        Dictionary mapping the names in :data:`MODULES` and 'other' to the number of bytes and
+        the number of blocks held. Blocks held by this module are left out.
+    """
+    usage = {module: [0, 0] for module in MODULES + ('other',)}
+    own = os.path.basename(__file__)
+    packaged = {}
+    for stat in snapshot.statistics('traceback'):
+        module = _module(stat.traceback, packaged)
+        if module == own:
+            continue
+        counts = usage[module if module in usage else 'other']
+        counts[0] += stat.size
+        counts[1] += stat.count
+    return {module: tuple(counts) for module, counts in usage.items()}
+
+
+def _make_sim(scenario, seed):
+    """Creates the simulation of a scenario."""
+    ini_pop = populate(scenario['size'], scenario['density'], scenario['ratio'])
+    return BioSim(square_map(scenario['size']), ini_pop, seed, vis_years=scenario['vis_years'])
+
+
+def _close(sim):
+    """Closes the figure of a simulation, if any."""
+    if sim.figure is not None:
+        plt.close(sim.figure)
+
+
+def measure(name, years=5, seed=1, frames=_DEFAULT_FRAMES):
+    """
+    Measures the memory used by one scenario.
+
+    The scenario is simulated until the graphics have been drawn once before measuring, so that
+    modules and caches loaded on first use, e.g., fonts, are not counted. The simulation runs
+    with the default parameters, and the parameters of the classes are restored afterwards.
+
+    Parameters
+    ----------
+    name : str
+        Name of the scenario in :data:`SCENARIOS`.
+    years : int
+        Number of years measured.
+    seed : int
+        Random number seed.
+    frames : int
+        Number of frames stored per memory block.
+
+    Returns
+    -------
+    result : dict
+        Dictionary with the 'name', 'years' and live 'animals' at the end, 'peak_bytes',
+        'transient_bytes_per_year', 'bytes_per_animal' and 'modules' mapping module names to
+        dictionaries with 'peak_bytes', 'net_blocks_per_year' and 'bytes_per_animal'.
+    """
+    scenario = SCENARIOS[name]
+    with state.preserved_params(state.default_params()):
+        warmup = _make_sim(scenario, seed)
+        warmup.simulate(max(1, scenario['vis_years']))
+        _close(warmup)
+        del warmup
+
+        tracemalloc.start(frames)
+        try:
+            sim = _make_sim(scenario, seed)
+            previous = module_usage(tracemalloc.take_snapshot())
+            peaks, transients = [], []
+            module_peaks = dict.fromkeys(previous, 0)
+            net_blocks = {module: [] for module in previous}
+            for _ in range(years):
+                start, _ = tracemalloc.get_traced_memory()
+                tracemalloc.reset_peak()
+                sim.simulate(1)
+                _, peak = tracemalloc.get_traced_memory()
+                peaks.append(peak)
+                transients.append(peak - start)
+                usage = module_usage(tracemalloc.take_snapshot())
+                for module, (size, blocks) in usage.items():
+                    module_peaks[module] = max(module_peaks[module], size)
+                    net_blocks[module].append(blocks - previous[module][1])
+                previous = usage
+            animals = sim.num_animals
+            _close(sim)
+        finally:
+            tracemalloc.stop()
+
+    per_animal = max(animals, 1)
+    return {'name': name, 'years': years, 'animals': animals,
+            'peak_bytes': max(peaks),
+            'transient_bytes_per_year': float(np.mean(transients)),
+            'bytes_per_animal': sum(size for size, _ in previous.values()) / per_animal,
+            'modules': {module: {'peak_bytes': module_peaks[module],
+                                 'net_blocks_per_year': float(np.mean(net_blocks[module])),
+                                 'bytes_per_animal': previous[module][0] / per_animal}
+                        for module in previous}}
+
+
+def run_suite(scenarios=None, years=5, seed=1, frames=_DEFAULT_FRAMES, progress=None):
+    """
+    Measures several scenarios.
+
+    Parameters
+    ----------
+    scenarios : list
+        Names of scenarios in :data:`SCENARIOS`, all if None.
+    years, seed, frames
+        See :func:`measure`.
+    progress : callable
+        If given, called with the result of each scenario when it is finished.
+
+    Returns
+    -------
+    results : dict
+        Dictionary with an entry 'machine' describing the platform and an entry 'cases' with
+        the list of results of :func:`measure`.
+    """
+    if scenarios is None:
+        scenarios = list(SCENARIOS)
+    cases = []
+    for name in scenarios:
+        cases.append(measure(name, years, seed, frames))
+        if progress is not None:
+            progress(cases[-1])
+    return {'machine': {'python': platform.python_version(), 'numpy': np.__version__,
+                        'platform': platform.platform(),
+                        'time': time.strftime('%Y-%m-%dT%H:%M:%S')},
+            'cases': cases}
+
+
+def _metrics(case):
+    """All compared metrics of a case, as (name, value) pairs."""
+    metrics = [(metric, case[metric])
+               for metric in ('peak_bytes', 'transient_bytes_per_year', 'bytes_per_animal')]
+    for module, values in case['modules'].items():
+        metrics += [(f'{module}:{metric}', value) for metric, value in values.items()]
+    return metrics
+
+
+def compare(results, baseline, threshold=_DEFAULT_THRESHOLD):
+    """
+    Compares memory benchmark results with a baseline.
+
+    Parameters
+    ----------
+    results, baseline : dict
+        Results of :func:`run_suite`. Only cases present in both and measured over the same
+        number of years are compared.
+    threshold : float
+        A metric more than this fraction above a positive baseline value is a regression. Block
+        counts must also grow by more than a few blocks per year.
+
+    Returns
+    -------
+    regressions : list
+        One dictionary per regression with the keys 'name', 'metric', 'baseline', 'current'
+        and 'ratio'.
+    """
+    reference = {(case['name'], case['years']): dict(_metrics(case))
+                 for case in baseline['cases']}
+    regressions = []
+    for case in results['cases']:
+        if (case['name'], case['years']) not in reference:
+            continue
+        old = reference[case['name'], case['years']]
+        for metric, after in _metrics(case):
+            before = old.get(metric, 0)
+            slack = _BLOCK_SLACK if metric.endswith('blocks_per_year') else 0
+            if before > 0 and after > (1 + threshold) * before and after - before > slack:
+                regressions.append({'name': case['name'], 'metric': metric, 'baseline': before,
+                                    'current': after, 'ratio': after / before})
+    return regressions
+
+
+def main(argv=None):
+    """
+    Runs the memory benchmark from the command line.
+
+    Parameters
+    ----------
+    argv : list
+        Command line arguments, sys.argv[1:] if None.
+
+    Returns
+    -------
+    status : int
+        1 if a regression was found, 0 otherwise.
+    """
+    parser = argparse.ArgumentParser(prog='python -m biosim.memory_benchmark',
+                                     description='Measure the memory use of BioSim years.')
+    parser.add_argument('--preset', choices=sorted(PRESETS), default='quick')
+    parser.add_argument('--scenarios', nargs='+', choices=sorted(SCENARIOS))
+    parser.add_argument('--years', type=int, help='years measured per scenario')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--frames', type=int, default=_DEFAULT_FRAMES,
+                        help='frames stored per memory block')
+    parser.add_argument('--output', help='write results to this JSON file')
+    parser.add_argument('--baseline',
+                        help='compare with results in this JSON file (default: the baseline '
+                             'stored for the preset)')
+    parser.add_argument('--no-baseline', action='store_true', help='do not compare')
+    parser.add_argument('--threshold', type=float, default=_DEFAULT_THRESHOLD,
+                        help='allowed relative increase of every metric')
+    args = parser.parse_args(argv)
+
+    preset = PRESETS[args.preset]
+
+    def progress(case):
+        print(f'{case["name"]:<12} peak {case["peak_bytes"] / 1024:10.1f} KiB  '
+              f'transient/year {case["transient_bytes_per_year"] / 1024:10.1f} KiB  '
+              f'per animal {case["bytes_per_animal"]:8.1f} B  animals {case["animals"]}')
+
+    results = run_suite(args.scenarios or preset['scenarios'], args.years or preset['years'],
+                        args.seed, args.frames, progress)
+    if args.output is not None:
+        with open(args.output, 'w') as output:
+            json.dump(results, output, indent=2)
+
+    if args.no_baseline:
+        return 0
+    if args.baseline is None:
+        args.baseline = baseline_path(args.preset)
+        if args.baseline is None:
+            print(f'No baseline stored for preset {args.preset}')
+            return 0
+    with open(args.baseline) as baseline_file:
+        baseline = json.load(baseline_file)
+    regressions = compare(results, baseline, args.threshold)
+    for regression in regressions:
+        print(f'REGRESSION {regression["name"]} {regression["metric"]}: '
+              f'{regression["baseline"]:.1f} -> {regression["current"]:.1f} '
+              f'({regression["ratio"]:.2f}x)')
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,564 @@
+"""
+:mod:`biosim.parallel` simulates one island on several processor cores.
+
+The habitable cells are split into tiles of neighbouring cells, and each tile is owned by a
+worker process that keeps the cells and their animals for the whole simulation. A year is
+simulated in two steps:
+
+1. Every worker lets the animals in its cells feed, mate and decide where to migrate. Animals
+   moving to a cell of the same tile stay in the worker; only animals crossing to a cell of
+   another tile are sent to the parent process, column-wise, and passed on to the owner.
+2. Every worker places the arriving animals and lets all animals age, lose weight and die.
+
+The number of animals in each cell is kept in a count grid in shared memory, see
+:mod:`biosim.shared`, which the workers update in place. Age, weight and fitness of all animals
+are written to shared memory on request. The parent process reads both without any animals
+being pickled.
+
+Animals gather in a few cells, so tiles with equal numbers of cells would leave most workers
+idle. The tiles are therefore sized by the number of animals per cell, and are resized between
+years as the population moves, see :meth:`ParallelIsland.rebalance`. The time each worker spends
+on its tile is measured, so a worker that keeps falling behind gets fewer animals, and a worker
+that falls far behind in a single year triggers an immediate resize.
+
+Each phase of each cell draws its random numbers from its own stream, see :mod:`biosim.rng`,
+and arriving animals are placed in the order of the cells they come from. The result therefore
+does not depend on the number of workers or on how the cells are split into tiles.
+"""
+
+import multiprocessing
+import os
+import time
+import weakref
+
+import numpy as np
+
+from .animal import Herbivore, Carnivore
+from .cell import EVENTS
+from .island import Island, collect_events, local_phase, settle_phase, share_events
+from .shared import SharedArray
+from . import population, state
+
+# Initial number of animals per species a worker can publish to shared memory
+_VALUES_CAPACITY = 1024
+
+# Cells are only moved between workers if the expected load of the busiest worker exceeds the
+# mean load by more than this fraction
+_IMBALANCE_TOLERANCE = 0.1
+
+# Weight of the latest measurement in the running estimate of worker speeds
+_SPEED_SMOOTHING = 0.5
+
+
+def partition(locs, num_tiles, weights=None, shares=None):
+    """
+    Splits cell locations into tiles of neighbouring cells with similar amounts of work.
+
+    Tiles are runs of consecutive locations in map order. The runs are chosen such that the
+    total weight of each tile is as close as possible to its share of the total weight.
+
+    Parameters
+    ----------
+    locs : list
+        Cell locations in map order.
+    num_tiles : int
+        Number of tiles.
+    weights : list
+        Expected amount of work for each location, the same for all locations if None.
+    shares : list
+        Fraction of the total work for each tile, equal fractions if None.
+
+    Returns
+    -------
+    tiles : list
+        List of lists of locations.
+    """
+    if weights is None:
+        weights = np.ones(len(locs))
+    if shares is None:
+        shares = np.ones(num_tiles)
+    cumulative = np.cumsum(weights, dtype=np.float64)
+    targets = np.cumsum(shares, dtype=np.float64)[:-1] / np.sum(shares) * cumulative[-1:].sum()
+    # Each location belongs to the tile whose target range contains the middle of its weight
+    centres = cumulative - np.asarray(weights, dtype=np.float64) / 2
+    bounds = np.r_[0, np.searchsorted(centres, targets), len(locs)]
+    return [locs[start:stop] for start, stop in zip(bounds[:-1], bounds[1:])]
+
+
+def cell_weights(locs, counts):
+    """
+    Estimates the amount of work for each cell from the number of animals in it.
+
+    Parameters
+    ----------
+    locs : list
+        Cell locations.
+    counts : ndarray
+        Count grid of shape (rows, cols, 2).
+
+    Returns
+    -------
+    weights : ndarray
+        One plus the number of animals in each cell.
+    """
+    rows, cols = np.array(locs, dtype=np.int64).reshape(-1, 2).T
+    return 1.0 + counts[rows - 1, cols - 1].sum(axis=1)
+
+
+def _write_counts(cells, counts):
+    """Writes the number of animals in each cell to the shared count grid."""
+    for (row, col), cell in cells.items():
+        counts[row - 1, col - 1] = cell.herb_count(), cell.carn_count()
+
+
+def _write_values(cells, block):
+    """
+    Writes age, weight and fitness of all animals to a shared block of shape (2, 3, capacity).
+    Returns the number of herbivores and carnivores, or None if the block is too small.
+    """
+    herbs = [herb for cell in cells.values() for herb in cell.herb_pop]
+    carns = [carn for cell in cells.values() for carn in cell.carn_pop]
+    if max(len(herbs), len(carns)) > block.shape[2]:
+        return None
+    for species, animals in enumerate((herbs, carns)):
+        block[species, 0, :len(animals)] = [animal.age for animal in animals]
+        block[species, 1, :len(animals)] = [animal.weight for animal in animals]
+        block[species, 2, :len(animals)] = [animal.fitness for animal in animals]
+    return len(herbs), len(carns)
+
+
+def _worker(conn, cells, habitable, owner, worker_id, master_seed, counts_spec):
+    """Main loop of a worker process owning the given cells."""
+    counts = SharedArray.attach(counts_spec)
+    events = share_events(cells.values())
+    values = None
+    pending = []
+    while True:
+        message = conn.recv()
+        command = message[0]
+        if command == 'local':
+            start = time.perf_counter()
+            _, year, params = message
+            state.set_params(params)
+            pending, remote = [], {}
+            for target, source, herbs, carns in local_phase(cells, master_seed, year, habitable):
+                if owner[target] == worker_id:
+                    pending.append((target, source, herbs, carns))
+                else:
+                    remote.setdefault(owner[target], []).append(
+                        (target, source, state.animals_to_arrays(herbs),
+                         state.animals_to_arrays(carns)))
+            busy = time.perf_counter() - start
+            conn.send(remote)
+        elif command == 'settle':
+            start = time.perf_counter()
+            _, year, incoming = message
+            arrivals = pending + [(target, source, state.animals_from_arrays(Herbivore, *herbs),
+                                   state.animals_from_arrays(Carnivore, *carns))
+                                  for target, source, herbs, carns in incoming]
+            pending = []
+            settle_phase(cells, arrivals, master_seed, year)
+            _write_counts(cells, counts.array)
+            busy += time.perf_counter() - start
+            conn.send((busy, collect_events(events)))
+        elif command == 'add':
+            for loc, pop in message[1]:
+                cells[loc].add_pop(pop)
+            _write_counts(cells, counts.array)
+            conn.send(None)
+        elif command == 'columns':
+            for loc, animals in population.cell_populations(message[1]).items():
+                cells[loc].herb_pop.extend(animals.get('Herbivore', []))
+                cells[loc].carn_pop.extend(animals.get('Carnivore', []))
+            _write_counts(cells, counts.array)
+            conn.send(None)
+        elif command == 'get':
+            conn.send({loc: (state.animals_to_arrays(cell.herb_pop),
+                             state.animals_to_arrays(cell.carn_pop))
+                       for loc, cell in cells.items()})
+        elif command == 'values':
+            if values is None or values.name != message[1][0]:
+                if values is not None:
+                    values.close()
+                values = SharedArray.attach(message[1])
+            conn.send(_write_values(cells, values.array))
+        elif command == 'set':
+            for loc, (herbs, carns) in message[1].items():
+                cells[loc].herb_pop = state.animals_from_arrays(Herbivore, *herbs)
+                cells[loc].carn_pop = state.animals_from_arrays(Carnivore, *carns)
+            _write_counts(cells, counts.array)
+            conn.send(None)
+        elif command == 'release':
+            released = {}
+            for loc in message[1]:
+                cell = cells.pop(loc)
+                released[loc] = (type(cell), state.animals_to_arrays(cell.herb_pop),
+                                 state.animals_to_arrays(cell.carn_pop))
+            conn.send(released)
+        elif command == 'adopt':
+            _, owner, adopted = message
+            for loc, (cls, herbs, carns) in adopted.items():
+                cell = cls()
+                cell.events = events
+                cell.herb_pop = state.animals_from_arrays(Herbivore, *herbs)
+                cell.carn_pop = state.animals_from_arrays(Carnivore, *carns)
+                cells[loc] = cell
+            cells = dict(sorted(cells.items()))
+            conn.send(None)
+        elif command == 'close':
+            counts.close()
+            if values is not None:
+                values.close()
+            conn.close()
+            return
+
+
+def _shutdown(conns, procs, blocks):
+    """Stops the worker processes and frees the shared memory."""
+    for conn in conns:
+        try:
+            conn.send(('close',))
+            conn.close()
+        except (OSError, ValueError):
+            pass
+    for proc in procs:
+        proc.join(timeout=5)
+        if proc.is_alive():
+            proc.terminate()
+    for block in blocks:
+        block.unlink()
+    blocks.clear()
+
+
+class ParallelIsland:
+    """
+    Island whose cells are simulated by several worker processes.
+
+    The class provides the same methods for running and inspecting the simulation as
+    :class:`biosim.island.Island`.
+    """
+
+    def __init__(self, island_map, ini_pop=None, seed=0, workers=None, rebalance_years=1,
+                 straggler_factor=2.0):
+        """
+        Parameters
+        ----------
+        island_map : str or instance
+            Map of the island with a letter representing each cell, or the map compiled by
+            :class:`biosim.islandmap.IslandMap`.
+            Legal letters: {'W', 'H', 'D', 'L'}
+        ini_pop : list of dictionaries
+            The initial population
+        seed : int
+            Master seed of the per-cell random number streams.
+        workers : int
+            Number of worker processes, one per CPU if None.
+        rebalance_years : int
+            The tiles are resized to the current number of animals per cell every
+            rebalance_years years. Tiles are never resized if None.
+        straggler_factor : float
+            A worker that was busy more than straggler_factor times as long as the average
+            worker causes the tiles to be resized after the current year, whatever
+            rebalance_years is.
+        """
+        if rebalance_years is not None and rebalance_years < 1:
+            raise ValueError('rebalance_years must be a positive integer')
+        if straggler_factor <= 1:
+            raise ValueError('straggler_factor must be greater than 1')
+
+        isle = Island(island_map, ini_pop)
+        self.map_dims = isle.map_dims
+        self.year = 0
+        self._island_map = isle.island_map
+        self._seed = seed
+        self._rebalance_years = rebalance_years
+        self._straggler_factor = straggler_factor
+
+        locs = isle.island_map.locations()
+        if workers is None:
+            workers = os.cpu_count()
+        workers = max(1, min(workers, len(locs)))
+        self._locs = locs
+        self._speeds = np.ones(workers)
+        self._events = dict.fromkeys(EVENTS, 0)
+        self._counts = SharedArray(self.map_dims + (2,), 'int64')
+        _write_counts({loc: isle.isle_map[loc] for loc in locs}, self._counts.array)
+        self._tiles = partition(locs, workers, weights=cell_weights(locs, self._counts.array))
+        self._owner = {loc: k for k, tile in enumerate(self._tiles) for loc in tile}
+        self._value_blocks = [SharedArray((2, 3, _VALUES_CAPACITY), 'float64')
+                              for _ in self._tiles]
+        self._blocks = [self._counts] + self._value_blocks
+
+        context = multiprocessing.get_context()
+        self._conns = []
+        self._procs = []
+        for k, tile in enumerate(self._tiles):
+            parent_conn, child_conn = context.Pipe()
+            proc = context.Process(target=_worker,
+                                   args=(child_conn, {loc: isle.isle_map[loc] for loc in tile},
+                                         set(locs), self._owner, k, seed, self._counts.spec),
+                                   daemon=True)
+            proc.start()
+            child_conn.close()
+            self._conns.append(parent_conn)
+            self._procs.append(proc)
+        self._finalizer = weakref.finalize(self, _shutdown, self._conns, self._procs,
+                                           self._blocks)
+
+    @property
+    def workers(self):
+        """Number of worker processes."""
+        return len(self._procs)
+
+    def close(self):
+        """Stops the worker processes."""
+        self._finalizer()
+
+    def _broadcast(self, messages):
+        """Sends one message to each worker and returns the replies."""
+        for conn, message in zip(self._conns, messages):
+            conn.send(message)
+        return [conn.recv() for conn in self._conns]
+
+    def season(self):
+        """
+        Represents a year passing.
+        """
+        self.year += 1
+        params = state.get_params()
+        weights = cell_weights(self._locs, self._counts.array)
+        replies = self._broadcast([('local', self.year, params)] * self.workers)
+
+        incoming = [[] for _ in range(self.workers)]
+        for remote in replies:
+            for worker_id, emigrants in remote.items():
+                incoming[worker_id].extend(emigrants)
+
+        replies = self._broadcast([('settle', self.year, arrivals) for arrivals in incoming])
+        busy = [seconds for seconds, _ in replies]
+        for _, events in replies:
+            for name, count in events.items():
+                self._events[name] += count
+        self._update_speeds(weights, np.array(busy))
+
+        straggling = np.max(busy) > self._straggler_factor * np.mean(busy)
+        scheduled = (self._rebalance_years is not None
+                     and self.year % self._rebalance_years == 0)
+        if straggling or scheduled:
+            self.rebalance()
+
+    def _tile_work(self, weights):
+        """Total weight of the cells in each tile."""
+        index = {loc: k for k, loc in enumerate(self._locs)}
+        return np.array([sum(weights[index[loc]] for loc in tile) for tile in self._tiles])
+
+    def _update_speeds(self, weights, busy):
+        """Updates the running estimate of the amount of work each worker does per second."""
+        work = self._tile_work(weights)
+        measured = (busy > 0) & (work > 0)
+        speeds = np.where(measured, work / np.where(measured, busy, 1), self._speeds)
+        # Only relative speeds matter, so measurements are normalised before smoothing
+        speeds = speeds / np.mean(speeds)
+        self._speeds = (1 - _SPEED_SMOOTHING) * self._speeds + _SPEED_SMOOTHING * speeds
+
+    def rebalance(self):
+        """
+        Resizes the tiles to the current number of animals per cell and the measured speed of
+        each worker. Cells are moved between workers with their animals.
+
+        Returns
+        -------
+        moved : int
+            Number of cells that changed owner.
+        """
+        weights = cell_weights(self._locs, self._counts.array)
+        loads = self._tile_work(weights) / self._speeds
+        if np.max(loads) <= (1 + _IMBALANCE_TOLERANCE) * np.mean(loads):
+            return 0
+
+        tiles = partition(self._locs, self.workers, weights=weights, shares=self._speeds)
+        owner = {loc: k for k, tile in enumerate(tiles) for loc in tile}
+        leaving = [[] for _ in range(self.workers)]
+        for loc in self._locs:
+            if owner[loc] != self._owner[loc]:
+                leaving[self._owner[loc]].append(loc)
+        if not any(leaving):
+            return 0
+
+        adopted = [{} for _ in range(self.workers)]
+        for released in self._broadcast([('release', locs) for locs in leaving]):
+            for loc, cell in released.items():
+                adopted[owner[loc]][loc] = cell
+        self._broadcast([('adopt', owner, cells) for cells in adopted])
+        self._tiles = tiles
+        self._owner = owner
+        return sum(len(locs) for locs in leaving)
+
+    def collect_events(self):
+        """
+        Demographic events since the last call, summed over the island, see
+        :meth:`biosim.island.Island.collect_events`.
+        """
+        events = self._events
+        self._events = dict.fromkeys(EVENTS, 0)
+        return events
+
+    def add_pop(self, pop):
+        """
+        Add population to island.
+
+        Parameters
+        ----------
+        pop : list of dictionaries
+            The population to be added.
+        """
+        if population.is_columnar(pop):
+            self.add_columns(pop)
+            return
+        additions = [[] for _ in range(self.workers)]
+        for pop_dict in pop:
+            loc = pop_dict['loc']
+            if loc in self._owner:
+                additions[self._owner[loc]].append((loc, pop_dict['pop']))
+            elif not 0 < loc[0] <= self.map_dims[0] or not 0 < loc[1] <= self.map_dims[1]:
+                raise KeyError(f'Location outside the map: {loc}')
+        self._broadcast([('add', added) for added in additions])
+
+    def add_columns(self, columns):
+        """
+        Adds a columnar population, see :meth:`biosim.island.Island.add_columns`. The animals
+        are sent to their workers as arrays.
+        """
+        columns = population.load_columns(columns)
+        owner = np.full(self.map_dims, -1)
+        owner[self._island_map.habitable] = [self._owner[loc] for loc in self._locs]
+        owners = {}
+        for species, values in columns.items():
+            rows, cols = values['row'], values['col']
+            outside = ((rows < 1) | (rows > self.map_dims[0]) | (cols < 1)
+                       | (cols > self.map_dims[1]))
+            if np.any(outside):
+                index = np.flatnonzero(outside)[0]
+                raise KeyError(f'Location outside the map: {(int(rows[index]), int(cols[index]))}')
+            owners[species] = owner[rows - 1, cols - 1]
+        self._broadcast([('columns', {species: {field: array[owners[species] == worker_id]
+                                                for field, array in values.items()}
+                                      for species, values in columns.items()})
+                         for worker_id in range(self.workers)])
+
+    def _gather(self):
+        """Returns a dictionary mapping each habitable location to the columns of its animals."""
+        cells = {}
+        for reply in self._broadcast([('get',)] * self.workers):
+            cells.update(reply)
+        return cells
+
+    def to_island(self):
+        """
+        Copies the current state into an :class:`biosim.island.Island`.
+
+        Returns
+        -------
+            Island instance
+        """
+        isle = Island(self._island_map)
+        for loc, (herbs, carns) in self._gather().items():
+            isle.isle_map[loc].herb_pop = state.animals_from_arrays(Herbivore, *herbs)
+            isle.isle_map[loc].carn_pop = state.animals_from_arrays(Carnivore, *carns)
+        return isle
+
+    @property
+    def isle_map(self):
+        """Snapshot of all cells, see :meth:`to_island`. Changes are not sent to the workers."""
+        return self.to_island().isle_map
+
+    def copy_pop(self, other):
+        """
+        Replaces all animals by copies of the animals on another island with the same map.
+
+        Parameters
+        ----------
+        other : instance
+            Island or ParallelIsland instance to copy the animals from.
+        """
+        cells = other.isle_map
+        self._broadcast([('set', {loc: (state.animals_to_arrays(cells[loc].herb_pop),
+                                        state.animals_to_arrays(cells[loc].carn_pop))
+                                  for loc in tile})
+                         for tile in self._tiles])
+
+    def total_herb_count(self):
+        """Counts total amount of Herbivores across the whole island."""
+        return int(self._counts.array[:, :, 0].sum())
+
+    def total_carn_count(self):
+        """Counts total amount of Carnivores across the whole island."""
+        return int(self._counts.array[:, :, 1].sum())
+
+    def herb_distribution(self):
+        """Number of herbivores in each cell, laid out like the map."""
+        return self._counts.array[:, :, 0].copy()
+
+    def carn_distribution(self):
+        """Number of carnivores in each cell, laid out like the map."""
+        return self._counts.array[:, :, 1].copy()
+
+    def _publish(self):
+        """
+        Lets every worker write age, weight and fitness of its animals to shared memory.
+
+        Returns
+        -------
+        sizes : list
+            Number of herbivores and carnivores written by each worker.
+        """
+        sizes = self._broadcast([('values', block.spec) for block in self._value_blocks])
+        for worker_id, size in enumerate(sizes):
+            while size is None:
+                old = self._value_blocks[worker_id]
+                self._blocks.remove(old)
+                old.unlink()
+                needed = max(self._worker_population(worker_id))
+                new = SharedArray((2, 3, max(2 * old.shape[2], needed)), 'float64')
+                self._value_blocks[worker_id] = new
+                self._blocks.append(new)
+                self._conns[worker_id].send(('values', new.spec))
+                size = self._conns[worker_id].recv()
+            sizes[worker_id] = size
+        return sizes
+
+    def _worker_population(self, worker_id):
+        """Number of herbivores and carnivores in the tile of a worker."""
+        counts = self._counts.array
+        return [sum(int(counts[row - 1, col - 1, species]) for row, col in self._tiles[worker_id])
+                for species in (0, 1)]
+
+    def _values(self, species, column):
+        sizes = self._publish()
+        values = np.concatenate([block.array[species, column, :size[species]]
+                                 for block, size in zip(self._value_blocks, sizes)])
+        return (values.astype(np.int64) if column == 0 else values).tolist()
+
+    def get_herb_fitness(self):
+        """Fitness of all herbivores."""
+        return self._values(0, 2)
+
+    def get_carn_fitness(self):
+        """Fitness of all carnivores."""
+        return self._values(1, 2)
+
+    def get_herb_age(self):
+        """Age of all herbivores."""
+        return self._values(0, 0)
+
+    def get_carn_age(self):
+        """Age of all carnivores."""
+        return self._values(1, 0)
+
+    def get_herb_weight(self):
+        """Weight of all herbivores."""
+        return self._values(0, 1)
+
+    def get_carn_weight(self):
+        """Weight of all carnivores."""
+        return self._values(1, 1)
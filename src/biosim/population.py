@@ -0,0 +1,220 @@
+"""
+:mod:`biosim.population` loads large populations column-wise.
+
+Instead of one dictionary per animal, a columnar population holds one array per property and
+species, with one element per animal::
+
+    {'Herbivore': {'row': array([2, 2, 3]), 'col': array([2, 2, 4]),
+                   'age': array([5, 5, 1]), 'weight': array([20., 20., 8.])},
+     'Carnivore': {...}}
+
+This is the format of :func:`biosim.mapgen.generate_columns`. Columnar populations can be passed
+wherever a list of population dictionaries is accepted, e.g., to
+:class:`biosim.simulation.BioSim` and :meth:`biosim.simulation.BioSim.add_population`, as
+dictionary or as the path of a file written by :func:`write_columns`:
+
+* ``.npz`` files hold the arrays under the keys ``'<species>_<field>'``, e.g.
+  ``'Herbivore_age'``,
+* other files are read as CSV with the header ``species,row,col,age,weight`` in any order.
+
+All values are checked at once before any animal is created, and the animals are created
+without checking them one by one. Within a cell, animals keep the order of the arrays.
+"""
+
+from contextlib import contextmanager
+import gc
+import os
+import warnings
+
+import numpy as np
+
+from .animal import Herbivore, Carnivore
+
+SPECIES = {'Herbivore': Herbivore, 'Carnivore': Carnivore}
+FIELDS = ('row', 'col', 'age', 'weight')
+
+
+def is_columnar(pop):
+    """Returns True if pop is a columnar population or the path of one."""
+    return isinstance(pop, (dict, str, os.PathLike))
+
+
+def _integers(values, name):
+    """Converts values to integers, raising ValueError if any value is not a whole number."""
+    values = np.asarray(values)
+    if values.dtype.kind in 'iu':
+        return values.astype(np.int64)
+    values = values.astype(np.float64)
+    if not np.all(np.isfinite(values)) or np.any(values != np.round(values)):
+        raise ValueError(f'{name} must be whole numbers')
+    return values.astype(np.int64)
+
+
+def validate_columns(columns):
+    """
+    Checks a columnar population.
+
+    Parameters
+    ----------
+    columns : dict
+        Dictionary mapping species names to dictionaries with the arrays in :data:`FIELDS`.
+
+    Returns
+    -------
+    columns : dict
+        The same population with integer arrays 'row', 'col' and 'age' and float array
+        'weight'.
+
+    Raises
+    ------
+    KeyError
+        If a species is not valid or a field is missing.
+    ValueError
+        If the arrays of a species differ in length, or any age or weight is negative, or an
+        age, row or column is not a whole number.
+    """
+    checked = {}
+    for species, fields in columns.items():
+        if species not in SPECIES:
+            raise KeyError(f'This is not a valid species: {species}')
+        for field in FIELDS:
+            if field not in fields:
+                raise KeyError(f'Missing field {field} for {species}')
+        values = {field: np.ravel(fields[field]) for field in FIELDS}
+        if len({len(array) for array in values.values()}) > 1:
+            raise ValueError(f'The arrays of {species} must have the same length')
+
+        weights = values['weight'].astype(np.float64)
+        if not np.all(weights >= 0):
+            raise ValueError('Weight must be positive number')
+        ages = _integers(values['age'], 'Ages')
+        if np.any(ages < 0):
+            raise ValueError('Age must be a positive number')
+        checked[species] = {'row': _integers(values['row'], 'Rows'),
+                            'col': _integers(values['col'], 'Columns'),
+                            'age': ages, 'weight': weights}
+    return checked
+
+
+def read_columns(path):
+    """
+    Reads a columnar population from file.
+
+    Parameters
+    ----------
+    path : str
+        Path of a ``.npz`` or CSV file, see the module description.
+
+    Returns
+    -------
+    columns : dict
+        The population, not yet checked.
+    """
+    path = os.fspath(path)
+    columns = {}
+    if path.endswith('.npz'):
+        with np.load(path) as stored:
+            for key in stored.files:
+                species, field = key.split('_', 1)
+                columns.setdefault(species, {})[field] = stored[key]
+        return columns
+
+    with open(path) as csv_file:
+        names = csv_file.readline().strip().split(',')
+    dtype = [(name, 'U32' if name == 'species' else np.float64) for name in names]
+    with warnings.catch_warnings():
+        # A file with a header only is a valid empty population
+        warnings.simplefilter('ignore', UserWarning)
+        data = np.loadtxt(path, delimiter=',', skiprows=1, dtype=dtype, ndmin=1)
+    for species in np.unique(data['species']).tolist():
+        rows = data[data['species'] == species]
+        columns[species] = {field: rows[field] for field in names if field != 'species'}
+    return columns
+
+
+def write_columns(path, columns):
+    """
+    Writes a columnar population to file.
+
+    Parameters
+    ----------
+    path : str
+        Path of the file. Written as ``.npz`` if it ends in ``.npz``, as CSV otherwise.
+    columns : dict
+        The population.
+    """
+    columns = validate_columns(columns)
+    path = os.fspath(path)
+    if path.endswith('.npz'):
+        np.savez_compressed(path, **{f'{species}_{field}': values[field]
+                                     for species, values in columns.items()
+                                     for field in FIELDS})
+        return
+    with open(path, 'w') as csv_file:
+        csv_file.write('species,' + ','.join(FIELDS) + '\n')
+        for species, values in columns.items():
+            if len(values['age']):
+                np.savetxt(csv_file, np.column_stack([values[field] for field in FIELDS]),
+                           fmt=f'{species},%d,%d,%d,%.17g')
+
+
+def load_columns(pop):
+    """
+    Returns a checked columnar population, see :func:`validate_columns`.
+
+    Parameters
+    ----------
+    pop : dict or str
+        Columnar population or path of a file, see :func:`read_columns`.
+    """
+    if not isinstance(pop, dict):
+        pop = read_columns(pop)
+    return validate_columns(pop)
+
+
+@contextmanager
+def _gc_paused():
+    """
+    Pauses the cyclic garbage collector. Creating millions of animals would otherwise trigger
+    many collections, each scanning all animals created so far, while none of them is garbage.
+    """
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if enabled:
+            gc.enable()
+
+
+def cell_populations(columns):
+    """
+    Creates the animals of a checked columnar population, grouped by cell.
+
+    Parameters
+    ----------
+    columns : dict
+        Population as returned by :func:`load_columns`.
+
+    Returns
+    -------
+    cells : dict
+        Dictionary mapping locations to dictionaries that map species names to lists of
+        animals, in the order of the arrays.
+    """
+    cells = {}
+    for species, values in columns.items():
+        if not len(values['age']):
+            continue
+        order = np.lexsort((values['col'], values['row']))
+        cls = SPECIES[species]
+        with _gc_paused():
+            animals = [cls.from_state(age, weight) for age, weight in
+                       zip(values['age'][order].tolist(), values['weight'][order].tolist())]
+        rows, cols = values['row'][order], values['col'][order]
+        starts = np.flatnonzero((np.diff(rows) != 0) | (np.diff(cols) != 0)) + 1
+        bounds = np.r_[0, starts, len(order)].tolist()
+        for start, stop in zip(bounds[:-1], bounds[1:]):
+            loc = (int(rows[start]), int(cols[start]))
+            cells.setdefault(loc, {})[species] = animals[start:stop]
+    return cells
@@ -0,0 +1,162 @@
+"""
+:mod:`biosim.profiling` writes profiles of simulations for later inspection.
+
+:meth:`biosim.simulation.BioSim.simulate` runs under :mod:`cProfile` if it is given a profile
+path, or if the environment variable ``BIOSIM_PROFILE`` holds one::
+
+    BIOSIM_PROFILE=check_sim python reference_examples/check_sim.py
+
+Two files are written next to the given path:
+
+* ``<path>.pstats``, readable with :mod:`pstats`, snakeviz or gprof2dot,
+* ``<path>.collapsed``, one line per call stack with the time in microseconds, readable with
+  flamegraph.pl, speedscope or inferno.
+
+The profiler records which function calls which, not complete call stacks. The stacks are
+therefore reconstructed from the call graph: the time of a function called from several places
+is split between its callers in proportion to the time spent in the calls from each of them.
+Recursive calls are folded into the outermost call.
+"""
+
+from collections import defaultdict
+import os
+import pstats
+
+ENVIRONMENT_VARIABLE = 'BIOSIM_PROFILE'
+
+# Call paths with less time than this, in seconds, are left out of the collapsed stacks
+_MIN_TIME = 1e-6
+
+
+def profile_path(profile=None):
+    """
+    Returns the profile path to use.
+
+    Parameters
+    ----------
+    profile : str
+        Path given by the caller.
+
+    Returns
+    -------
+    path : str or None
+        profile if given, else the value of the environment variable ``BIOSIM_PROFILE`` if set
+        and not empty, else None.
+    """
+    if profile is not None:
+        return profile
+    return os.environ.get(ENVIRONMENT_VARIABLE) or None
+
+
+def output_paths(path):
+    """
+    Names of the files written for a profile path.
+
+    Parameters
+    ----------
+    path : str
+        Profile path, with or without the suffix ``.pstats``.
+
+    Returns
+    -------
+    pstats_file, collapsed_file : str
+        Paths of the statistics and the collapsed-stack file.
+    """
+    root, ext = os.path.splitext(path)
+    if ext != '.pstats':
+        root = path
+    return f'{root}.pstats', f'{root}.collapsed'
+
+
+def _label(func):
+    """Name of a function in a collapsed stack, e.g. 'animal.py:_update_fitness'."""
+    filename, _, name = func
+    if filename == '~':
+        return name
+    return f'{os.path.basename(filename)}:{name}'.replace(';', ',')
+
+
+def collapsed_stacks(stats):
+    """
+    Reconstructs call stacks from profile statistics.
+
+    Parameters
+    ----------
+    stats : instance
+        :class:`pstats.Stats` instance.
+
+    Returns
+    -------
+    stacks : dict
+        Dictionary mapping stacks, function names joined by ';' from the outermost call, to the
+        time spent in the innermost function itself, in seconds.
+    """
+    entries = stats.stats
+    callees = defaultdict(dict)
+    for func, (_, _, _, _, callers) in entries.items():
+        for caller, edge in callers.items():
+            callees[caller][func] = edge[3]
+
+    stacks = defaultdict(float)
+
+    def visit(func, stack, scale, on_path):
+        own_time = entries[func][2]
+        stack = stack + (_label(func),)
+        if own_time * scale > 0:
+            stacks[';'.join(stack)] += own_time * scale
+        for callee, edge_time in callees[func].items():
+            callee_time = entries[callee][3]
+            if callee in on_path or callee_time <= 0:
+                continue
+            share = scale * edge_time / callee_time
+            if share * callee_time >= _MIN_TIME:
+                visit(callee, stack, share, on_path | {callee})
+
+    # The call that stops the profiler is recorded as well, but is not part of the program
+    roots = [func for func, entry in entries.items()
+             if not any(caller in entries for caller in entry[4])
+             and not func[2].startswith("<method 'disable' of '_lsprof.Profiler'")]
+    for root in roots:
+        visit(root, (), 1.0, {root})
+    return dict(stacks)
+
+
+def write_collapsed(stats, path):
+    """
+    Writes reconstructed call stacks in the collapsed-stack format.
+
+    Parameters
+    ----------
+    stats : instance
+        :class:`pstats.Stats` instance.
+    path : str
+        Path of the output file. Each line holds a stack and its time in whole microseconds.
+    """
+    with open(path, 'w') as collapsed:
+        for stack, seconds in sorted(collapsed_stacks(stats).items()):
+            microseconds = int(round(seconds * 1e6))
+            if microseconds > 0:
+                collapsed.write(f'{stack} {microseconds}\n')
+
+
+def write_profile(profiler, path):
+    """
+    Writes the statistics and the collapsed stacks of a profiler.
+
+    Parameters
+    ----------
+    profiler : instance
+        :class:`cProfile.Profile` instance, not running.
+    path : str
+        Profile path, see :func:`output_paths`.
+
+    Returns
+    -------
+    pstats_file, collapsed_file : str
+        Paths of the files written.
+    """
+    pstats_file, collapsed_file = output_paths(path)
+    stats = pstats.Stats(profiler)
+    stats.dump_stats(pstats_file)
+    write_collapsed(stats, collapsed_file)
+    return pstats_file, collapsed_file
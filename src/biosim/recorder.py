@@ -0,0 +1,138 @@
+"""
+:mod:`biosim.recorder` records the number of animals in every cell for every year.
+
+The counts are stored in a raw binary file that is accessed through :class:`numpy.memmap`, so a
+run of many thousand years is never held in memory. The file holds an integer array of shape
+``(years, rows, cols, species)``, where ``[k, i, j, s]`` is the number of animals of species ``s``
+(0: Herbivore, 1: Carnivore) in cell ``(i+1, j+1)`` at the end of the ``k``-th recorded year,
+i.e. the same row/column layout as :meth:`Island.herb_distribution`.
+
+Space on disk is allocated in chunks of years. A small JSON file with the suffix ``.json`` next to
+the data file tells readers how many years have been recorded so far, so the record can be read
+with :func:`load_cell_record` while the simulation is still running.
+"""
+
+import json
+import os
+
+import numpy as np
+
+_DEFAULT_CHUNK_YEARS = 1000
+_DEFAULT_SYNC_YEARS = 100
+
+
+class CellRecorder:
+    """Writes per-cell, per-species animal counts to a memory-mapped file."""
+
+    species = ('Herbivore', 'Carnivore')
+
+    def __init__(self, path, map_dims, first_year=1, chunk_years=None, sync_years=None,
+                 dtype='int32'):
+        """
+        Parameters
+        ----------
+        path : str
+            Path to the data file. An existing file is overwritten.
+        map_dims : tuple
+            Number of rows and columns of the island map.
+        first_year : int
+            The year of the first record.
+        chunk_years : int
+            Number of years the file grows by when it is full.
+        sync_years : int
+            Number of years between updates of the metadata seen by readers.
+        dtype : str
+            Integer type used for the counts.
+        """
+        if chunk_years is None:
+            chunk_years = _DEFAULT_CHUNK_YEARS
+        if sync_years is None:
+            sync_years = _DEFAULT_SYNC_YEARS
+        if chunk_years < 1 or sync_years < 1:
+            raise ValueError('chunk_years and sync_years must be positive integers')
+
+        self.path = path
+        self.meta_path = path + '.json'
+        self._frame_shape = (map_dims[0], map_dims[1], len(self.species))
+        self._dtype = np.dtype(dtype)
+        self._chunk_years = chunk_years
+        self._sync_years = sync_years
+        self.first_year = first_year
+        self.years = 0
+        self._capacity = 0
+        self._data = None
+
+        open(self.path, 'wb').close()
+        self._grow()
+        self.sync()
+
+    def _grow(self):
+        """Enlarges the data file by one chunk and maps it again."""
+        if self._data is not None:
+            self._data.flush()
+            del self._data
+        self._capacity += self._chunk_years
+        nbytes = self._capacity * int(np.prod(self._frame_shape)) * self._dtype.itemsize
+        with open(self.path, 'r+b') as data_file:
+            data_file.truncate(nbytes)
+        self._data = np.memmap(self.path, dtype=self._dtype, mode='r+',
+                               shape=(self._capacity,) + self._frame_shape)
+
+    def record(self, island):
+        """
+        Store the current counts of the island as the next year.
+
+        Parameters
+        ----------
+        island : instance
+            An Island instance
+        """
+        if self.years == self._capacity:
+            self._grow()
+        frame = self._data[self.years]
+        frame[:, :, 0] = island.herb_distribution()
+        frame[:, :, 1] = island.carn_distribution()
+        self.years += 1
+        if self.years % self._sync_years == 0:
+            self.sync()
+
+    def sync(self):
+        """Flush data to disk and update the metadata seen by readers."""
+        self._data.flush()
+        meta = {'shape': [self.years] + list(self._frame_shape), 'dtype': self._dtype.str,
+                'first_year': self.first_year, 'species': list(self.species)}
+        tmp_path = self.meta_path + '.tmp'
+        with open(tmp_path, 'w') as meta_file:
+            json.dump(meta, meta_file)
+        os.replace(tmp_path, self.meta_path)
+
+    def close(self):
+        """Sync the record and release the memory map."""
+        if self._data is not None:
+            self.sync()
+            del self._data
+            self._data = None
+
+
+def load_cell_record(path):
+    """
+    Open a record written by :class:`CellRecorder` for reading.
+
+    Parameters
+    ----------
+    path : str
+        Path to the data file.
+
+    Returns
+    -------
+    counts : memmap
+        Read-only array of shape (years, rows, cols, species) with the years synced so far.
+    first_year : int
+        The year of the first record.
+    """
+    with open(path + '.json') as meta_file:
+        meta = json.load(meta_file)
+    shape = tuple(meta['shape'])
+    if shape[0] == 0:
+        return np.zeros(shape, dtype=meta['dtype']), meta['first_year']
+    return np.memmap(path, dtype=meta['dtype'], mode='r', shape=shape), meta['first_year']
@@ -0,0 +1,61 @@
+"""
+:mod:`biosim.rng` derives random number streams for single cells.
+
+The object engine draws all random numbers from the global stream of the :mod:`random` module,
+so results depend on the order in which cells are processed. Engines that process cells in a
+different order, skip cells or process cells in parallel instead seed the :mod:`random` module
+from :func:`cell_seed` before each phase of each cell. The seed only depends on the master seed,
+the year, the cell location and the phase, so such engines give identical results whatever order
+the cells are processed in.
+"""
+
+import random
+
+import numpy as np
+
+FEEDING = 0
+MATING = 1
+MIGRATION = 2
+DEATH = 3
+
+
+def cell_seed(master_seed, year, loc, phase):
+    """
+    Derives the seed of one phase of one cell in one year.
+
+    Parameters
+    ----------
+    master_seed : int
+        Seed of the simulation.
+    year : int
+        The year being simulated.
+    loc : tuple
+        Location of the cell.
+    phase : int
+        One of FEEDING, MATING, MIGRATION and DEATH.
+
+    Returns
+    -------
+    seed : int
+        Seed for :func:`random.seed`.
+    """
+    sequence = np.random.SeedSequence(master_seed, spawn_key=(year, loc[0], loc[1], phase))
+    return int.from_bytes(sequence.generate_state(4).tobytes(), 'little')
+
+
+def seed_cell(master_seed, year, loc, phase):
+    """
+    Seeds the :mod:`random` module for one phase of one cell in one year.
+
+    Parameters
+    ----------
+    master_seed : int
+        Seed of the simulation.
+    year : int
+        The year being simulated.
+    loc : tuple
+        Location of the cell.
+    phase : int
+        One of FEEDING, MATING, MIGRATION and DEATH.
+    """
+    random.seed(cell_seed(master_seed, year, loc, phase))
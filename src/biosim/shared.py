@@ -0,0 +1,86 @@
+"""
+:mod:`biosim.shared` provides NumPy arrays in shared memory for multi-process engines.
+
+A :class:`SharedArray` is created by one process and attached to by others through its
+:attr:`SharedArray.spec`, a small picklable tuple. All processes then see the same memory, so
+workers can write results in place and the parent can read them without copying or pickling.
+The creating process is responsible for calling :meth:`SharedArray.unlink`.
+"""
+
+from multiprocessing import shared_memory
+
+import numpy as np
+
+
+class SharedArray:
+    """NumPy array backed by a named block of shared memory."""
+
+    def __init__(self, shape, dtype, name=None):
+        """
+        Parameters
+        ----------
+        shape : tuple
+            Shape of the array.
+        dtype : str
+            Data type of the array.
+        name : str
+            Name of an existing block to attach to. If None, a new block is created and the
+            array is filled with zeros.
+        """
+        self.shape = tuple(shape)
+        self.dtype = np.dtype(dtype)
+        nbytes = max(1, int(np.prod(self.shape)) * self.dtype.itemsize)
+        if name is None:
+            self._shm = shared_memory.SharedMemory(create=True, size=nbytes)
+            self.owner = True
+        else:
+            try:
+                self._shm = shared_memory.SharedMemory(name=name, track=False)
+            except TypeError:
+                # Python < 3.13 has no track argument
+                self._shm = shared_memory.SharedMemory(name=name)
+            self.owner = False
+        self.array = np.ndarray(self.shape, dtype=self.dtype, buffer=self._shm.buf)
+        if self.owner:
+            self.array[...] = 0
+
+    @property
+    def name(self):
+        """Name of the shared memory block."""
+        return self._shm.name
+
+    @property
+    def spec(self):
+        """Picklable (name, shape, dtype) tuple used to attach with :meth:`attach`."""
+        return self.name, self.shape, self.dtype.str
+
+    @classmethod
+    def attach(cls, spec):
+        """
+        Attaches to an existing shared array.
+
+        Parameters
+        ----------
+        spec : tuple
+            The spec of the shared array.
+
+        Returns
+        -------
+            SharedArray instance
+        """
+        name, shape, dtype = spec
+        return cls(shape, dtype, name=name)
+
+    def close(self):
+        """Releases the array in this process."""
+        if self._shm is not None:
+            self.array = None
+            self._shm.close()
+
+    def unlink(self):
+        """Releases the array and frees the shared memory block, creator only."""
+        shm = self._shm
+        self.close()
+        if shm is not None and self.owner:
+            shm.unlink()
+        self._shm = None
@@ -5,23 +5,46 @@ Template for BioSim class.
 # The material in this file is licensed under the BSD 3-clause license
 # https://opensource.org/licenses/BSD-3-Clause
 # (C) Copyright 2021 Hans Ekkehard Plesser / NMBU
+import cProfile
 import random
+import time
+
+import numpy as np
 
 from .island import Island
-from .cell import Lowland, Highland, Desert, Water
+from .islandmap import IslandMap
+from .parallel import ParallelIsland
+from .cell import EVENTS, Lowland, Highland, Desert, Water
 from .animal import Herbivore, Carnivore
 from .graphics import Graphics
+from .logger import LogWriter
+from .recorder import CellRecorder
+from .telemetry import TelemetryWriter
+from .timing import PhaseTimer
+from . import hybrid, profiling, state
+
+
+def _engine_args(engine, kwargs):
+    """BioSim arguments of a copy: the engine of the source unless overridden in kwargs."""
+    if kwargs.get('workers') is not None:
+        # sparse and cell_threshold cannot be combined with workers
+        engine = {key: val for key, val in engine.items() if key == 'cell_streams'}
+    return dict(engine, **kwargs)
 
 
 class BioSim:
     def __init__(self, island_map, ini_pop, seed,
                  vis_years=1, ymax_animals=None, cmax_animals=None, hist_specs=None,
                  img_dir=None, img_base=None, img_fmt='png', img_years=None,
-                 log_file=None):
+                 log_file=None, log_cells=False, log_flush_years=None, cell_record=None,
+                 checkpoint_file=None, checkpoint_years=None, workers=None, cell_streams=False,
+                 fast=False, timing=False, timing_cells=False, log_events=False,
+                 telemetry_file=None, telemetry_interval=None, sparse=False,
+                 cell_threshold=None):
 
         """
-        :param island_map: Multi-line string specifying island geography
-        :param ini_pop: List of dictionaries specifying initial population
+        :param island_map: Multi-line string specifying island geography, or a compiled map
+        :param ini_pop: List of dictionaries specifying initial population, or columnar population
         :param seed: Integer used as random number seed
         :param ymax_animals: Number specifying y-axis limit for graph showing animal numbers
         :param cmax_animals: Dict specifying color-code limits for animal densities
@@ -32,6 +55,21 @@ class BioSim:
         :param img_fmt: String with file type for figures, e.g. 'png'
         :param img_years: years between visualizations saved to files (default: vis_years)
         :param log_file: If given, write animal counts to this file
+        :param log_cells: If True, also write per-cell animal counts to a companion file
+        :param log_flush_years: years buffered in memory before the log is written to file
+        :param cell_record: If given, record per-cell counts for every year to this file
+        :param checkpoint_file: If given, write a checkpoint to this file every checkpoint_years
+        :param checkpoint_years: years between automatic checkpoints
+        :param workers: If given, simulate the island with this many worker processes
+        :param cell_streams: If True, every cell draws random numbers from its own stream
+        :param fast: If True, skip empty cells and move migrants in linear time, see below
+        :param timing: If True, record the time spent in each phase of each year
+        :param timing_cells: If True, also break cell phase times down by landscape type
+        :param log_events: If True, also write the demographic events of each year to log_file
+        :param telemetry_file: If given, write throughput and memory metrics to this file
+        :param telemetry_interval: seconds between telemetry samples (default: 10)
+        :param sparse: If True, only store cells that have held animals, see below
+        :param cell_threshold: If given, cells with this many animals are simulated with arrays
 
         If ymax_animals is None, the y-axis limit should be adjusted automatically.
         If cmax_animals is None, sensible, fixed default values should be used.
@@ -51,14 +89,78 @@ class BioSim:
         where img_number are consecutive image numbers starting from 0.
 
         img_dir and img_base must either be both None or both strings.
+
+        ini_pop may also be given column-wise, as dictionary of arrays or as the path of a
+        ``.npz`` or CSV file, see :mod:`biosim.population`. Large populations are then created
+        in one step.
+
+        The log file is written in CSV format with one row per simulated year, independently of
+        vis_years. See :mod:`biosim.logger` for details.
+
+        The cell record is a memory-mapped array of per-cell counts for every simulated year,
+        see :mod:`biosim.recorder` for details.
+
+        If workers is given, the island is simulated by :class:`biosim.parallel.ParallelIsland`.
+        Every cell then draws random numbers from its own stream derived from seed, so results
+        do not depend on the number of workers, but differ from those without workers.
+        With cell_streams=True, the island is simulated in this process with the same per-cell
+        streams, and gives the same results as with any number of workers.
+
+        With fast=True and neither workers nor cell_streams, random numbers are drawn in exactly
+        the same order as with fast=False, so existing seeds reproduce existing results.
+
+        With sparse=True, water cells and land cells that have never held animals take no
+        memory, so maps with large areas of water or empty land fit in memory. The results are
+        the same as with sparse=False. sparse cannot be combined with workers.
+
+        If cell_threshold is given, cells holding at least cell_threshold animals at the start of
+        a year simulate the year with NumPy arrays instead of animal objects, see
+        :mod:`biosim.hybrid`. With cell_threshold='auto', the threshold is measured on the
+        current machine when the first such simulation is created, and is available as
+        :attr:`cell_threshold`. The island is then simulated as with fast=True. Results agree
+        with those of the object engine in distribution, not in individual trajectories.
+        cell_threshold cannot be combined with workers.
+
+        The numbers of births, deaths, kills, unfed herbivores and accepted and rejected
+        migrations are counted in every year and are available from :attr:`events`.
+
+        If timing or timing_cells is True, the time of each phase of each year, of logging, of
+        updating and saving graphics and of checkpoints is recorded in :attr:`timer`, see
+        :mod:`biosim.timing`. Timing does not change the results.
+
+        While simulate runs, telemetry_file is written from a background thread every
+        telemetry_interval seconds, in the Prometheus text format if it ends in ``.prom`` and
+        as JSON lines otherwise, see :mod:`biosim.telemetry`.
+
+        Each BioSim instance keeps its own random number generator state, which is loaded into
+        the :mod:`random` module when simulate is called and stored again afterwards. The
+        simulation uses the animal and landscape parameters of the classes, unless parameters
+        have been set with :meth:`set_animal_parameters` or :meth:`set_landscape_parameters`,
+        restored by :meth:`load_checkpoint` or copied by :meth:`fork`. The instance then keeps
+        its own parameters and loads them into the classes when simulate is called.
         """
         random.seed(seed)
-        lines = iter(island_map.splitlines())
-        length = len(next(lines))
-        if not all(len(line) == length for line in lines):
-            raise ValueError('The rows of the island map must all be the same length.')
+        self._seed = seed
+        self._rng_state = random.getstate()
+        island_map = IslandMap.compile(island_map)
+        self._island_map = island_map
+        self._params = None
 
-        self.isle = Island(island_map, ini_pop)
+        if cell_threshold == 'auto':
+            cell_threshold = hybrid.autotune()
+        self.cell_threshold = cell_threshold
+        # Per-cell streams give the same results with and without workers
+        self._engine = {'cell_streams': bool(cell_streams or workers is not None),
+                        'sparse': bool(sparse), 'cell_threshold': cell_threshold}
+        if workers is None:
+            cell_dict = None if cell_threshold is None else hybrid.cell_dict(cell_threshold)
+            self.isle = Island(island_map, ini_pop, seed=seed if cell_streams else None,
+                               fast=fast or cell_dict is not None, sparse=sparse,
+                               cell_dict=cell_dict)
+        elif sparse or cell_threshold is not None:
+            raise ValueError('sparse and cell_threshold cannot be combined with workers')
+        else:
+            self.isle = ParallelIsland(island_map, ini_pop, seed=seed, workers=workers)
         self._num_animals = None
         self._animal_dict = None
         self._graphics = Graphics(self.isle, island_map, img_dir, img_base, img_fmt)
@@ -70,7 +172,35 @@ class BioSim:
         self._final_step = None
         self._cmax = cmax_animals
         self._hist_specs = hist_specs
-        self._log_file = log_file
+        if log_file is not None:
+            self._logger = LogWriter(log_file, cells=log_cells, flush_years=log_flush_years,
+                                     events=log_events)
+        else:
+            self._logger = None
+        self._cell_record = cell_record
+        self._recorder = None
+        if (checkpoint_file is None) != (checkpoint_years is None):
+            raise ValueError('checkpoint_file and checkpoint_years must be given together')
+        if checkpoint_years is not None and checkpoint_years < 1:
+            raise ValueError('checkpoint_years must be a positive integer')
+        self._checkpoint_file = checkpoint_file
+        self._checkpoint_years = checkpoint_years
+        self._profilers = {}
+        if telemetry_file is not None:
+            isle = self.isle
+            self._telemetry = TelemetryWriter(
+                telemetry_file, interval=telemetry_interval,
+                count_animals=lambda: isle.total_herb_count() + isle.total_carn_count())
+        else:
+            self._telemetry = None
+        self._event_years = []
+        self._event_counts = {name: [] for name in EVENTS}
+        if timing or timing_cells:
+            self.timer = PhaseTimer(by_cell_type=timing_cells)
+            if isinstance(self.isle, Island):
+                self.isle.timer = self.timer
+        else:
+            self.timer = None
 
     def set_animal_parameters(self, species, params):
         """
@@ -81,6 +211,7 @@ class BioSim:
         """
         species_dict = {'Herbivore': Herbivore, 'Carnivore': Carnivore}
         species_dict[species].set_params(params)
+        self._own_params()[species].update(params)
 
     def set_landscape_parameters(self, landscape, params):
         """
@@ -91,13 +222,40 @@ class BioSim:
         """
         cell_dict = {'L': Lowland, 'H': Highland, 'D': Desert, 'W': Water}
         cell_dict[landscape].set_land_params(params)
+        self._own_params()[landscape].update(params)
+
+    def _own_params(self):
+        """Returns the parameters of the simulation, taken from the classes the first time."""
+        if self._params is None:
+            self._params = state.get_params()
+        return self._params
 
-    def simulate(self, num_years):
+    def simulate(self, num_years, profile=None):
         """
         Run simulation while visualizing the result.
 
         :param num_years: number of years to simulate
+        :param profile: If given, run under cProfile and write profile files to this path
+
+        If profile is None, the environment variable BIOSIM_PROFILE may give the path instead.
+        A profile covers all simulate calls of this simulation with the same path, see
+        :mod:`biosim.profiling` for the files written.
         """
+        profile = profiling.profile_path(profile)
+        if profile is None:
+            self._simulate(num_years)
+            return
+
+        profiler = self._profilers.setdefault(profile, cProfile.Profile())
+        profiler.enable()
+        try:
+            self._simulate(num_years)
+        finally:
+            profiler.disable()
+            profiling.write_profile(profiler, profile)
+
+    def _simulate(self, num_years):
+        """Runs the simulation, see :meth:`simulate`."""
         if self._img_years is None:
             self._img_years = self._vis_years
 
@@ -105,24 +263,182 @@ class BioSim:
             raise ValueError('img_steps must be multiple of vis_steps')
 
         self._final_step = self._step + num_years
-        self._graphics.setup(self._final_step, self._img_years, self._ymax_animals, self._cmax,
-                             self._hist_specs)
-
-        while self._step < self._final_step:
-            self.isle.season()
-            self._step += 1
-            self._year += 1
-            if self._vis_years > 0 and self._step % self._vis_years == 0:
-                self._graphics.update(self._step, self._year)
-                if self._log_file is not None:
-                    with open(self._log_file, 'a') as logfile:
-                        logfile.write(f'Year: {self.year}, Number of Animals: {self.num_animals}\n')
+        if self._vis_years > 0:
+            self._graphics.setup(self._final_step, self._img_years, self._ymax_animals,
+                                 self._cmax, self._hist_specs)
+        if self._cell_record is not None and self._recorder is None:
+            self._recorder = CellRecorder(self._cell_record, self.isle.map_dims,
+                                          first_year=self._year + 1)
+
+        if self._params is not None:
+            state.set_params(self._params)
+        random.setstate(self._rng_state)
+        if self._telemetry is not None:
+            self._telemetry.start()
+        try:
+            while self._step < self._final_step:
+                if self.timer is not None:
+                    self._timed_year()
+                    continue
+                start = time.perf_counter()
+                self.isle.season()
+                season_seconds = time.perf_counter() - start
+                self._step += 1
+                self._year += 1
+                events = self._count_events()
+                if self._logger is not None:
+                    self._logger.write(self._year, self.isle, events)
+                if self._recorder is not None:
+                    self._recorder.record(self.isle)
+                graphics_seconds = 0.0
+                if self._vis_years > 0 and self._step % self._vis_years == 0:
+                    start = time.perf_counter()
+                    self._graphics.update(self._step, self._year)
+                    graphics_seconds = time.perf_counter() - start
+                if self._telemetry is not None:
+                    self._telemetry.record_year(self._year, season_seconds, graphics_seconds)
+                if (self._checkpoint_years is not None
+                        and self._year % self._checkpoint_years == 0):
+                    self._rng_state = random.getstate()
+                    self.save_checkpoint(self._checkpoint_file)
+        finally:
+            self._rng_state = random.getstate()
+            if self._logger is not None:
+                self._logger.flush()
+            if self._recorder is not None:
+                self._recorder.sync()
+            if self._telemetry is not None:
+                self._telemetry.stop()
+
+    def _timed_year(self):
+        """Simulates one year of simulate while recording the time of each step."""
+        timer = self.timer
+        timer.start_year(self._year + 1)
+        start = time.perf_counter()
+        self.isle.season()
+        season_seconds = time.perf_counter() - start
+        if getattr(self.isle, 'timer', None) is not timer:
+            timer.add('season', season_seconds)
+        self._step += 1
+        self._year += 1
+
+        start = time.perf_counter()
+        events = self._count_events()
+        if self._logger is not None:
+            self._logger.write(self._year, self.isle, events)
+        if self._recorder is not None:
+            self._recorder.record(self.isle)
+        if self._logger is not None or self._recorder is not None:
+            timer.add('logging', time.perf_counter() - start)
+
+        graphics_seconds = 0.0
+        if self._vis_years > 0 and self._step % self._vis_years == 0:
+            start = time.perf_counter()
+            self._graphics.update(self._step, self._year)
+            graphics_seconds = time.perf_counter() - start
+            timer.add('graphics_update', graphics_seconds - self._graphics.save_time)
+            timer.add('graphics_save', self._graphics.save_time)
+        if self._telemetry is not None:
+            self._telemetry.record_year(self._year, season_seconds, graphics_seconds)
+
+        if self._checkpoint_years is not None and self._year % self._checkpoint_years == 0:
+            start = time.perf_counter()
+            self._rng_state = random.getstate()
+            self.save_checkpoint(self._checkpoint_file)
+            timer.add('checkpoint', time.perf_counter() - start)
+
+    def _count_events(self):
+        """Stores the demographic events of the year just simulated and returns them."""
+        events = self.isle.collect_events()
+        self._event_years.append(self._year)
+        for name, count in events.items():
+            self._event_counts[name].append(count)
+        return events
+
+    def save_checkpoint(self, path):
+        """
+        Save the full simulation state to file.
+
+        The checkpoint holds the island map, all animal and landscape parameters, age, weight and
+        fitness of every animal, the year and step counters and the random number generator
+        state, stored column-wise in a compressed ``.npz`` file. Pending log and record data is
+        written to file first.
+
+        :param path: String with path to the checkpoint file
+        """
+        if self._logger is not None:
+            self._logger.flush()
+        if self._recorder is not None:
+            self._recorder.sync()
+        params = self._params if self._params is not None else state.get_params()
+        state.save_state(path, self._island_map.text, self.isle, params, self._rng_state,
+                         self._year, self._step, self._seed, self._engine)
+
+    @classmethod
+    def load_checkpoint(cls, path, **kwargs):
+        """
+        Create a simulation from a checkpoint file.
+
+        Continuing the restored simulation reproduces the trajectory of the simulation the
+        checkpoint was saved from. The engine of the saved simulation, e.g., sparse or
+        cell_threshold, is used unless given in kwargs. The restored simulation keeps the animal and
+        landscape parameters of the checkpoint as its own, see :class:`BioSim`; the parameters of
+        the classes are left unchanged until it simulates.
+
+        :param path: String with path to the checkpoint file
+        :param kwargs: Further arguments passed on to BioSim, e.g., vis_years or log_file
+        :return: BioSim instance
+        """
+        saved = state.load_state(path)
+        sim = cls(saved['island_map'], [], seed=saved['seed'],
+                  **_engine_args(saved['engine'], kwargs))
+        if isinstance(sim.isle, Island):
+            state.island_from_arrays(sim.isle, saved['columns'])
+        else:
+            restored = Island(saved['island_map'])
+            state.island_from_arrays(restored, saved['columns'])
+            sim.isle.copy_pop(restored)
+        sim.isle.year = saved['year']
+        sim._params = saved['params']
+        sim._rng_state = saved['rng_state']
+        sim._year = saved['year']
+        sim._step = saved['step']
+        return sim
+
+    def fork(self, seed=None, **kwargs):
+        """
+        Create an independent copy of the simulation in its current state.
+
+        The copy has its own animals, parameters and random number generator state, so changes
+        to the copy, e.g., adding carnivores or setting parameters, do not affect this
+        simulation. From then on, both simulations keep their own parameters, see
+        :class:`BioSim`. Animals are copied directly instead of deep-copying the object graph.
+
+        :param seed: If given, seed the random number generator of the copy with this integer.
+                     Otherwise the copy continues with the current random state of this
+                     simulation and reproduces its trajectory.
+        :param kwargs: Further arguments passed on to BioSim, e.g., vis_years or log_file. The
+                       copy uses the engine of this simulation, e.g., sparse or
+                       cell_threshold, unless given here.
+        :return: BioSim instance
+        """
+        sim = type(self)(self._island_map, [], seed=self._seed if seed is None else seed,
+                         **_engine_args(self._engine, kwargs))
+        sim.isle.copy_pop(self.isle)
+        sim.isle.year = self._year
+        sim._params = {name: dict(values) for name, values in self._own_params().items()}
+        if seed is None:
+            sim._rng_state = self._rng_state
+        sim._year = self._year
+        sim._step = self._step
+        return sim
 
     def add_population(self, population):
         """
         Add a population to the island
 
-        :param population: List of dictionaries specifying population
+        :param population: List of dictionaries specifying population, or a columnar population
+                           or the path of a file holding one, see :mod:`biosim.population`
         """
         self.isle.add_pop(population)
 
@@ -131,6 +447,17 @@ class BioSim:
         """Last year simulated."""
         return self._year
 
+    @property
+    def events(self):
+        """
+        Demographic events of each year simulated by this instance, as dictionary mapping
+        'year' and the names in :data:`biosim.cell.EVENTS` to integer arrays.
+        """
+        events = {'year': np.array(self._event_years, dtype=np.int64)}
+        events.update({name: np.array(counts, dtype=np.int64)
+                       for name, counts in self._event_counts.items()})
+        return events
+
     @property
     def num_animals(self):
         """Total number of animals on island."""
@@ -146,6 +473,11 @@ class BioSim:
                              'Carnivore': self.isle.total_carn_count()})
         return self._animal_dict
 
+    @property
+    def figure(self):
+        """Matplotlib figure of the graphics, None if no graphics have been set up."""
+        return self._graphics.figure
+
     def make_movie(self):
         """Create MPEG4 movie from visualization images saved."""
         self._graphics.make_movie()
@@ -0,0 +1,318 @@
+"""
+:mod:`biosim.state` converts the state of a simulation to and from plain arrays.
+
+The state of an island is stored column-wise: for each species there is one array per animal
+property, with one element per animal. Animals are ordered by cell, in the order of
+:attr:`Island.isle_map`, and within a cell in population order, so the arrays describe the island
+exactly, including the order the animals are processed in.
+
+The keys of the column dictionary are ``'<prefix>_<column>'``, where prefix is ``herb`` or ``carn``
+and column is one of :data:`COLUMNS`. A fitness of NaN marks an animal whose fitness has not been
+computed yet. The locations of cells in array mode, see :mod:`biosim.hybrid`, are stored as
+rows of the array ``'array_cells'``.
+"""
+
+import contextlib
+import json
+
+import numpy as np
+
+from .animal import Herbivore, Carnivore
+from .cell import Lowland, Highland, Desert, Water
+
+SPECIES = {'herb': Herbivore, 'carn': Carnivore}
+LANDSCAPES = {'L': Lowland, 'H': Highland, 'D': Desert, 'W': Water}
+COLUMNS = ('row', 'col', 'age', 'weight', 'fitness')
+
+
+def get_params():
+    """
+    Collects the current parameters of all animal and landscape classes.
+
+    Returns
+    -------
+    params : dict
+        Dictionary mapping class names and landscape letters to parameter dictionaries.
+    """
+    params = {cls.__name__: {key: getattr(cls, key) for key in cls.default_params}
+              for cls in SPECIES.values()}
+    params.update({letter: {'f_max': cls.f_max} for letter, cls in LANDSCAPES.items()})
+    return params
+
+
+def default_params():
+    """
+    Collects the default parameters of all animal and landscape classes.
+
+    Returns
+    -------
+    params : dict
+        Dictionary in the format of :func:`get_params`.
+    """
+    params = {cls.__name__: dict(cls.default_params) for cls in SPECIES.values()}
+    params.update({letter: dict(cls.default_params) for letter, cls in LANDSCAPES.items()})
+    return params
+
+
+def set_params(params):
+    """
+    Sets the parameters of all animal and landscape classes.
+
+    Parameters
+    ----------
+    params : dict
+        Parameters as returned by :func:`get_params`.
+    """
+    classes = {cls.__name__: cls for cls in SPECIES.values()}
+    classes.update(LANDSCAPES)
+    for name, values in params.items():
+        for key, val in values.items():
+            setattr(classes[name], key, val)
+
+
+@contextlib.contextmanager
+def preserved_params(params=None):
+    """
+    Context manager restoring the parameters of all animal and landscape classes on exit.
+
+    Parameters
+    ----------
+    params : dict
+        If given, parameters in the format of :func:`get_params` set on entry.
+    """
+    saved = get_params()
+    try:
+        if params is not None:
+            set_params(params)
+        yield
+    finally:
+        set_params(saved)
+
+
+def config_params(config):
+    """
+    Parameters of a simulation configuration, see :mod:`biosim.ensemble`: the default
+    parameters, updated with the animal and landscape parameters of the configuration.
+
+    Parameters
+    ----------
+    config : dict
+        Simulation configuration.
+
+    Returns
+    -------
+    params : dict
+        Dictionary in the format of :func:`get_params`.
+    """
+    params = default_params()
+    for group in ('animal_params', 'landscape_params'):
+        for name, values in config.get(group, {}).items():
+            params[name].update(values)
+    return params
+
+
+def _population(cell, prefix):
+    return cell.herb_pop if prefix == 'herb' else cell.carn_pop
+
+
+def animals_to_arrays(animals):
+    """
+    Stores the properties of animals in arrays.
+
+    Parameters
+    ----------
+    animals : list
+        List of animal instances.
+
+    Returns
+    -------
+    ages, weights, fitness : ndarray
+        Properties of the animals, NaN fitness marks fitness not computed yet.
+    """
+    return (np.array([animal.age for animal in animals], dtype=np.int64),
+            np.array([animal.weight for animal in animals], dtype=np.float64),
+            np.array([np.nan if animal._fitness is None else animal._fitness
+                      for animal in animals], dtype=np.float64))
+
+
+def island_to_arrays(island):
+    """
+    Stores all animals on the island column-wise.
+
+    Parameters
+    ----------
+    island : instance
+        An Island instance
+
+    Returns
+    -------
+    columns : dict
+        Dictionary mapping column names to arrays.
+    """
+    columns = {}
+    for prefix in SPECIES:
+        rows, cols, animals = [], [], []
+        for (row, col), cell in island.isle_map.items():
+            pop = _population(cell, prefix)
+            rows.extend([row] * len(pop))
+            cols.extend([col] * len(pop))
+            animals.extend(pop)
+        columns[f'{prefix}_row'] = np.array(rows, dtype=np.int64)
+        columns[f'{prefix}_col'] = np.array(cols, dtype=np.int64)
+        (columns[f'{prefix}_age'], columns[f'{prefix}_weight'],
+         columns[f'{prefix}_fitness']) = animals_to_arrays(animals)
+    columns['array_cells'] = np.array([loc for loc, cell in island.isle_map.items()
+                                       if cell.array_mode], dtype=np.int64).reshape(-1, 2)
+    return columns
+
+
+def animals_from_arrays(cls, ages, weights, fitness):
+    """
+    Creates animals from property arrays.
+
+    Parameters
+    ----------
+    cls : class
+        Herbivore or Carnivore
+    ages, weights, fitness : array_like
+        Properties of the animals, NaN fitness marks fitness not computed yet.
+
+    Returns
+    -------
+    animals : list
+        List of animal instances.
+    """
+    return [cls.from_state(age, weight, None if fit != fit else fit)
+            for age, weight, fit in zip(np.asarray(ages).tolist(), np.asarray(weights).tolist(),
+                                        np.asarray(fitness).tolist())]
+
+
+def island_from_arrays(island, columns):
+    """
+    Replaces all animals on the island by the animals stored in columns.
+
+    Parameters
+    ----------
+    island : instance
+        An Island instance
+    columns : dict
+        Columns as returned by :func:`island_to_arrays`.
+    """
+    for cell in island.isle_map.values():
+        cell.herb_pop = []
+        cell.carn_pop = []
+    for prefix, cls in SPECIES.items():
+        rows = columns[f'{prefix}_row']
+        cols = columns[f'{prefix}_col']
+        animals = animals_from_arrays(cls, columns[f'{prefix}_age'],
+                                      columns[f'{prefix}_weight'],
+                                      columns[f'{prefix}_fitness'])
+        for loc, animal in zip(zip(rows.tolist(), cols.tolist()), animals):
+            _population(island.isle_map[loc], prefix).append(animal)
+    for row, col in columns.get('array_cells', []):
+        island.isle_map[(int(row), int(col))].array_mode = True
+
+
+def rng_to_arrays(state):
+    """
+    Stores a state of the :mod:`random` module as arrays.
+
+    Parameters
+    ----------
+    state : tuple
+        State as returned by :func:`random.getstate`.
+
+    Returns
+    -------
+    words : ndarray
+        Integer array holding the version followed by the generator words.
+    gauss_next : ndarray
+        Cached Gaussian value, NaN if there is none.
+    """
+    version, words, gauss_next = state
+    return (np.array((version,) + words, dtype=np.int64),
+            np.array(np.nan if gauss_next is None else gauss_next))
+
+
+def rng_from_arrays(words, gauss_next):
+    """
+    Restores a state of the :mod:`random` module from :func:`rng_to_arrays` output.
+
+    Parameters
+    ----------
+    words : ndarray
+        Version and generator words.
+    gauss_next : ndarray
+        Cached Gaussian value, NaN if there is none.
+
+    Returns
+    -------
+    state : tuple
+        State accepted by :func:`random.setstate`.
+    """
+    words = words.tolist()
+    gauss_next = float(gauss_next)
+    return words[0], tuple(words[1:]), None if gauss_next != gauss_next else gauss_next
+
+
+def save_state(path, island_map, island, params, rng_state, year, step, seed=0, engine=None):
+    """
+    Writes a simulation state to a compressed ``.npz`` file.
+
+    Parameters
+    ----------
+    path : str
+        Path of the file.
+    island_map : str
+        Multi-line string specifying island geography
+    island : instance
+        An Island instance
+    params : dict
+        Parameters as returned by :func:`get_params`.
+    rng_state : tuple
+        State as returned by :func:`random.getstate`.
+    year : int
+        Last year simulated.
+    step : int
+        Number of steps simulated.
+    seed : int
+        Seed the simulation was started with.
+    engine : dict
+        Arguments of :class:`biosim.simulation.BioSim` selecting the engine, e.g.,
+        ``{'cell_streams': True}``.
+    """
+    rng_words, rng_gauss = rng_to_arrays(rng_state)
+    np.savez_compressed(path, island_map=np.array(island_map), params=np.array(json.dumps(params)),
+                        rng_words=rng_words, rng_gauss=rng_gauss, year=np.array(year),
+                        step=np.array(step), seed=np.array(seed),
+                        engine=np.array(json.dumps(engine or {})), **island_to_arrays(island))
+
+
+def load_state(path):
+    """
+    Reads a simulation state written by :func:`save_state`.
+
+    Parameters
+    ----------
+    path : str
+        Path of the file.
+
+    Returns
+    -------
+    state : dict
+        Dictionary with keys 'island_map', 'params', 'rng_state', 'year', 'step', 'seed',
+        'engine' and 'columns'. 'engine' is empty for files written without it.
+    """
+    with np.load(path) as data:
+        columns = {f'{prefix}_{column}': data[f'{prefix}_{column}']
+                   for prefix in SPECIES for column in COLUMNS}
+        if 'array_cells' in data.files:
+            columns['array_cells'] = data['array_cells']
+        return {'island_map': str(data['island_map']),
+                'params': json.loads(str(data['params'])),
+                'rng_state': rng_from_arrays(data['rng_words'], data['rng_gauss']),
+                'year': int(data['year']),
+                'step': int(data['step']),
+                'seed': int(data['seed']),
+                'engine': (json.loads(str(data['engine'])) if 'engine' in data.files else {}),
+                'columns': columns}
@@ -0,0 +1,193 @@
+"""
+:mod:`biosim.sweep` runs a simulation for many parameter combinations and caches the results.
+
+A parameter space maps parameter names of the form ``'<species or landscape>.<parameter>'`` to
+values, e.g.::
+
+    space = {'Herbivore.zeta': [3.0, 3.5], 'L.f_max': [700.0, 800.0]}
+
+:func:`grid` expands such a space to all combinations of values, while :func:`latin_hypercube`
+samples points from ranges given as ``(low, high)`` pairs. Each point is run for a list of seeds
+with the configuration format of :mod:`biosim.ensemble`.
+
+Every result is stored in the cache directory in a file named by a hash of island map, initial
+population, all parameters, seed and stages. Running a sweep again, or with more points or seeds,
+only computes the results that are not in the cache yet.
+"""
+
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import copy
+import hashlib
+import itertools
+import json
+import os
+
+import numpy as np
+
+from .ensemble import run_replicate
+from . import state
+
+
+def grid(space):
+    """
+    Expands a parameter space to all combinations of values.
+
+    Parameters
+    ----------
+    space : dict
+        Dictionary mapping parameter names to lists of values.
+
+    Returns
+    -------
+    points : list
+        List of dictionaries mapping parameter names to values.
+    """
+    names = list(space)
+    return [dict(zip(names, values)) for values in itertools.product(*space.values())]
+
+
+def latin_hypercube(space, num_points, seed=None):
+    """
+    Samples points from a parameter space with Latin hypercube sampling.
+
+    Each parameter range is divided into num_points intervals of equal width, and every interval
+    is sampled exactly once.
+
+    Parameters
+    ----------
+    space : dict
+        Dictionary mapping parameter names to (low, high) pairs.
+    num_points : int
+        Number of points.
+    seed : int or None
+        Seed for the NumPy random number generator.
+
+    Returns
+    -------
+    points : list
+        List of dictionaries mapping parameter names to values.
+    """
+    rng = np.random.default_rng(seed)
+    columns = {}
+    for name, (low, high) in space.items():
+        strata = (rng.permutation(num_points) + rng.random(num_points)) / num_points
+        columns[name] = low + strata * (high - low)
+    return [{name: float(values[k]) for name, values in columns.items()}
+            for k in range(num_points)]
+
+
+def point_config(config, point):
+    """
+    Creates the configuration for one point of a parameter space.
+
+    Parameters
+    ----------
+    config : dict
+        Base configuration, see :mod:`biosim.ensemble`.
+    point : dict
+        Dictionary mapping parameter names to values.
+
+    Returns
+    -------
+    config : dict
+        Copy of config with the parameters of point added.
+    """
+    config = copy.deepcopy(config)
+    for name, value in point.items():
+        target, key = name.split('.')
+        group = 'landscape_params' if target in state.LANDSCAPES else 'animal_params'
+        config.setdefault(group, {}).setdefault(target, {})[key] = value
+    return config
+
+
+def cache_key(config, seed):
+    """
+    Computes the cache key of one run.
+
+    The key covers all parameters, including those left at their default values.
+
+    Parameters
+    ----------
+    config : dict
+        Configuration, see :mod:`biosim.ensemble`.
+    seed : int
+        Random number seed
+
+    Returns
+    -------
+    key : str
+        Hexadecimal SHA-256 hash.
+    """
+    params = state.default_params()
+    for group in ('animal_params', 'landscape_params'):
+        for name, values in config.get(group, {}).items():
+            params[name].update(values)
+    stages = config['stages'] if 'stages' in config else [{'num_years': config['num_years']}]
+    description = {'island_map': config['island_map'], 'ini_pop': config.get('ini_pop', []),
+                   'params': params, 'seed': seed, 'stages': stages}
+    text = json.dumps(description, sort_keys=True, default=str)
+    return hashlib.sha256(text.encode()).hexdigest()
+
+
+def _cache_file(cache_dir, key):
+    return os.path.join(cache_dir, f'{key}.npy')
+
+
+def _store(cache_dir, key, counts):
+    """Writes a result to the cache, replacing the file atomically."""
+    tmp_file = os.path.join(cache_dir, f'{key}.tmp.npy')
+    np.save(tmp_file, counts)
+    os.replace(tmp_file, _cache_file(cache_dir, key))
+
+
+def run(config, points, seeds, cache_dir, workers=None):
+    """
+    Runs a simulation for every point and seed, taking results from the cache where possible.
+
+    Parameters
+    ----------
+    config : dict
+        Base configuration, see :mod:`biosim.ensemble`.
+    points : list
+        Parameter points, e.g., from :func:`grid` or :func:`latin_hypercube`.
+    seeds : list
+        Seeds each point is run with.
+    cache_dir : str
+        Directory for cached results, created if it does not exist.
+    workers : int
+        Number of worker processes. If 1, runs take place in the calling process. If None, one
+        worker per CPU is used.
+
+    Returns
+    -------
+    counts : ndarray
+        Integer array of shape (points, seeds, num_years + 1, 2), where counts[p, s] is the result
+        of :func:`biosim.ensemble.run_replicate` for points[p] and seeds[s].
+    """
+    os.makedirs(cache_dir, exist_ok=True)
+    results = {}
+    missing = []
+    for p, point in enumerate(points):
+        point_cfg = point_config(config, point)
+        for s, seed in enumerate(seeds):
+            key = cache_key(point_cfg, seed)
+            if os.path.exists(_cache_file(cache_dir, key)):
+                results[p, s] = np.load(_cache_file(cache_dir, key))
+            else:
+                missing.append(((p, s), key, point_cfg, seed))
+
+    if workers == 1:
+        for index, key, point_cfg, seed in missing:
+            results[index] = run_replicate(point_cfg, seed)
+            _store(cache_dir, key, results[index])
+    elif missing:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = {pool.submit(run_replicate, point_cfg, seed): (index, key)
+                       for index, key, point_cfg, seed in missing}
+            for future in as_completed(futures):
+                index, key = futures[future]
+                results[index] = future.result()
+                _store(cache_dir, key, results[index])
+
+    return np.stack([np.stack([results[p, s] for s in range(len(seeds))])
+                     for p in range(len(points))])
@@ -0,0 +1,248 @@
+"""
+:mod:`biosim.telemetry` writes the progress of long simulations to a file for metrics scrapers.
+
+:meth:`biosim.simulation.BioSim.simulate` reports every simulated year to a
+:class:`TelemetryWriter`, which only stores a few totals. A timer thread writes the metrics to
+file every interval seconds and once more when the simulation stops. Counting the animals
+visits every cell, so the writer counts them at most once per interval, in the simulating
+thread, and once more when the simulation stops:
+
+=======================================  ===================================================
+``biosim_year``                          last simulated year
+``biosim_years_total``                   years simulated since the writer was created
+``biosim_years_per_second``              years per second since the previous sample
+``biosim_animal_years_per_second``       animals alive at the end of each year, summed over
+                                         the years, per second since the previous sample;
+                                         years between counts use the latest count
+``biosim_animals``                       animals alive at the latest count
+``biosim_peak_rss_bytes``                peak resident memory of the simulating process
+``biosim_simulation_seconds_total``      time spent in :meth:`biosim.island.Island.season`
+``biosim_graphics_seconds_total``        time spent updating and saving graphics
+=======================================  ===================================================
+
+Files ending in ``.prom`` are written in the Prometheus text format and replaced in one step,
+as expected by the textfile collector of the Prometheus node exporter. Other files get one JSON
+object per sample appended, e.g.::
+
+    {"time": 1718000000.0, "biosim_year": 120, "biosim_years_total": 120, ...}
+
+The peak memory is not available on Windows, and does not include worker processes of
+:class:`biosim.parallel.ParallelIsland`.
+"""
+
+import json
+import math
+import numbers
+import os
+import sys
+import threading
+import time
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+METRICS = {
+    'biosim_year': ('gauge', 'Last simulated year.'),
+    'biosim_years_total': ('counter', 'Years simulated.'),
+    'biosim_years_per_second': ('gauge', 'Years simulated per second.'),
+    'biosim_animal_years_per_second': ('gauge', 'Animal-years simulated per second.'),
+    'biosim_animals': ('gauge', 'Animals alive at the latest count.'),
+    'biosim_peak_rss_bytes': ('gauge', 'Peak resident memory of the simulating process.'),
+    'biosim_simulation_seconds_total': ('counter', 'Seconds spent simulating seasons.'),
+    'biosim_graphics_seconds_total': ('counter', 'Seconds spent updating and saving graphics.'),
+}
+"""Names of the metrics, mapped to their Prometheus type and help text."""
+
+_DEFAULT_INTERVAL = 10.0
+
+
+def peak_rss():
+    """
+    Peak resident memory of this process.
+
+    Returns
+    -------
+    rss : int or None
+        Bytes, or None if not available on this platform.
+    """
+    if resource is None:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss if sys.platform == 'darwin' else rss * 1024
+
+
+def _format_value(value):
+    """Formats a metric value without losing digits, integers without exponent."""
+    return str(int(value)) if isinstance(value, numbers.Integral) else repr(float(value))
+
+
+def to_prometheus(sample):
+    """
+    Formats a sample in the Prometheus text format.
+
+    Parameters
+    ----------
+    sample : dict
+        Sample as returned by :meth:`TelemetryWriter.sample`.
+
+    Returns
+    -------
+    text : str
+        Help, type and value of each available metric.
+    """
+    lines = []
+    for name, (kind, text) in METRICS.items():
+        if sample.get(name) is None:
+            continue
+        lines += [f'# HELP {name} {text}', f'# TYPE {name} {kind}',
+                  f'{name} {_format_value(sample[name])}']
+    return '\n'.join(lines) + '\n'
+
+
+class TelemetryWriter:
+    """Writes simulation metrics to file from a timer thread."""
+
+    def __init__(self, path, interval=None, fmt=None, count_animals=None):
+        """
+        Parameters
+        ----------
+        path : str
+            Path of the telemetry file.
+        interval : float
+            Seconds between samples, 10 if None.
+        fmt : str
+            'prometheus' or 'json'. If None, 'prometheus' for paths ending in ``.prom`` and
+            'json' otherwise.
+        count_animals : callable
+            Returns the number of animals alive. Called by :meth:`record_year` at most once per
+            interval and by :meth:`stop`. If None, the animal metrics are left out.
+
+        Raises
+        ------
+        ValueError
+        """
+        if interval is None:
+            interval = _DEFAULT_INTERVAL
+        if interval <= 0:
+            raise ValueError('interval must be positive')
+        if fmt is None:
+            fmt = 'prometheus' if path.endswith('.prom') else 'json'
+        if fmt not in ('prometheus', 'json'):
+            raise ValueError(f'This is not a valid telemetry format: {fmt}')
+
+        self.path = path
+        self.interval = interval
+        self.fmt = fmt
+        self._count_animals = count_animals
+        self._next_count = -math.inf
+        # Replaced as a whole, so the timer thread always reads consistent totals
+        self._totals = (0, 0, 0, None, 0.0, 0.0)
+        self._previous = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def record_year(self, year, simulation_seconds, graphics_seconds=0.0):
+        """
+        Adds one simulated year to the totals. Called by the simulation after every year.
+
+        The animals are counted if interval seconds have passed since the previous count.
+
+        Parameters
+        ----------
+        year : int
+            The year simulated.
+        simulation_seconds : float
+            Time spent simulating the year.
+        graphics_seconds : float
+            Time spent on graphics after the year.
+        """
+        _, years, animal_years, animals, simulation, graphics = self._totals
+        now = time.perf_counter()
+        if self._count_animals is not None and now >= self._next_count:
+            animals = self._count_animals()
+            self._next_count = now + self.interval
+        self._totals = (year, years + 1, animal_years + (animals or 0), animals,
+                        simulation + simulation_seconds, graphics + graphics_seconds)
+
+    def _recount(self):
+        """Counts the animals alive now, without adding a year."""
+        if self._count_animals is not None:
+            self._totals = self._totals[:3] + (self._count_animals(),) + self._totals[4:]
+            self._next_count = time.perf_counter() + self.interval
+
+    def sample(self):
+        """
+        Takes a sample of the metrics. Rates refer to the time since the previous sample, or
+        since :meth:`start` for the first sample.
+
+        Returns
+        -------
+        sample : dict
+            Dictionary mapping 'time', the Unix time of the sample, and the names in
+            :data:`METRICS` to values.
+        """
+        now = time.perf_counter()
+        year, years, animal_years, animals, simulation, graphics = self._totals
+        if self._previous is None:
+            self._previous = (now, 0, 0)
+        then, previous_years, previous_animal_years = self._previous
+        elapsed = now - then
+        self._previous = (now, years, animal_years)
+        animal_rate = None
+        if animals is not None:
+            animal_rate = (animal_years - previous_animal_years) / elapsed if elapsed > 0 else 0.0
+        return {'time': time.time(),
+                'biosim_year': year,
+                'biosim_years_total': years,
+                'biosim_years_per_second': ((years - previous_years) / elapsed
+                                            if elapsed > 0 else 0.0),
+                'biosim_animal_years_per_second': animal_rate,
+                'biosim_animals': animals,
+                'biosim_peak_rss_bytes': peak_rss(),
+                'biosim_simulation_seconds_total': simulation,
+                'biosim_graphics_seconds_total': graphics}
+
+    def write(self):
+        """Takes a sample and writes it to file."""
+        sample = self.sample()
+        if self.fmt == 'json':
+            with open(self.path, 'a') as telemetry:
+                telemetry.write(json.dumps(sample) + '\n')
+        else:
+            temporary = f'{self.path}.{os.getpid()}.tmp'
+            with open(temporary, 'w') as telemetry:
+                telemetry.write(to_prometheus(sample))
+            os.replace(temporary, self.path)
+
+    def _run(self):
+        """Main loop of the timer thread."""
+        while not self._stop.wait(self.interval):
+            self.write()
+
+    def start(self):
+        """
+        Starts writing samples every interval seconds. Does nothing if already started. The
+        animals are counted again after the first year recorded.
+        """
+        if self._thread is not None:
+            return
+        self._next_count = -math.inf
+        self._previous = (time.perf_counter(),) + self._totals[1:3]
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='biosim-telemetry', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """
+        Stops the timer thread, counts the animals and writes a last sample. Does nothing if not
+        started.
+        """
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._thread.join()
+        self._thread = None
+        self._recount()
+        self.write()
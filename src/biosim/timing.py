@@ -0,0 +1,232 @@
+"""
+:mod:`biosim.timing` records where the time of a simulation is spent.
+
+A :class:`PhaseTimer` attached to an :class:`biosim.island.Island` records the wall time and the
+number of calls of each phase of each year. Cell phases are timed per cell and may be broken
+down by landscape type:
+
+================================  ===========================================================
+``feeding_herbs``                 herbivores feed
+``feeding_carnivores``            carnivores feed
+``mating``                        animals give birth
+``migration``                     animals decide where to go and leave their cells
+``aging``, ``losing_weight``      animals age and lose weight; the fast and per-cell-stream
+                                  engines do both in one pass, recorded as ``aging``
+``dying``                         animals die
+``season``                        the whole year, including work not assigned to a phase,
+                                  e.g., placing arriving animals and seeding random streams
+================================  ===========================================================
+
+:class:`biosim.simulation.BioSim` adds ``logging`` (log file and cell record),
+``graphics_update``, ``graphics_save`` and ``checkpoint`` to the same years.
+
+Without a timer, the island does not measure anything, so timing costs nothing unless it is
+switched on.
+"""
+
+import time
+
+import numpy as np
+
+# Cell methods that are timed, and the phase they are recorded as
+CELL_PHASES = {'feeding_herbs': 'feeding_herbs',
+               'feeding_carnivores': 'feeding_carnivores',
+               'mating': 'mating',
+               'emigrate': 'migration',
+               'aging': 'aging',
+               'losing_weight': 'losing_weight',
+               'aging_and_losing_weight': 'aging',
+               'dying': 'dying'}
+
+# Phases recorded by BioSim outside the season
+SIMULATION_PHASES = ('logging', 'graphics_update', 'graphics_save', 'checkpoint')
+
+
+class _TimedCell:
+    """Stands in for a cell during a timed year and times the phase methods of the cell."""
+
+    def __init__(self, cell, timer):
+        self._cell = cell
+        self._timer = timer
+
+    def __getattr__(self, name):
+        attr = getattr(self._cell, name)
+        phase = CELL_PHASES.get(name)
+        if phase is None:
+            return attr
+        cell_type = type(self._cell).__name__
+        timer = self._timer
+
+        def timed(*args, **kwargs):
+            start = time.perf_counter()
+            result = attr(*args, **kwargs)
+            timer.add(phase, time.perf_counter() - start, cell_type)
+            return result
+        return timed
+
+
+class PhaseTimer:
+    """Wall time and number of calls of each phase, per simulated year."""
+
+    def __init__(self, by_cell_type=False):
+        """
+        Parameters
+        ----------
+        by_cell_type : bool
+            If True, cell phases are also recorded per landscape type.
+        """
+        self.by_cell_type = by_cell_type
+        self.years = []
+        self._times = []
+        self._calls = []
+        self._cell_times = []
+        self._cell_calls = []
+
+    def start_year(self, year):
+        """
+        Starts recording a new year. Does nothing if the year is already being recorded.
+
+        Parameters
+        ----------
+        year : int
+            The year being simulated.
+        """
+        if self.years and self.years[-1] == year:
+            return
+        self.years.append(year)
+        self._times.append({})
+        self._calls.append({})
+        self._cell_times.append({})
+        self._cell_calls.append({})
+
+    def add(self, phase, seconds, cell_type=None):
+        """
+        Records one call of a phase in the current year.
+
+        Parameters
+        ----------
+        phase : str
+            Name of the phase.
+        seconds : float
+            Wall time of the call.
+        cell_type : str
+            Name of the landscape type for cell phases.
+        """
+        if not self.years:
+            self.start_year(0)
+        times, calls = self._times[-1], self._calls[-1]
+        times[phase] = times.get(phase, 0.0) + seconds
+        calls[phase] = calls.get(phase, 0) + 1
+        if self.by_cell_type and cell_type is not None:
+            key = (phase, cell_type)
+            cell_times, cell_calls = self._cell_times[-1], self._cell_calls[-1]
+            cell_times[key] = cell_times.get(key, 0.0) + seconds
+            cell_calls[key] = cell_calls.get(key, 0) + 1
+
+    def wrap(self, cell):
+        """Returns a stand-in for the cell that records the time of its phases."""
+        return _TimedCell(cell, self)
+
+    @property
+    def phases(self):
+        """Names of all recorded phases, in the order they were first recorded."""
+        names = {}
+        for times in self._times:
+            names.update(dict.fromkeys(times))
+        return list(names)
+
+    @property
+    def cell_types(self):
+        """Names of all landscape types with recorded phases."""
+        return sorted({cell_type for times in self._cell_times for _, cell_type in times})
+
+    def times(self, phase, cell_type=None):
+        """
+        Wall time of a phase in each recorded year.
+
+        Parameters
+        ----------
+        phase : str
+            Name of the phase.
+        cell_type : str
+            If given, only the time spent in cells of this landscape type, e.g., 'Lowland'.
+
+        Returns
+        -------
+        seconds : ndarray
+            One value per year in :attr:`years`.
+        """
+        if cell_type is None:
+            return np.array([times.get(phase, 0.0) for times in self._times])
+        return np.array([times.get((phase, cell_type), 0.0) for times in self._cell_times])
+
+    def calls(self, phase, cell_type=None):
+        """
+        Number of calls of a phase in each recorded year, see :meth:`times`.
+
+        Returns
+        -------
+        calls : ndarray
+            One value per year in :attr:`years`.
+        """
+        if cell_type is None:
+            return np.array([calls.get(phase, 0) for calls in self._calls], dtype=np.int64)
+        return np.array([calls.get((phase, cell_type), 0) for calls in self._cell_calls],
+                        dtype=np.int64)
+
+    def totals(self):
+        """
+        Total wall time of each phase over all recorded years.
+
+        Returns
+        -------
+        totals : dict
+            Dictionary mapping phase names to seconds.
+        """
+        return {phase: float(self.times(phase).sum()) for phase in self.phases}
+
+    def to_dict(self):
+        """
+        All records in a form that can be written as JSON.
+
+        Returns
+        -------
+        records : dict
+            Dictionary with the list of 'years', and 'times' and 'calls' mapping each phase to
+            one value per year. If recorded by cell type, 'cell_times' and 'cell_calls' map
+            each landscape type to the same kind of dictionary.
+        """
+        records = {'years': list(self.years),
+                   'times': {phase: self.times(phase).tolist() for phase in self.phases},
+                   'calls': {phase: self.calls(phase).tolist() for phase in self.phases}}
+        if self.by_cell_type:
+            cell_phases = [phase for phase in self.phases if phase in CELL_PHASES.values()]
+            records['cell_times'] = {cell_type: {phase: self.times(phase, cell_type).tolist()
+                                                 for phase in cell_phases}
+                                     for cell_type in self.cell_types}
+            records['cell_calls'] = {cell_type: {phase: self.calls(phase, cell_type).tolist()
+                                                 for phase in cell_phases}
+                                     for cell_type in self.cell_types}
+        return records
+
+    def summary(self):
+        """
+        Table of the total time, share of the total time and number of calls of each phase.
+        The total time is the time of the seasons and of the phases outside the seasons.
+
+        Returns
+        -------
+        table : str
+            One line per phase.
+        """
+        totals = self.totals()
+        if 'season' in totals:
+            total = totals['season'] + sum(totals.get(phase, 0.0) for phase in SIMULATION_PHASES)
+        else:
+            total = sum(totals.values())
+        lines = [f'{"phase":<20}{"seconds":>12}{"share":>8}{"calls":>10}']
+        for phase, seconds in totals.items():
+            share = seconds / total if total > 0 else 0.0
+            lines.append(f'{phase:<20}{seconds:>12.4f}{share:>8.1%}'
+                         f'{int(self.calls(phase).sum()):>10}')
+        return '\n'.join(lines)
@@ -0,0 +1,372 @@
+"""
+:mod:`biosim.vectorized` simulates many replicates of one island at the same time.
+
+All animals of a species, across all replicates, are stored in one set of arrays holding the
+replicate index, cell index, age, weight and fitness of every animal. Each phase of a year is
+carried out by NumPy operations on these arrays, so one call to :meth:`ReplicateIsland.season`
+advances all replicates at once. This pays off for small islands, where the work per replicate
+is too small to make running replicates in separate processes worthwhile.
+
+The model is the same as in :class:`biosim.island.Island`, including the animal and landscape
+parameters set on the animal and landscape classes, but random numbers are drawn from a NumPy
+generator in a different order. Results therefore agree with the object engine in distribution,
+not in individual trajectories.
+
+Cells are indexed row by row, i.e. the cell at location (i, j) has index (i-1)*cols + (j-1).
+"""
+
+import numpy as np
+
+from .animal import Herbivore, Carnivore
+from .cell import Desert
+from .columns import Columns
+from .island import Island
+from .islandmap import IslandMap, LETTERS
+
+# Order of neighbours matches the order of the choices in Island.handle_migration
+_DIRECTIONS = ((0, -1), (0, 1), (-1, 0), (1, 0))
+
+# Number of herbivores a carnivore tries to kill in one vectorized step
+_KILL_WINDOW = 16
+
+
+def fitness(cls, age, weight):
+    """
+    Computes the fitness of animals.
+
+    Parameters
+    ----------
+    cls : class
+        Herbivore or Carnivore, provides the parameters.
+    age, weight : ndarray
+        Ages and weights of the animals.
+
+    Returns
+    -------
+    fitness : ndarray
+        Fitness of the animals, zero for animals without weight.
+    """
+    with np.errstate(over='ignore'):
+        q_plus = 1 / (1 + np.exp(cls.phi_age * (age - cls.a_half)))
+        q_minus = 1 / (1 + np.exp(-cls.phi_weight * (weight - cls.w_half)))
+    return np.where(weight <= 0, 0.0, q_plus * q_minus)
+
+
+def _group_ranks(groups):
+    """Returns the position of each element within its run of equal values in sorted groups."""
+    index = np.arange(len(groups))
+    starts = np.r_[True, groups[1:] != groups[:-1]]
+    return index - np.maximum.accumulate(np.where(starts, index, 0))
+
+
+class _Population(Columns):
+    """Column-wise storage of all animals of one species."""
+
+    def __init__(self, cls):
+        self.cls = cls
+        super().__init__(rep=np.zeros(0, dtype=np.int64), cell=np.zeros(0, dtype=np.int64),
+                         age=np.zeros(0, dtype=np.int64), weight=np.zeros(0, dtype=np.float64),
+                         fitness=np.zeros(0, dtype=np.float64))
+
+    def update_fitness(self, index=slice(None)):
+        self.fitness[index] = fitness(self.cls, self.age[index], self.weight[index])
+
+
+class ReplicateIsland:
+    """
+    Island simulated in many independent replicates at the same time.
+    """
+
+    def __init__(self, island_map, ini_pop=None, num_replicates=1, seed=None):
+        """
+        Parameters
+        ----------
+        island_map : str
+            Map of the island with a letter representing each cell.
+            Legal letters: {'W', 'H', 'D', 'L'}
+        ini_pop : list of dictionaries
+            The initial population, placed in every replicate.
+        num_replicates : int
+            Number of replicates.
+        seed : int or None
+            Seed for the NumPy random number generator.
+        """
+        if num_replicates < 1:
+            raise ValueError('num_replicates must be a positive integer')
+
+        island_map = IslandMap.compile(island_map)
+        self.map_dims = island_map.shape
+        self.num_replicates = num_replicates
+        self._num_cells = self.map_dims[0] * self.map_dims[1]
+        classes = [Island.cell_dict[letter] for letter in LETTERS]
+        self._cell_types = [classes[code] for code in island_map.types.ravel().tolist()]
+        self._habitable = np.array([cls.habitable for cls in self._cell_types])
+        self._feeds = np.array([cls.habitable and not issubclass(cls, Desert)
+                                for cls in self._cell_types])
+
+        rows, cols = self.map_dims
+        row, col = np.divmod(np.arange(self._num_cells), cols)
+        self._neighbours = np.stack(
+            [np.clip(row + d_row, 0, rows - 1) * cols + np.clip(col + d_col, 0, cols - 1)
+             for d_row, d_col in _DIRECTIONS], axis=1)
+
+        self._rng = np.random.default_rng(seed)
+        self.herbs = _Population(Herbivore)
+        self.carns = _Population(Carnivore)
+        if ini_pop is not None:
+            self.add_pop(ini_pop)
+
+    def _cell_index(self, loc):
+        return (loc[0] - 1) * self.map_dims[1] + (loc[1] - 1)
+
+    def add_pop(self, pop):
+        """
+        Add population to every replicate. Animals placed in Water cells are ignored.
+
+        Parameters
+        ----------
+        pop : list of dictionaries
+            The population to be added.
+        """
+        for pop_dict in pop:
+            cell = self._cell_index(pop_dict['loc'])
+            if not self._habitable[cell]:
+                continue
+            for species, population in (('Herbivore', self.herbs), ('Carnivore', self.carns)):
+                animals = [a for a in pop_dict['pop'] if a['species'] == species]
+                if not animals:
+                    continue
+                age = np.array([a['age'] for a in animals], dtype=np.int64)
+                weight = np.array([a['weight'] for a in animals], dtype=np.float64)
+                if np.any(age < 0) or np.any(weight < 0):
+                    raise ValueError('Age and weight must be positive numbers')
+                reps = np.repeat(np.arange(self.num_replicates), len(animals))
+                age = np.tile(age, self.num_replicates)
+                weight = np.tile(weight, self.num_replicates)
+                population.append(rep=reps, cell=np.full(len(reps), cell), age=age, weight=weight,
+                                  fitness=fitness(population.cls, age, weight))
+
+    def _groups(self, population):
+        return population.rep * self._num_cells + population.cell
+
+    def feeding_herbs(self):
+        """Herbivores eat in order of fitness, the fittest first, while fodder is left."""
+        herbs = self.herbs
+        if len(herbs) == 0:
+            return
+        f_max = np.array([cls.f_max for cls in self._cell_types], dtype=np.float64)
+        f_max[~self._feeds] = 0
+        groups = self._groups(herbs)
+        order = np.lexsort((-herbs.fitness, groups))
+        rank = _group_ranks(groups[order])
+        eats = order[(rank + 1) * Herbivore.F <= f_max[herbs.cell[order]]]
+        herbs.weight[eats] += Herbivore.beta * Herbivore.F
+        herbs.update_fitness(eats)
+
+    def feeding_carnivores(self):
+        """
+        Carnivores eat in random order. Each carnivore tries to kill the herbivores in its cell
+        from the least fit upwards until it has eaten enough or no herbivores are left.
+        """
+        herbs, carns = self.herbs, self.carns
+        if len(herbs) == 0 or len(carns) == 0:
+            return
+
+        carn_groups = self._groups(carns)
+        herb_groups = self._groups(herbs)
+        groups = np.unique(carn_groups)
+        herb_row = np.searchsorted(groups, herb_groups)
+        herb_row[herb_row == len(groups)] = 0
+        has_carn = groups[herb_row] == herb_groups
+        if not has_carn.any():
+            return
+
+        herb_order = np.lexsort((herbs.fitness, herb_groups))
+        herb_order = herb_order[has_carn[herb_order]]
+        herb_rank = _group_ranks(herb_groups[herb_order])
+        herb_mat = np.full((len(groups), herb_rank.max() + 1), -1)
+        herb_mat[herb_row[herb_order], herb_rank] = herb_order
+
+        carn_order = np.lexsort((self._rng.random(len(carns)), carn_groups))
+        carn_rank = _group_ranks(carn_groups[carn_order])
+        carn_mat = np.full((len(groups), carn_rank.max() + 1), -1)
+        carn_mat[np.searchsorted(groups, carn_groups[carn_order]), carn_rank] = carn_order
+
+        # Herbivores are tried in windows of columns. Herbivores are sorted by fitness, so once
+        # a herbivore is at least as fit as the carnivore, none of the remaining ones can be
+        # killed and the carnivore stops.
+        num_cols = herb_mat.shape[1]
+        window = np.arange(min(num_cols, _KILL_WINDOW))
+        delta_phi_max = Carnivore.DeltaPhiMax
+        for carn_col in carn_mat.T:
+            active = carn_col >= 0
+            eaten = np.zeros(len(groups))
+            start = np.zeros(len(groups), dtype=np.int64)
+            while True:
+                rows = active.nonzero()[0]
+                first_prey = herb_mat[rows, np.minimum(start[rows], num_cols - 1)]
+                carn_fitness = carns.fitness[carn_col[rows]]
+                done = ((start[rows] >= num_cols) | (first_prey < 0)
+                        | (eaten[rows] >= Carnivore.F)
+                        | (herbs.fitness[first_prey] >= carn_fitness))
+                active[rows[done]] = False
+                rows, carn_fitness = rows[~done], carn_fitness[~done]
+                if len(rows) == 0:
+                    break
+
+                cols = start[rows, None] + window
+                candidates = herb_mat[rows[:, None], np.minimum(cols, num_cols - 1)]
+                valid = (cols < num_cols) & (candidates >= 0) & (herbs.weight[candidates] > 0)
+                diff = carn_fitness[:, None] - herbs.fitness[candidates]
+                with np.errstate(divide='ignore', invalid='ignore'):
+                    p_kill = np.where(diff < delta_phi_max, diff / delta_phi_max, 1.0)
+                p_kill = np.where(diff > 0, p_kill, 0.0)
+                kills = valid & (self._rng.random(candidates.shape) < p_kill)
+                killed = kills.any(axis=1)
+                start[rows[~killed]] += len(window)
+
+                rows = rows[killed]
+                first = kills[killed].argmax(axis=1)
+                prey = candidates[killed, first]
+                hunter = carn_col[rows]
+                amount = np.minimum(herbs.weight[prey], Carnivore.F - eaten[rows])
+                carns.weight[hunter] += Carnivore.beta * amount
+                carns.update_fitness(hunter)
+                eaten[rows] += herbs.weight[prey]
+                herbs.weight[prey] = 0
+                start[rows] += first + 1
+
+    def _mating(self, population):
+        cls = population.cls
+        num = len(population)
+        if num == 0:
+            return
+        groups = self._groups(population)
+        n = np.bincount(groups)[groups]
+        newborn_weight = np.maximum(self._rng.normal(cls.w_birth, cls.sigma_birth, num), 0)
+        p_birth = np.minimum(1.0, cls.gamma * population.fitness * (n - 1))
+        gives_birth = ((population.weight > cls.zeta * (cls.w_birth + cls.sigma_birth))
+                       & (population.weight > newborn_weight * cls.xi)
+                       & (self._rng.random(num) < p_birth))
+        newborn_weight = newborn_weight[gives_birth]
+        population.weight[gives_birth] -= cls.xi * newborn_weight
+        age = np.zeros(len(newborn_weight), dtype=np.int64)
+        population.append(rep=population.rep[gives_birth], cell=population.cell[gives_birth],
+                          age=age, weight=newborn_weight,
+                          fitness=fitness(cls, age, newborn_weight))
+
+    def mating(self):
+        """Animals give birth with given probability."""
+        self._mating(self.herbs)
+        self._mating(self.carns)
+
+    def handle_migration(self):
+        """Animals migrate to a random neighbouring cell, unless that cell is Water."""
+        for population in (self.herbs, self.carns):
+            num = len(population)
+            moves = self._rng.random(num) <= population.cls.mu * population.fitness
+            target = self._neighbours[population.cell, self._rng.integers(0, 4, num)]
+            moves &= self._habitable[target]
+            population.cell[moves] = target[moves]
+
+    def aging(self):
+        """All animals age by one year."""
+        for population in (self.herbs, self.carns):
+            population.age += 1
+            population.update_fitness()
+
+    def losing_weight(self):
+        """All animals lose weight."""
+        for population in (self.herbs, self.carns):
+            population.weight -= population.cls.eta * population.weight
+            population.update_fitness()
+
+    def dying(self):
+        """Animals die with given probability, animals without weight die for certain."""
+        for population in (self.herbs, self.carns):
+            p_death = population.cls.omega * (1 - population.fitness)
+            dies = (population.weight == 0) | (self._rng.random(len(population)) < p_death)
+            population.keep(~dies)
+
+    def season(self):
+        """
+        Represents a year passing in all replicates.
+        """
+        self.feeding_herbs()
+        self.feeding_carnivores()
+        self.mating()
+        self.handle_migration()
+        self.aging()
+        self.losing_weight()
+        self.dying()
+
+    def total_herb_count(self):
+        """
+        Number of herbivores in each replicate.
+
+        Returns
+        -------
+        num : ndarray
+            Integer array of length num_replicates.
+        """
+        return np.bincount(self.herbs.rep, minlength=self.num_replicates)
+
+    def total_carn_count(self):
+        """
+        Number of carnivores in each replicate.
+
+        Returns
+        -------
+        num : ndarray
+            Integer array of length num_replicates.
+        """
+        return np.bincount(self.carns.rep, minlength=self.num_replicates)
+
+    def _distribution(self, population):
+        counts = np.bincount(self._groups(population),
+                             minlength=self.num_replicates * self._num_cells)
+        return counts.reshape((self.num_replicates,) + self.map_dims)
+
+    def herb_distribution(self):
+        """
+        Number of herbivores in each cell of each replicate.
+
+        Returns
+        -------
+        distr : ndarray
+            Integer array of shape (num_replicates, rows, cols).
+        """
+        return self._distribution(self.herbs)
+
+    def carn_distribution(self):
+        """
+        Number of carnivores in each cell of each replicate.
+
+        Returns
+        -------
+        distr : ndarray
+            Integer array of shape (num_replicates, rows, cols).
+        """
+        return self._distribution(self.carns)
+
+    def simulate(self, num_years):
+        """
+        Simulate a number of years and record the counts after each year.
+
+        Parameters
+        ----------
+        num_years : int
+            Number of years to simulate.
+
+        Returns
+        -------
+        counts : ndarray
+            Integer array of shape (num_replicates, num_years, 2) with the number of herbivores
+            and carnivores in each replicate after each year.
+        """
+        counts = np.zeros((self.num_replicates, num_years, 2), dtype=np.int64)
+        for year in range(num_years):
+            self.season()
+            counts[:, year, 0] = self.total_herb_count()
+            counts[:, year, 1] = self.total_carn_count()
+        return counts
@@ -0,0 +1,77 @@
+import itertools
+import json
+
+import pytest
+from biosim import benchmark
+from biosim.island import Island
+
+
+def test_square_map_valid():
+    """Tests that benchmark maps are accepted by Island."""
+    isle = Island(benchmark.square_map(5), benchmark.populate(5, 2, 0.5))
+    assert isle.total_herb_count() == 2 * 9
+    assert isle.total_carn_count() == 9
+
+
+def test_square_map_too_small():
+    """Tests that a map without land is rejected."""
+    with pytest.raises(ValueError):
+        benchmark.square_map(2)
+
+
+def test_time_case():
+    """Tests that a case reports a time for the season and every phase."""
+    result = benchmark.time_case(4, 3, 0.5, years=1, repeats=1)
+    assert result['name'] == 'map=4x4,density=3,ratio=0.5'
+    assert result['season'] > 0
+    assert set(result['phases']) == set(benchmark.PHASES)
+
+
+def test_compare_thresholds():
+    """Tests that only slowdowns above the threshold are regressions."""
+    phases = dict.fromkeys(benchmark.PHASES, 1.0)
+    baseline = {'cases': [{'name': 'a', 'season': 1.0, 'phases': phases}]}
+    results = {'cases': [{'name': 'a', 'season': 1.1, 'phases': dict(phases, mating=1.5)},
+                         {'name': 'b', 'season': 9.0, 'phases': phases}]}
+    assert benchmark.compare(results, baseline, threshold=0.2, phase_threshold=0.6) == []
+    regressions = benchmark.compare(results, baseline, threshold=0.2)
+    assert [(r['name'], r['metric']) for r in regressions] == [('a', 'mating')]
+
+
+def test_main_baseline(tmp_path, capsys):
+    """Tests that the command line writes JSON and flags a slower run than the baseline."""
+    output = tmp_path / 'results.json'
+    args = ['--sizes', '3', '--densities', '2', '--ratios', '0', '--years', '1', '--repeats', '1']
+    assert benchmark.main(args + ['--output', str(output)]) == 0
+    results = json.loads(output.read_text())
+    assert [case['name'] for case in results['cases']] == ['map=3x3,density=2,ratio=0']
+
+    results['cases'][0]['season'] = 1e-12
+    output.write_text(json.dumps(results))
+    assert benchmark.main(args + ['--baseline', str(output)]) == 1
+    assert 'REGRESSION' in capsys.readouterr().out
+
+
+def test_stored_baseline():
+    """Tests that the stored baseline covers every case of the quick preset."""
+    with open(benchmark.baseline_path('quick')) as baseline_file:
+        baseline = json.load(baseline_file)
+    preset = benchmark.PRESETS['quick']
+    names = {benchmark.case_name(size, density, ratio)
+             for size, density, ratio in itertools.product(preset['sizes'], preset['densities'],
+                                                           preset['ratios'])}
+    assert {case['name'] for case in baseline['cases']} == names
+    assert benchmark.baseline_path('large') is None
+
+
+def test_main_default_baseline(tmp_path, monkeypatch):
+    """Tests that the command line compares with the stored baseline unless disabled."""
+    output = tmp_path / 'results.json'
+    args = ['--sizes', '3', '--densities', '2', '--ratios', '0', '--years', '1', '--repeats', '1']
+    assert benchmark.main(args + ['--output', str(output), '--no-baseline']) == 0
+    results = json.loads(output.read_text())
+    results['cases'][0]['season'] = 1e-12
+    output.write_text(json.dumps(results))
+    monkeypatch.setattr(benchmark, 'baseline_path', lambda preset: str(output))
+    assert benchmark.main(args) == 1
+    assert benchmark.main(args + ['--no-baseline']) == 0
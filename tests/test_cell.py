@@ -279,3 +279,64 @@ def test_remove_animal():
     herbs_migr = [herb for herb in low.herb_pop]
     low.remove_animal(herbs_migr)
     assert len(low.herb_pop) == 0
+
+
+@pytest.mark.parametrize('cell_type, expected_unfed',
+                         [(Lowland, 120), (Highland, 170), (Desert, 200)])
+def test_unfed_herbs_counted(cell_type, expected_unfed):
+    """Tests that herbivores finding less fodder than they want to eat are counted as unfed."""
+    cell = cell_type(ini_pop_many)
+    cell.feeding_herbs()
+    assert cell.take_events()['unfed_herbs'] == expected_unfed
+
+
+def test_births_and_deaths_counted():
+    """Tests that the counted births and deaths equal the changes of the populations."""
+    random.seed(SEED)
+    pop = [{'species': species, 'age': 5, 'weight': 40}
+           for species in ('Herbivore', 'Carnivore') for _ in range(50)]
+    cell = Lowland(pop)
+    cell.mating()
+    events = cell.take_events()
+    assert events['herb_births'] == cell.herb_count() - 50 > 0
+    assert events['carn_births'] == cell.carn_count() - 50 > 0
+
+    herbs, carns = cell.herb_count(), cell.carn_count()
+    for _ in range(10):
+        cell.dying()
+    events = cell.take_events()
+    assert events['herb_deaths'] == herbs - cell.herb_count() > 0
+    assert events['carn_deaths'] == carns - cell.carn_count() > 0
+
+
+@pytest.mark.parametrize('set_params_carn', [{'DeltaPhiMax': 1.0, 'F': 10000, 'beta': 1.0}],
+                         indirect=True)
+def test_kills_counted(set_params_carn):
+    """Tests that every herbivore killed by a carnivore is counted once."""
+    random.seed(SEED)
+    herbs = [{'species': 'Herbivore', 'age': Herbivore.a_half, 'weight': Herbivore.w_half}
+             for _ in range(100)]
+    low = Lowland(herbs + [{'species': 'Carnivore', 'age': 2, 'weight': 1000}])
+    low.feeding_carnivores()
+    killed = len([herb for herb in low.herb_pop if herb.weight == 0])
+    assert low.take_events()['kills'] == killed > 0
+
+
+def test_migrations_counted():
+    """Tests that migrants are counted as accepted or rejected by the habitability of targets."""
+    random.seed(SEED)
+    pop = [{'species': 'Herbivore', 'age': 5, 'weight': 20} for _ in range(500)]
+    low = Lowland(pop)
+    emigrants = low.emigrate((2, 2), {(2, 1), (2, 3)})
+    events = low.take_events()
+    assert events['migrations'] == sum(len(herbs) for herbs, _ in emigrants.values())
+    assert events['migrations'] == 500 - low.herb_count()
+    assert events['rejected_migrations'] > 0
+
+
+def test_take_events_resets():
+    """Tests that counting starts from zero after the events have been taken."""
+    cell = Desert(ini_pop_many)
+    cell.feeding_herbs()
+    assert cell.take_events()['unfed_herbs'] > 0
+    assert set(cell.take_events().values()) == {0}
@@ -0,0 +1,79 @@
+import numpy as np
+import pytest
+from biosim.columns import Columns
+
+
+def make_columns(num):
+    """Columns 'a' = 0, 1, ... and 'b' = 0.0, 0.5, ... with num elements."""
+    return Columns(a=np.arange(num), b=np.arange(num) / 2)
+
+
+def test_append_doubles_capacity():
+    """Tests that appending one element at a time doubles the capacity when full."""
+    columns = make_columns(0)
+    capacities = set()
+    for value in range(100):
+        columns.append(a=[value], b=[value / 2])
+        capacities.add(columns.capacity)
+    assert sorted(capacities) == [8, 16, 32, 64, 128]
+    assert columns.a.tolist() == list(range(100))
+    assert np.array_equal(columns.b, np.arange(100) / 2)
+
+
+def test_append_in_place():
+    """Tests that appending within the capacity keeps the buffers."""
+    columns = make_columns(3)
+    buffer = columns._buffers['a']
+    columns.extend(make_columns(4))
+    assert columns._buffers['a'] is buffer
+    assert columns.a.tolist() == [0, 1, 2, 0, 1, 2, 3]
+
+
+def test_keep_stable():
+    """Tests that keep preserves the order of the remaining elements."""
+    columns = make_columns(10)
+    columns.keep(columns.a % 3 == 0)
+    assert columns.a.tolist() == [0, 3, 6, 9]
+    assert columns.b.tolist() == [0.0, 1.5, 3.0, 4.5]
+
+
+def test_swap_remove():
+    """Tests that swap_remove fills the gaps with the last remaining elements."""
+    columns = make_columns(10)
+    columns.swap_remove([1, 4, 8])
+    assert columns.a.tolist() == [0, 7, 2, 3, 9, 5, 6]
+    assert np.array_equal(columns.b, columns.a / 2)
+
+
+def test_shrink():
+    """Tests that buffers are halved when less than a quarter full."""
+    columns = make_columns(100)
+    columns.keep(columns.a < 10)
+    assert columns.capacity == 25
+    assert columns.a.tolist() == list(range(10))
+
+
+def test_modify_in_place():
+    """Tests that in-place changes of the column attributes are stored."""
+    columns = make_columns(5)
+    columns.a += 1
+    columns.b[[0, 2]] = -1
+    columns.append(a=[0], b=[0.0])
+    assert columns.a.tolist() == [1, 2, 3, 4, 5, 0]
+    assert columns.b.tolist() == [-1, 0.5, -1, 1.5, 2.0, 0.0]
+
+
+def test_take():
+    """Tests that take copies the selected elements into an independent store."""
+    columns = make_columns(5)
+    columns.name = 'herd'
+    taken = columns.take(columns.a > 2)
+    taken.a += 10
+    assert taken.a.tolist() == [13, 14] and taken.name == 'herd'
+    assert columns.a.tolist() == [0, 1, 2, 3, 4]
+
+
+def test_unequal_lengths():
+    """Tests that columns of different lengths raise ValueError."""
+    with pytest.raises(ValueError):
+        Columns(a=np.arange(3), b=np.arange(4))
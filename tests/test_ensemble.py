@@ -0,0 +1,61 @@
+import textwrap
+
+import numpy as np
+import pytest
+from biosim import ensemble, state
+
+geogr = """\
+           WWW
+           WLW
+           WWW"""
+geogr = textwrap.dedent(geogr)
+ini_herbs = [{'loc': (2, 2),
+              'pop': [{'species': 'Herbivore', 'age': 5, 'weight': 20} for _ in range(20)]}]
+ini_carns = [{'loc': (2, 2),
+              'pop': [{'species': 'Carnivore', 'age': 5, 'weight': 20} for _ in range(5)]}]
+config = {'island_map': geogr,
+          'ini_pop': ini_herbs,
+          'animal_params': {'Carnivore': {'F': 40.0}},
+          'stages': [{'num_years': 5}, {'population': ini_carns, 'num_years': 5}]}
+
+
+def test_derive_seeds():
+    """Tests that derived seeds are reproducible and distinct."""
+    seeds = ensemble.derive_seeds(12345, 10)
+    assert seeds == ensemble.derive_seeds(12345, 10)
+    assert len(set(seeds)) == 10
+
+
+def test_replicate_shape():
+    """Tests that a replicate records initial counts and one row per year."""
+    counts = ensemble.run_replicate(config, 1)
+    assert counts.shape == (11, 2)
+    assert counts[0].tolist() == [20, 0]
+    assert counts[5, 1] == 0
+
+
+def test_caller_params_unchanged():
+    """Tests that replicates use the configured parameters and leave the class parameters."""
+    params = state.get_params()
+    try:
+        state.set_params({'Carnivore': {'F': 1.0}})
+        counts = ensemble.run_replicate(config, 1)
+        assert state.get_params()['Carnivore']['F'] == 1.0
+        state.set_params(state.default_params())
+        np.testing.assert_array_equal(ensemble.run_replicate(config, 1), counts)
+    finally:
+        state.set_params(params)
+
+
+def test_workers_reproducible():
+    """Tests that results do not depend on the number of workers."""
+    seeds, serial = ensemble.run(config, master_seed=1, num_replicates=4, workers=1)
+    _, pooled = ensemble.run(config, seeds=seeds.tolist(), workers=2)
+    assert serial.shape == (4, 11, 2)
+    np.testing.assert_array_equal(serial, pooled)
+
+
+def test_missing_seeds():
+    """Tests that run without seeds or master seed raises ValueError."""
+    with pytest.raises(ValueError):
+        ensemble.run(config, master_seed=1)
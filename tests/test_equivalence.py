@@ -0,0 +1,82 @@
+import numpy as np
+import pytest
+from biosim import equivalence, state
+
+mono_ho = equivalence.shorten(equivalence.SCENARIOS['mono_ho'], 15)
+
+
+def run_hungry(config, seed):
+    """Object engine with herbivores that die much more often, a different model."""
+    config = dict(config, animal_params={'Herbivore': {'omega': 0.9}})
+    return equivalence.run_object(config, seed)
+
+
+def test_shorten():
+    """Tests that shortened scenarios keep their stages up to the given number of years."""
+    config = equivalence.shorten(equivalence.SCENARIOS['mono_hc'], 60)
+    assert [stage['num_years'] for stage in config['stages']] == [50, 10]
+    assert config['stages'][1]['population']
+
+
+def test_cohens_d():
+    """Tests Cohen's d for samples with known means and pooled standard deviation."""
+    assert equivalence.cohens_d([1, 2, 3], [0, 1, 2]) == pytest.approx(1.0)
+    assert equivalence.cohens_d([1, 1], [1, 1]) == 0
+
+
+def test_checkpoint_years():
+    """Tests that checkpoints are distinct years ending with the last year."""
+    assert equivalence.checkpoint_years(100, 4) == [25, 50, 75, 100]
+    assert equivalence.checkpoint_years(3, 5) == [1, 2, 3]
+
+
+def test_sample_shapes():
+    """Tests that a sample holds counts for every year and the final attributes."""
+    sample = equivalence.run_vectorized(mono_ho, 1)
+    assert sample['counts'].shape == (16, 2)
+    assert len(sample['final']['Herbivore']['weight']) == sample['counts'][-1, 0]
+
+
+def test_params_restored():
+    """Tests that engines use the configured parameters and leave the class parameters."""
+    config = dict(mono_ho, animal_params={'Herbivore': {'omega': 0.9}})
+    before = state.get_params()
+    hungry = equivalence.run_vectorized(config, 1)
+    assert state.get_params() == before
+    assert hungry['counts'][-1, 0] < equivalence.run_vectorized(mono_ho, 1)['counts'][-1, 0]
+    equivalence.run_object(config, 1)
+    assert state.get_params() == before
+
+
+def test_tost():
+    """Tests that equivalence is shown only for differences well within the margin."""
+    rng = np.random.default_rng(1)
+    sample = rng.normal(size=400)
+    assert equivalence.tost(sample, sample + 0.05, 0.5)['p_value'] < 0.05
+    shifted = equivalence.tost(sample, sample + 1, 0.5)
+    assert shifted['p_value'] > 0.05
+    assert shifted['upper'] < -0.5
+    assert equivalence.tost([1, 1], [1, 1], 0.1)['p_value'] == 0
+    assert equivalence.tost([0, 0], [0, 1, 1], 0.1, standardized=False)['p_value'] > 0.05
+
+
+def test_vectorized_equivalent():
+    """Tests that the vectorized engine passes against the object engine."""
+    reports = equivalence.run_harness(equivalence.run_vectorized, {'mono_ho': mono_ho},
+                                      num_seeds=200, workers=1)
+    assert reports['mono_ho'].passed, str(reports['mono_ho'])
+
+
+def test_few_seeds_fail():
+    """Tests that too few seeds to show equivalence fail and report low power."""
+    reports = equivalence.run_harness(equivalence.run_vectorized, {'mono_ho': mono_ho},
+                                      num_seeds=10, workers=1)
+    assert not reports['mono_ho'].passed
+    assert reports['mono_ho'].min_power < 0.5
+
+
+def test_different_model_detected():
+    """Tests that an engine with a different death probability fails."""
+    reports = equivalence.run_harness(run_hungry, {'mono_ho': mono_ho}, num_seeds=50, workers=1)
+    assert not reports['mono_ho'].passed
+    assert any(result['upper'] < -1 for result in reports['mono_ho'].failures)
@@ -0,0 +1,160 @@
+import math
+import random
+import textwrap
+
+import numpy as np
+import pytest
+from biosim import equivalence, hybrid
+from biosim.animal import Herbivore, Carnivore
+from biosim.island import Island
+from biosim.simulation import BioSim
+
+geogr = textwrap.dedent("""\
+                        WWWWW
+                        WLLHW
+                        WDLLW
+                        WWWWW""")
+ini_pop = [{'loc': (2, 2),
+            'pop': [{'species': 'Herbivore', 'age': 5, 'weight': 20} for _ in range(150)]
+            + [{'species': 'Carnivore', 'age': 5, 'weight': 20} for _ in range(15)]}]
+
+
+def make_cell(num_herbs, num_carns=0, threshold=0, weight=20):
+    """Lowland cell with num_herbs herbivores and num_carns carnivores."""
+    return hybrid.HybridLowland([{'species': 'Herbivore', 'age': 5, 'weight': weight}] * num_herbs
+                                + [{'species': 'Carnivore', 'age': 5, 'weight': 30}] * num_carns,
+                                threshold)
+
+
+def test_herd_round_trip():
+    """Tests that animals keep their properties and order when stored in a herd."""
+    animals = [Herbivore(weight, age) for weight, age in ((10., 1), (20., 2), (0., 3))]
+    herd = hybrid.Herd.from_animals(Herbivore, animals)
+    assert herd.fitness.tolist() == pytest.approx([a.fitness for a in animals])
+    copies = herd.to_animals()
+    assert [(a.age, a.weight, a.fitness) for a in copies] == [
+        (a.age, a.weight, a.fitness) for a in animals]
+
+
+def test_mode_hysteresis():
+    """Tests that a cell switches to arrays at the threshold and back below half of it."""
+    cell = make_cell(12, threshold=10)
+    cell.feeding_herbs()
+    assert cell.array_mode
+    cell.herb_pop = cell.herb_pop[:6]
+    cell.feeding_herbs()
+    assert cell.array_mode
+    cell.herb_pop = cell.herb_pop[:4]
+    cell.feeding_herbs()
+    assert not cell.array_mode
+
+
+def test_feeding_herbs():
+    """Tests that only the herbivores finding enough fodder eat in array mode."""
+    cell = make_cell(100)
+    cell.herb_pop[0].weight = 30
+    cell.feeding_herbs()
+    weights = [herb.weight for herb in cell.herb_pop]
+    eaten = Herbivore.beta * Herbivore.F
+    assert weights[0] == 30 + eaten
+    eaters = int(hybrid.HybridLowland.f_max // Herbivore.F)
+    assert weights.count(20 + eaten) == eaters - 1
+    assert cell.events['unfed_herbs'] == 100 - eaters
+
+
+def test_feeding_carnivores():
+    """Tests that killed herbivores lose all weight and feed the carnivores."""
+    random.seed(1)
+    cell = make_cell(200, 20)
+    herbs_before = sum(herb.weight for herb in cell.herb_pop)
+    carns_before = sum(carn.weight for carn in cell.carn_pop)
+    cell._start_year()
+    cell.feeding_carnivores()
+    killed = [herb for herb in cell.herb_pop if herb.weight == 0]
+    assert cell.events['kills'] == len(killed) > 0
+    gained = sum(carn.weight for carn in cell.carn_pop) - carns_before
+    assert 0 < gained <= Carnivore.beta * (herbs_before - sum(h.weight for h in cell.herb_pop))
+
+
+def test_year_events_balance():
+    """Tests that births minus deaths equal the change of the population in array mode."""
+    random.seed(2)
+    cell = make_cell(300, 30, weight=40)
+    herbs, carns = cell.herb_count(), cell.carn_count()
+    cell.feeding_herbs()
+    cell.feeding_carnivores()
+    cell.mating()
+    emigrants = cell.emigrate((2, 2), {(2, 1), (2, 3)})
+    cell.aging_and_losing_weight()
+    cell.dying()
+    events = cell.take_events()
+    left = [sum(len(moves[index]) for moves in emigrants.values()) for index in (0, 1)]
+    assert events['herb_births'] > 0 and events['migrations'] == sum(left)
+    assert cell.herb_count() == herbs + events['herb_births'] - events['herb_deaths'] - left[0]
+    assert cell.carn_count() == carns + events['carn_births'] - events['carn_deaths'] - left[1]
+    assert set(emigrants) <= {(2, 1), (2, 3)}
+
+
+def run(threshold, read_animals=False, seed=None):
+    """Population state of a hybrid island after some years."""
+    random.seed(3)
+    isle = Island(geogr, ini_pop, fast=True, seed=seed, cell_dict=hybrid.cell_dict(threshold))
+    for _ in range(8):
+        isle.season()
+        if read_animals:
+            isle.get_herb_weight()
+    return [(loc, h.age, h.weight) for loc, cell in isle.isle_map.items() for h in cell.herb_pop]
+
+
+@pytest.mark.parametrize('seed', [None, 5])
+def test_reading_does_not_change_result(seed):
+    """Tests that converting cells to objects for reading does not change the trajectory."""
+    assert run(100, seed=seed) == run(100, read_animals=True, seed=seed)
+
+
+def test_object_mode_equals_plain():
+    """Tests that hybrid cells that never reach the threshold give the plain result."""
+    random.seed(3)
+    isle = Island(geogr, ini_pop, fast=True)
+    for _ in range(8):
+        isle.season()
+    plain = [(loc, h.age, h.weight) for loc, cell in isle.isle_map.items() for h in cell.herb_pop]
+    assert run(math.inf) == plain
+
+
+def test_checkpoint_and_fork(tmp_path):
+    """Tests that hybrid simulations keep their threshold and resume from checkpoints and forks
+    exactly."""
+    path = str(tmp_path / 'check.npz')
+    sim = BioSim(geogr, ini_pop, seed=4, vis_years=0, cell_threshold=5)
+    sim.simulate(5)
+    sim.save_checkpoint(path)
+    branch = sim.fork(vis_years=0)
+    resumed = BioSim.load_checkpoint(path, vis_years=0)
+    assert branch.cell_threshold == resumed.cell_threshold == 5
+    for other in (sim, branch, resumed):
+        other.simulate(5)
+    herbs = sim.isle.herb_distribution()
+    assert np.array_equal(branch.isle.herb_distribution(), herbs)
+    assert np.array_equal(resumed.isle.herb_distribution(), herbs)
+
+
+def test_autotune():
+    """Tests that the measured threshold is one of the sizes tried, and keeps the seed."""
+    random.seed(6)
+    expected = random.random()
+    random.seed(6)
+    assert hybrid.autotune((8, 64), repeats=1) in (8, 64)
+    assert random.random() == expected
+    sim = BioSim(geogr, ini_pop, seed=1, vis_years=0, cell_threshold='auto')
+    assert sim.cell_threshold == hybrid.autotune()
+    with pytest.raises(ValueError):
+        BioSim(geogr, ini_pop, seed=1, vis_years=0, cell_threshold=100, workers=2)
+
+
+def test_hybrid_equivalent():
+    """Tests that cells in array mode pass against the object engine."""
+    scenario = equivalence.shorten(equivalence.SCENARIOS['mono_hc'], 53)
+    reports = equivalence.run_harness(equivalence.run_hybrid, {'mono_hc': scenario},
+                                      num_seeds=200, workers=1)
+    assert reports['mono_hc'].passed, str(reports['mono_hc'])
@@ -223,3 +223,125 @@ def test_get_carn_fitness():
     fitness = isle.get_carn_fitness()
     ref_fitness = [Carnivore(c['weight'], c['age']).fitness for c in ini_carns[0]['pop']]
     assert fitness == ref_fitness
+
+
+big_geogr = textwrap.dedent("""\
+                            WWWWW
+                            WLLHW
+                            WDLLW
+                            WWWWW""")
+big_pop = [{'loc': (2, 2),
+            'pop': [{'species': 'Herbivore', 'age': 5, 'weight': 20} for _ in range(40)]
+            + [{'species': 'Carnivore', 'age': 5, 'weight': 20} for _ in range(8)]}]
+
+
+def cell_stream_run(visit_order=None, years=6, global_seed=1):
+    """Counts per cell and weights after simulating with per-cell streams."""
+    isle = Island(big_geogr, big_pop, seed=SEED)
+    if visit_order is not None:
+        isle.isle_map = {loc: isle.isle_map[loc] for loc in visit_order(list(isle.isle_map))}
+    random.seed(global_seed)
+    for _ in range(years):
+        isle.season()
+    return ({loc: (cell.herb_count(), cell.carn_count()) for loc, cell in isle.isle_map.items()},
+            sorted(isle.get_herb_weight()), sorted(isle.get_carn_weight()))
+
+
+def test_cell_streams_independent_of_order():
+    """Tests that per-cell streams give the same result whatever order cells are visited in."""
+    assert cell_stream_run() == cell_stream_run(visit_order=lambda locs: locs[::-1])
+
+
+def test_cell_streams_independent_of_global_stream():
+    """Tests that draws from the global stream do not change the result with per-cell streams."""
+    assert cell_stream_run(global_seed=1) == cell_stream_run(global_seed=2)
+
+
+def test_cell_streams_match_parallel():
+    """Tests that the serial engine with per-cell streams equals the parallel engine."""
+    from biosim.parallel import ParallelIsland
+    isle = ParallelIsland(big_geogr, big_pop, seed=SEED, workers=2)
+    for _ in range(6):
+        isle.season()
+    herbs, carns = isle.herb_distribution(), isle.carn_distribution()
+    isle.close()
+    counts, _, _ = cell_stream_run()
+    assert all(counts[loc] == (herbs[loc[0] - 1, loc[1] - 1], carns[loc[0] - 1, loc[1] - 1])
+               for loc in counts)
+
+
+@pytest.mark.parametrize('kwargs', [{}, {'fast': True}, {'seed': SEED}])
+def test_events_balance_population(kwargs):
+    """Tests that births minus deaths equal the change of the population in every year."""
+    random.seed(SEED)
+    isle = Island(big_geogr, big_pop, **kwargs)
+    for _ in range(5):
+        herbs, carns = isle.total_herb_count(), isle.total_carn_count()
+        isle.season()
+        events = isle.collect_events()
+        assert events['herb_births'] - events['herb_deaths'] == isle.total_herb_count() - herbs
+        assert events['carn_births'] - events['carn_deaths'] == isle.total_carn_count() - carns
+
+
+def test_events_fast_equal_legacy():
+    """Tests that the fast engine counts the same events as the cell-by-cell engine."""
+    counted = []
+    for fast in (False, True):
+        random.seed(SEED)
+        isle = Island(big_geogr, big_pop, fast=fast)
+        years = []
+        for _ in range(5):
+            isle.season()
+            years.append(isle.collect_events())
+        counted.append(years)
+    assert counted[0] == counted[1]
+    assert sum(events['rejected_migrations'] for events in counted[0]) > 0
+
+
+@pytest.mark.parametrize('sparse', [False, True])
+def test_cells_share_event_counters(sparse):
+    """Tests that all cells, also those created later, count into the counters of the island."""
+    isle = Island(big_geogr, big_pop, sparse=sparse)
+    isle.add_pop([{'loc': (3, 2), 'pop': big_pop[0]['pop'][:1]}])
+    counters = {id(cell.events) for cell in isle.isle_map.values()}
+    assert counters == {id(isle.isle_map[(2, 2)].events)}
+
+
+def test_sparse_cells():
+    """Tests that a sparse island only stores land cells that have been looked up."""
+    isle = Island(big_geogr, big_pop, sparse=True)
+    assert list(isle.isle_map) == [(2, 2)]
+    assert isle.isle_map[(1, 1)] is isle.isle_map[(4, 5)]
+    assert not isle.isle_map[(1, 1)].habitable
+    isle.add_pop([{'loc': (3, 2), 'pop': big_pop[0]['pop'][:1]}])
+    assert type(isle.isle_map[(2, 3)]).__name__ == 'Lowland'
+    assert list(isle.isle_map) == [(2, 2), (2, 3), (3, 2)]
+    with pytest.raises(KeyError):
+        isle.isle_map[(5, 1)]
+
+
+def island_state(isle):
+    """Populated cells with the weights of their animals, and the distributions."""
+    return ({loc: ([herb.weight for herb in cell.herb_pop], [carn.weight for carn in cell.carn_pop])
+             for loc, cell in isle.isle_map.items() if cell.herb_pop or cell.carn_pop},
+            isle.herb_distribution().tolist(), isle.carn_distribution().tolist())
+
+
+@pytest.mark.parametrize('kwargs', [{}, {'seed': SEED}])
+@pytest.mark.parametrize('timed', [False, True])
+def test_sparse_equals_dense(kwargs, timed):
+    """Tests that a sparse island gives the same animals and events as a dense island."""
+    from biosim.timing import PhaseTimer
+    results = []
+    for sparse in (False, True):
+        random.seed(SEED)
+        isle = Island(big_geogr, big_pop, sparse=sparse, **kwargs)
+        if timed:
+            isle.timer = PhaseTimer()
+        events = []
+        for _ in range(6):
+            isle.season()
+            events.append(isle.collect_events())
+        results.append((island_state(isle), events))
+    assert results[0] == results[1]
+    assert len(results[0][0][0]) > 1
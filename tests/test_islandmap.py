@@ -0,0 +1,79 @@
+import textwrap
+
+import numpy as np
+import pytest
+from biosim.island import Island
+from biosim.islandmap import IslandMap, LocationMask
+from biosim.simulation import BioSim
+
+geogr = textwrap.dedent("""\
+                        WWWWW
+                        WLHDW
+                        WWLWW
+                        WWWWW""")
+ini_pop = [{'loc': (2, 3),
+            'pop': [{'species': 'Herbivore', 'age': 5, 'weight': 20} for _ in range(4)]},
+           {'loc': (3, 3),
+            'pop': [{'species': 'Carnivore', 'age': 5, 'weight': 20} for _ in range(2)]}]
+
+
+def test_grids():
+    """Tests the type grid, the habitable mask and the letters of a compiled map."""
+    island_map = IslandMap(geogr)
+    assert island_map.shape == (4, 5)
+    assert island_map.types[1].tolist() == [0, 1, 2, 3, 0]
+    assert island_map.habitable.sum() == 4
+    assert '\n'.join(''.join(row) for row in island_map.letters) == geogr == str(island_map)
+    with pytest.raises(ValueError):
+        island_map.types[0, 0] = 1
+
+
+def test_locations():
+    """Tests that locations are counted from 1 in map order, filtered by landscape."""
+    island_map = IslandMap(geogr)
+    assert island_map.locations() == [(2, 2), (2, 3), (2, 4), (3, 3)]
+    assert island_map.locations('L') == [(2, 2), (3, 3)]
+
+
+@pytest.mark.parametrize('island_map', ['WWW\nWLWW\nWWW', 'WWW\nWXW\nWWW', 'WWW\nWLL\nWWW',
+                                        'WWW\nWÆW\nWWW', ''])
+def test_invalid_maps(island_map):
+    """Tests that uneven rows, invalid letters and land on the edge raise ValueError."""
+    with pytest.raises(ValueError):
+        IslandMap(island_map)
+
+
+def test_compile_once():
+    """Tests that compiling a compiled map returns the same instance."""
+    island_map = IslandMap(geogr)
+    assert IslandMap.compile(island_map) is island_map
+    assert IslandMap.compile(geogr).text == geogr
+
+
+def test_shared_map():
+    """Tests that the island and graphics of a simulation share its compiled map."""
+    island_map = IslandMap(geogr)
+    sim = BioSim(island_map, ini_pop, seed=1, vis_years=0)
+    assert sim._island_map is island_map
+    assert sim.isle.island_map is island_map
+    assert sim._graphics._geogr is island_map
+
+
+def test_distributions():
+    """Tests that the distributions only depend on the locations of the cells."""
+    isle = Island(IslandMap(geogr), ini_pop)
+    herbs, carns = np.zeros((4, 5), dtype=int), np.zeros((4, 5), dtype=int)
+    herbs[1, 2], carns[2, 2] = 4, 2
+    isle.isle_map = dict(reversed(list(isle.isle_map.items())))
+    assert np.array_equal(isle.herb_distribution(), herbs)
+    assert np.array_equal(isle.carn_distribution(), carns)
+
+
+def test_location_mask():
+    """Tests that a location mask holds the marked locations, counted from 1."""
+    island_map = IslandMap(geogr)
+    mask = LocationMask(island_map.habitable)
+    assert len(mask) == 4
+    assert all(loc in mask for loc in island_map.locations())
+    assert (1, 1) not in mask and (2, 5) not in mask and (9, 9) not in mask
+    assert (3, 3) in island_map and (0, 3) not in island_map
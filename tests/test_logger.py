@@ -0,0 +1,103 @@
+import textwrap
+
+import pytest
+from biosim.logger import LogWriter, read_log
+from biosim.cell import EVENTS
+from biosim.island import Island
+from biosim.simulation import BioSim
+
+geogr = """\
+           WWWW
+           WLHW
+           WWWW"""
+geogr = textwrap.dedent(geogr)
+ini_pop = [{'loc': (2, 2),
+            'pop': [{'species': 'Herbivore', 'age': 5, 'weight': 20} for _ in range(10)]},
+           {'loc': (2, 3),
+            'pop': [{'species': 'Carnivore', 'age': 5, 'weight': 20} for _ in range(3)]}]
+
+
+def test_rows_buffered(tmp_path):
+    """Tests that nothing is written to file before the buffer is full."""
+    log_file = tmp_path / 'log.csv'
+    logger = LogWriter(str(log_file), flush_years=3)
+    isle = Island(geogr, ini_pop)
+    logger.write(1, isle)
+    logger.write(2, isle)
+    assert not log_file.exists()
+    logger.write(3, isle)
+    assert read_log(str(log_file)) == {'year': [1, 2, 3], 'Herbivore': [10, 10, 10],
+                                       'Carnivore': [3, 3, 3]}
+
+
+def test_cell_log(tmp_path):
+    """Tests that per-cell counts are written for populated cells only."""
+    log_file = tmp_path / 'log.csv'
+    logger = LogWriter(str(log_file), cells=True)
+    logger.write(1, Island(geogr, ini_pop))
+    logger.flush()
+    cells = read_log(str(tmp_path / 'log_cells.csv'))
+    assert cells == {'year': [1, 1], 'row': [2, 2], 'col': [2, 3], 'Herbivore': [10, 0],
+                     'Carnivore': [0, 3]}
+
+
+def test_event_log(tmp_path):
+    """Tests that events are written as extra columns of the main log."""
+    log_file = tmp_path / 'log.csv'
+    logger = LogWriter(str(log_file), events=True)
+    isle = Island(geogr, ini_pop)
+    isle.season()
+    events = isle.collect_events()
+    logger.write(1, isle, events)
+    logger.flush()
+    log = read_log(str(log_file))
+    assert list(log) == ['year', 'Herbivore', 'Carnivore'] + list(EVENTS)
+    assert all(log[name] == [count] for name, count in events.items())
+
+
+def test_append_checks_header(tmp_path):
+    """Tests that rows are appended to a log with the same header and not to another log."""
+    log_file = tmp_path / 'log.csv'
+    isle = Island(geogr, ini_pop)
+    for year in (1, 2):
+        logger = LogWriter(str(log_file))
+        logger.write(year, isle)
+        logger.flush()
+    assert read_log(str(log_file))['year'] == [1, 2]
+    logger = LogWriter(str(log_file), events=True)
+    logger.write(3, isle, isle.collect_events())
+    with pytest.raises(ValueError):
+        logger.flush()
+    assert read_log(str(log_file))['year'] == [1, 2]
+
+
+def test_invalid_flush_years(tmp_path):
+    """Tests that a non-positive flush interval raises ValueError."""
+    with pytest.raises(ValueError):
+        LogWriter(str(tmp_path / 'log.csv'), flush_years=0)
+
+
+def test_simulate_log_headless(tmp_path):
+    """Tests that BioSim logs every year without graphics, also across simulate calls."""
+    log_file = tmp_path / 'log.csv'
+    sim = BioSim(geogr, ini_pop, seed=1, vis_years=0, log_file=str(log_file))
+    sim.simulate(4)
+    sim.simulate(3)
+    log = read_log(str(log_file))
+    assert log['year'] == list(range(1, 8))
+    assert log['Herbivore'][-1] == sim.num_animals_per_species['Herbivore']
+
+
+def test_simulate_events(tmp_path):
+    """Tests that BioSim records the events of every year and writes them to the log."""
+    log_file = tmp_path / 'log.csv'
+    sim = BioSim(geogr, ini_pop, seed=1, vis_years=0, log_file=str(log_file), log_events=True)
+    sim.simulate(4)
+    sim.simulate(3)
+    events = sim.events
+    log = read_log(str(log_file))
+    assert events['year'].tolist() == log['year'] == list(range(1, 8))
+    assert all(events[name].tolist() == log[name] for name in EVENTS)
+    herbs = [10] + log['Herbivore']
+    assert (events['herb_births'] - events['herb_deaths']).tolist() == [
+        after - before for before, after in zip(herbs, herbs[1:])]
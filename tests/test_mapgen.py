@@ -0,0 +1,47 @@
+import numpy as np
+import pytest
+from biosim.island import Island
+from biosim.mapgen import generate_map, generate_population, generate_columns, land_locations
+
+
+def test_valid_island():
+    """Tests that a generated map with population is accepted by Island."""
+    island_map = generate_map(20, 30, seed=1)
+    isle = Island(island_map, generate_population(island_map, herbivores=3, carnivores=1))
+    assert isle.map_dims == (20, 30)
+    assert isle.total_herb_count() == 3 * len(land_locations(island_map))
+    assert isle.total_carn_count() == len(land_locations(island_map))
+
+
+def test_reproducible():
+    """Tests that the same seed gives the same map and different seeds different maps."""
+    assert generate_map(15, 15, seed=2) == generate_map(15, 15, seed=2)
+    assert generate_map(15, 15, seed=2) != generate_map(15, 15, seed=3)
+
+
+def test_fractions():
+    """Tests that the interior has the requested fraction of each landscape type."""
+    island_map = generate_map(42, 52, fractions={'L': 0.5, 'H': 0.25, 'D': 0.15, 'W': 0.1},
+                              seed=4)
+    interior = ''.join(line[1:-1] for line in island_map.splitlines()[1:-1])
+    assert len(interior) == 2000
+    assert [interior.count(letter) for letter in 'LHDW'] == [1000, 500, 300, 200]
+
+
+@pytest.mark.parametrize('rows, cols, fractions', [(2, 10, None), (10, 10, {'X': 1}),
+                                                   (10, 10, {'L': -1}), (10, 10, {'L': 0})])
+def test_invalid(rows, cols, fractions):
+    """Tests that invalid sizes and fractions are rejected."""
+    with pytest.raises((ValueError, KeyError)):
+        generate_map(rows, cols, fractions=fractions)
+
+
+def test_columns_match_population():
+    """Tests that the column-wise population holds the same animals as the dictionaries."""
+    island_map = generate_map(8, 9, seed=5)
+    columns = generate_columns(island_map, herbivores=2, carnivores=1, age=3, weight=12.5)
+    locs = land_locations(island_map)
+    herbs = columns['Herbivore']
+    assert len(herbs['row']) == 2 * len(locs)
+    assert list(zip(herbs['row'][::2].tolist(), herbs['col'][::2].tolist())) == locs
+    assert np.all(herbs['age'] == 3) and np.all(columns['Carnivore']['weight'] == 12.5)
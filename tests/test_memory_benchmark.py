@@ -0,0 +1,82 @@
+import json
+import tracemalloc
+
+import pytest
+from biosim import memory_benchmark
+
+
+@pytest.fixture(scope='module')
+def result():
+    return memory_benchmark.measure('herbivores', years=2)
+
+
+def test_measure(result):
+    """Tests that a scenario reports plausible totals and figures for every module."""
+    assert result['animals'] > 0
+    assert result['peak_bytes'] > result['transient_bytes_per_year'] > 0
+    assert set(result['modules']) == set(memory_benchmark.MODULES) | {'other'}
+    animals = result['modules']['animal.py']
+    assert animals['bytes_per_animal'] > 0
+    assert animals['peak_bytes'] >= animals['bytes_per_animal'] * result['animals']
+    assert not tracemalloc.is_tracing()
+
+
+def test_module_usage():
+    """Tests that blocks allocated by a module of the package are assigned to it."""
+    from biosim.cell import Lowland
+    tracemalloc.start(10)
+    try:
+        cell = Lowland([{'species': 'Herbivore', 'age': 5, 'weight': 20}] * 100)
+        usage = memory_benchmark.module_usage(tracemalloc.take_snapshot())
+    finally:
+        tracemalloc.stop()
+    assert len(cell.herb_pop) == 100
+    assert usage['cell.py'][1] + usage['animal.py'][1] >= 100
+
+
+def test_compare(result):
+    """Tests that larger metrics are regressions, and that block counts have some slack."""
+    baseline = {'cases': [result]}
+    assert memory_benchmark.compare({'cases': [result]}, baseline) == []
+
+    grown = json.loads(json.dumps(result))
+    grown['peak_bytes'] *= 1.5
+    grown['modules']['other']['net_blocks_per_year'] = (
+        abs(result['modules']['other']['net_blocks_per_year']) + 1) * 1.5
+    regressions = memory_benchmark.compare({'cases': [grown]}, baseline, threshold=0.2)
+    assert [r['metric'] for r in regressions] == ['peak_bytes']
+
+
+def test_main_baseline(tmp_path, capsys):
+    """Tests that the command line writes JSON and flags more memory than the baseline."""
+    output = tmp_path / 'memory.json'
+    args = ['--scenarios', 'herbivores', '--years', '1']
+    assert memory_benchmark.main(args + ['--output', str(output), '--no-baseline']) == 0
+    results = json.loads(output.read_text())
+    assert [case['name'] for case in results['cases']] == ['herbivores']
+
+    results['cases'][0]['bytes_per_animal'] = 1
+    output.write_text(json.dumps(results))
+    assert memory_benchmark.main(args + ['--baseline', str(output)]) == 1
+    assert 'REGRESSION herbivores bytes_per_animal' in capsys.readouterr().out
+
+
+def test_stored_baseline():
+    """Tests that the stored baseline covers every scenario of the quick preset."""
+    with open(memory_benchmark.baseline_path('quick')) as baseline_file:
+        baseline = json.load(baseline_file)
+    assert ([case['name'] for case in baseline['cases']]
+            == memory_benchmark.PRESETS['quick']['scenarios'])
+    assert all('net_blocks_per_year' in values
+               for case in baseline['cases'] for values in case['modules'].values())
+
+
+def test_figure_closed():
+    """Tests that the figure of a simulation with graphics is reachable and closed."""
+    import matplotlib.pyplot as plt
+    sim = memory_benchmark._make_sim(memory_benchmark.SCENARIOS['graphics'], 1)
+    assert sim.figure is None
+    sim.simulate(1)
+    assert plt.fignum_exists(sim.figure.number)
+    memory_benchmark._close(sim)
+    assert not plt.fignum_exists(sim.figure.number)
@@ -0,0 +1,139 @@
+import textwrap
+
+import numpy as np
+import pytest
+from biosim.parallel import ParallelIsland, partition
+from biosim.simulation import BioSim
+
+geogr = """\
+           WWWWWW
+           WLLHLW
+           WLDLLW
+           WHLLLW
+           WWWWWW"""
+geogr = textwrap.dedent(geogr)
+ini_pop = [{'loc': (3, 3),
+            'pop': [{'species': 'Herbivore', 'age': 5, 'weight': 20} for _ in range(60)]
+            + [{'species': 'Carnivore', 'age': 5, 'weight': 20} for _ in range(10)]}]
+
+
+def run(workers, years=8):
+    """
+    Returns counts per cell, all weights and the events of every year after simulating with
+    given number of workers.
+    """
+    isle = ParallelIsland(geogr, ini_pop, seed=11, workers=workers)
+    events = []
+    for _ in range(years):
+        isle.season()
+        events.append(isle.collect_events())
+    result = (isle.herb_distribution().tolist(), isle.carn_distribution().tolist(),
+              isle.get_herb_weight(), isle.get_carn_weight(), events)
+    isle.close()
+    return result
+
+
+def test_partition():
+    """Tests that tiles cover all locations in order with balanced sizes."""
+    locs = [(1, k) for k in range(10)]
+    tiles = partition(locs, 3)
+    assert sum(tiles, []) == locs
+    assert [len(tile) for tile in tiles] == [3, 4, 3]
+
+
+def test_partition_weights():
+    """Tests that heavy locations get tiles of their own."""
+    locs = [(1, k) for k in range(10)]
+    tiles = partition(locs, 3, weights=[1, 1, 1, 50, 1, 1, 1, 1, 1, 1])
+    assert sum(tiles, []) == locs
+    assert (1, 3) in tiles[1]
+    assert len(tiles[1]) < 4
+
+
+def test_partition_shares():
+    """Tests that a faster worker gets a larger tile."""
+    locs = [(1, k) for k in range(12)]
+    tiles = partition(locs, 2, shares=[2, 1])
+    assert [len(tile) for tile in tiles] == [8, 4]
+
+
+def test_tiles_sized_by_animals():
+    """Tests that the tile holding the crowded cell has fewer cells than the others."""
+    isle = ParallelIsland(geogr, ini_pop, seed=11, workers=3)
+    crowded = isle._owner[(3, 3)]
+    assert all(len(isle._tiles[crowded]) <= len(tile) for tile in isle._tiles)
+    isle.close()
+
+
+def test_rebalance():
+    """Tests that a faster worker gets more cells and that cells keep their animals."""
+    isle = ParallelIsland(geogr, ini_pop, seed=11, workers=3, rebalance_years=None)
+    for _ in range(3):
+        isle.season()
+    before = isle.herb_distribution()
+    weights = isle.get_herb_weight()
+    size = len(isle._tiles[2])
+    isle._speeds = np.array([1, 1, 10.])
+    assert isle.rebalance() > 0
+    assert len(isle._tiles[2]) > size
+    assert (isle.herb_distribution() == before).all()
+    assert sorted(isle.get_herb_weight()) == sorted(weights)
+    assert isle.rebalance() == 0
+    isle.close()
+
+
+def test_rebalance_deterministic():
+    """Tests that resizing the tiles every year does not change the result."""
+    isle = ParallelIsland(geogr, ini_pop, seed=11, workers=3, rebalance_years=None)
+    for _ in range(8):
+        isle.season()
+    static = (isle.herb_distribution().tolist(), isle.get_herb_weight())
+    isle.close()
+    isle = ParallelIsland(geogr, ini_pop, seed=11, workers=3, rebalance_years=1)
+    for _ in range(8):
+        isle.season()
+        isle._speeds = np.random.default_rng(isle.year).uniform(0.5, 2, isle.workers)
+        isle.rebalance()
+    assert (isle.herb_distribution().tolist(), isle.get_herb_weight()) == static
+    isle.close()
+
+
+def test_independent_of_workers():
+    """Tests that the result is the same for any number of workers."""
+    assert run(1) == run(3)
+
+
+def test_add_pop():
+    """Tests that added animals end up in the right cells, and Water cells are ignored."""
+    isle = ParallelIsland(geogr, seed=1, workers=2)
+    isle.add_pop([{'loc': (4, 5), 'pop': [{'species': 'Carnivore', 'age': 1, 'weight': 9}]},
+                  {'loc': (1, 1), 'pop': [{'species': 'Carnivore', 'age': 1, 'weight': 9}]}])
+    assert isle.total_carn_count() == 1
+    assert isle.to_island().isle_map[(4, 5)].carn_count() == 1
+    with pytest.raises(KeyError):
+        isle.add_pop([{'loc': (9, 9), 'pop': []}])
+    isle.close()
+
+
+def test_biosim_checkpoint(tmp_path):
+    """Tests that a parallel BioSim resumes exactly from a checkpoint."""
+    path = str(tmp_path / 'par.npz')
+    sim = BioSim(geogr, ini_pop, seed=12, vis_years=0, workers=2)
+    sim.simulate(4)
+    sim.save_checkpoint(path)
+    sim.simulate(4)
+    resumed = BioSim.load_checkpoint(path, vis_years=0, workers=3)
+    resumed.simulate(4)
+    assert resumed.isle.herb_distribution().tolist() == sim.isle.herb_distribution().tolist()
+    assert resumed.isle.get_carn_weight() == sim.isle.get_carn_weight()
+
+
+def test_values_grow(mocker):
+    """Tests that shared value blocks grow when a tile holds more animals than they fit."""
+    mocker.patch('biosim.parallel._VALUES_CAPACITY', 4)
+    isle = ParallelIsland(geogr, ini_pop, seed=2, workers=2)
+    weights = isle.get_herb_weight()
+    ages = isle.get_carn_age()
+    isle.close()
+    assert weights == [20.0] * 60
+    assert ages == [5] * 10
@@ -0,0 +1,106 @@
+import textwrap
+
+import numpy as np
+import pytest
+from biosim import population
+from biosim.island import Island
+from biosim.parallel import ParallelIsland
+from biosim.simulation import BioSim
+
+geogr = textwrap.dedent("""\
+                        WWWWW
+                        WLHDW
+                        WWWWW""")
+columns = {'Herbivore': {'row': np.array([2, 2, 2, 2]), 'col': np.array([3, 2, 3, 4]),
+                         'age': np.array([1, 2, 3, 4]), 'weight': np.array([10., 20., 30., 40.])},
+           'Carnivore': {'row': np.array([2]), 'col': np.array([2]), 'age': np.array([7]),
+                         'weight': np.array([25.])}}
+records = [{'loc': (2, 3), 'pop': [{'species': 'Herbivore', 'age': 1, 'weight': 10.},
+                                   {'species': 'Herbivore', 'age': 3, 'weight': 30.}]},
+           {'loc': (2, 2), 'pop': [{'species': 'Herbivore', 'age': 2, 'weight': 20.},
+                                   {'species': 'Carnivore', 'age': 7, 'weight': 25.}]},
+           {'loc': (2, 4), 'pop': [{'species': 'Herbivore', 'age': 4, 'weight': 40.}]}]
+
+
+def animals(isle):
+    """Age and weight of all animals in each cell, in population order."""
+    return {loc: ([(herb.age, herb.weight) for herb in cell.herb_pop],
+                  [(carn.age, carn.weight) for carn in cell.carn_pop])
+            for loc, cell in isle.isle_map.items()}
+
+
+def test_island_from_columns():
+    """Tests that a columnar population gives the same island as population dictionaries."""
+    assert animals(Island(geogr, columns)) == animals(Island(geogr, records))
+
+
+def test_add_columns():
+    """Tests that columns are added to the animals already on the island."""
+    isle = Island(geogr, records)
+    isle.add_pop(columns)
+    assert isle.total_herb_count() == 8
+    assert isle.total_carn_count() == 2
+
+
+@pytest.mark.parametrize('suffix', ['.csv', '.npz'])
+def test_file_round_trip(tmp_path, suffix):
+    """Tests that a population written to file is read back unchanged."""
+    path = tmp_path / f'population{suffix}'
+    population.write_columns(path, columns)
+    assert animals(Island(geogr, str(path))) == animals(Island(geogr, columns))
+
+
+def test_empty_csv(tmp_path):
+    """Tests that a CSV file with a header only is an empty population."""
+    path = tmp_path / 'empty.csv'
+    path.write_text('species,row,col,age,weight\n')
+    assert Island(geogr, str(path)).total_herb_count() == 0
+
+
+def test_water_left_out():
+    """Tests that animals in water cells are left out."""
+    water = {'Herbivore': {'row': [1, 2], 'col': [1, 2], 'age': [1, 1], 'weight': [5, 5]}}
+    assert Island(geogr, water).total_herb_count() == 1
+
+
+def test_outside_map():
+    """Tests that locations outside the map raise KeyError before any animal is added."""
+    outside = {'Herbivore': {'row': [2, 9], 'col': [2, 2], 'age': [1, 1], 'weight': [5, 5]}}
+    isle = Island(geogr)
+    with pytest.raises(KeyError):
+        isle.add_pop(outside)
+    assert isle.total_herb_count() == 0
+
+
+@pytest.mark.parametrize('species, fields, error', [
+    ('Rabbit', {}, KeyError),
+    ('Herbivore', {'row': [2], 'col': [2], 'age': [1]}, KeyError),
+    ('Herbivore', {'row': [2, 2], 'col': [2], 'age': [1], 'weight': [5]}, ValueError),
+    ('Herbivore', {'row': [2], 'col': [2], 'age': [-1], 'weight': [5]}, ValueError),
+    ('Herbivore', {'row': [2], 'col': [2], 'age': [1.5], 'weight': [5]}, ValueError),
+    ('Herbivore', {'row': [2], 'col': [2], 'age': [1], 'weight': [-5]}, ValueError),
+    ('Herbivore', {'row': [2], 'col': [2], 'age': [1], 'weight': [np.nan]}, ValueError),
+])
+def test_invalid_columns(species, fields, error):
+    """Tests that invalid species, missing fields and invalid values are rejected."""
+    with pytest.raises(error):
+        population.validate_columns({species: fields})
+
+
+def test_parallel_add_columns():
+    """Tests that columns are sent to the workers owning the cells."""
+    isle = ParallelIsland(geogr, seed=1, workers=2)
+    isle.add_pop(columns)
+    herbs, carns = isle.herb_distribution(), isle.carn_distribution()
+    isle.close()
+    reference = Island(geogr, columns)
+    assert herbs.tolist() == reference.herb_distribution().tolist()
+    assert carns.tolist() == reference.carn_distribution().tolist()
+
+
+def test_biosim_from_file(tmp_path):
+    """Tests that BioSim accepts the path of a population file."""
+    path = tmp_path / 'population.npz'
+    population.write_columns(path, columns)
+    sim = BioSim(geogr, str(path), seed=1, vis_years=0)
+    assert sim.num_animals_per_species == {'Herbivore': 4, 'Carnivore': 1}
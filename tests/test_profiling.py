@@ -0,0 +1,72 @@
+import cProfile
+import pstats
+
+import pytest
+from biosim import profiling
+from biosim.simulation import BioSim
+
+geogr = "WWWW\nWLHW\nWWWW"
+ini_pop = [{'loc': (2, 2),
+            'pop': [{'species': 'Herbivore', 'age': 5, 'weight': 20} for _ in range(30)]}]
+
+
+def inner():
+    return sum(range(20000))
+
+
+def outer():
+    return inner() + inner()
+
+
+def other():
+    return inner()
+
+
+def test_output_paths():
+    """Tests that files are named after the profile path with or without suffix."""
+    assert profiling.output_paths('run') == ('run.pstats', 'run.collapsed')
+    assert profiling.output_paths('run.pstats') == ('run.pstats', 'run.collapsed')
+
+
+def test_collapsed_stacks_split_callers():
+    """Tests that time of a function is split between its callers."""
+    profiler = cProfile.Profile()
+    profiler.enable()
+    outer()
+    other()
+    profiler.disable()
+    stacks = profiling.collapsed_stacks(pstats.Stats(profiler))
+    assert any(s.endswith('test_profiling.py:outer;test_profiling.py:inner') for s in stacks)
+    assert any(s.endswith('test_profiling.py:other;test_profiling.py:inner') for s in stacks)
+    inner_total = sum(stacks[s] for s in stacks if 'inner' in s.split(';')[-1])
+    assert inner_total == pytest.approx(sum(entry[2] for func, entry
+                                            in pstats.Stats(profiler).stats.items()
+                                            if func[2] == 'inner'))
+
+
+def test_simulate_profile(tmp_path):
+    """Tests that simulate writes statistics and collapsed stacks covering all calls."""
+    path = str(tmp_path / 'sim')
+    sim = BioSim(geogr, ini_pop, seed=1, vis_years=0)
+    sim.simulate(2, profile=path)
+    sim.simulate(2, profile=path)
+    stats = pstats.Stats(path + '.pstats')
+    assert any(func[2] == '_update_fitness' for func in stats.stats)
+    seasons = [entry[1] for func, entry in stats.stats.items()
+               if func[2] == 'season' and func[0].endswith('island.py')]
+    assert seasons == [4]
+    with open(path + '.collapsed') as collapsed:
+        lines = collapsed.read().splitlines()
+    assert lines
+    for line in lines:
+        stack, microseconds = line.rsplit(' ', 1)
+        assert int(microseconds) > 0
+        assert stack.split(';')[0] == 'simulation.py:_simulate'
+
+
+def test_environment_variable(tmp_path, monkeypatch):
+    """Tests that BIOSIM_PROFILE switches profiling on."""
+    path = str(tmp_path / 'env')
+    monkeypatch.setenv(profiling.ENVIRONMENT_VARIABLE, path)
+    BioSim(geogr, ini_pop, seed=1, vis_years=0).simulate(1)
+    assert (tmp_path / 'env.pstats').exists() and (tmp_path / 'env.collapsed').exists()
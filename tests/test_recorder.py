@@ -0,0 +1,64 @@
+import textwrap
+
+import numpy as np
+import pytest
+from biosim.recorder import CellRecorder, load_cell_record
+from biosim.island import Island
+from biosim.simulation import BioSim
+
+geogr = """\
+           WWWW
+           WLHW
+           WWWW"""
+geogr = textwrap.dedent(geogr)
+ini_pop = [{'loc': (2, 2),
+            'pop': [{'species': 'Herbivore', 'age': 5, 'weight': 20} for _ in range(10)]},
+           {'loc': (2, 3),
+            'pop': [{'species': 'Carnivore', 'age': 5, 'weight': 20} for _ in range(3)]}]
+
+
+def test_record_layout(tmp_path):
+    """Tests that counts are stored in the row/column layout of the map."""
+    path = str(tmp_path / 'cells.dat')
+    isle = Island(geogr, ini_pop)
+    recorder = CellRecorder(path, isle.map_dims)
+    recorder.record(isle)
+    recorder.close()
+    counts, first_year = load_cell_record(path)
+    assert counts.shape == (1, 3, 4, 2)
+    assert first_year == 1
+    assert counts[0, 1, 1, 0] == 10
+    assert counts[0, 1, 2, 1] == 3
+    assert counts.sum() == 13
+
+
+def test_record_grows(tmp_path):
+    """Tests that the file grows in chunks and readers only see synced years."""
+    path = str(tmp_path / 'cells.dat')
+    isle = Island(geogr, ini_pop)
+    recorder = CellRecorder(path, isle.map_dims, chunk_years=2, sync_years=3)
+    for _ in range(5):
+        recorder.record(isle)
+    assert load_cell_record(path)[0].shape[0] == 3
+    recorder.close()
+    counts, _ = load_cell_record(path)
+    assert counts.shape[0] == 5
+    assert np.all(counts[:, 1, 1, 0] == 10)
+
+
+def test_invalid_chunk(tmp_path):
+    """Tests that a non-positive chunk size raises ValueError."""
+    with pytest.raises(ValueError):
+        CellRecorder(str(tmp_path / 'cells.dat'), (3, 4), chunk_years=0)
+
+
+def test_simulate_record(tmp_path):
+    """Tests that BioSim records one frame per year matching the island totals."""
+    path = str(tmp_path / 'cells.dat')
+    sim = BioSim(geogr, ini_pop, seed=1, vis_years=0, cell_record=path)
+    sim.simulate(3)
+    sim.simulate(2)
+    counts, first_year = load_cell_record(path)
+    assert counts.shape[0] == 5
+    assert first_year == 1
+    assert counts[-1, :, :, 0].sum() == sim.num_animals_per_species['Herbivore']
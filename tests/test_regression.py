@@ -0,0 +1,73 @@
+"""
+Regression test against recorded output of ``reference_examples/check_sim.py``.
+
+The reference file holds the number of animals and their total weight per species after every
+year of the check_sim scenario without graphics. It was recorded with the original cell-by-cell
+engine, so any change to the order in which random numbers are drawn shows up here.
+"""
+
+import os
+import textwrap
+
+import pytest
+from biosim.simulation import BioSim
+from biosim import state
+
+REFERENCE = os.path.join(os.path.dirname(__file__), 'data', 'check_sim_reference.csv')
+
+geogr = """\
+           WWWWWWWWWWWWWWWWWWWWW
+           WWWWWWWWHWWWWLLLLLLLW
+           WHHHHHLLLLWWLLLLLLLWW
+           WHHHHHHHHHWWLLLLLLWWW
+           WHHHHHLLLLLLLLLLLLWWW
+           WHHHHHLLLDDLLLHLLLWWW
+           WHHLLLLLDDDLLLHHHHWWW
+           WWHHHHLLLDDLLLHWWWWWW
+           WHHHLLLLLDDLLLLLLLWWW
+           WHHHHLLLLDDLLLLWWWWWW
+           WWHHHHLLLLLLLLWWWWWWW
+           WWWHHHHLLLLLLLWWWWWWW
+           WWWWWWWWWWWWWWWWWWWWW"""
+geogr = textwrap.dedent(geogr)
+
+ini_herbs = [{'loc': (10, 10),
+              'pop': [{'species': 'Herbivore', 'age': 5, 'weight': 20} for _ in range(150)]}]
+ini_carns = [{'loc': (10, 10),
+              'pop': [{'species': 'Carnivore', 'age': 5, 'weight': 20} for _ in range(40)]}]
+
+
+def read_reference():
+    """Returns (herbivores, carnivores, herbivore weight, carnivore weight) for every year."""
+    with open(REFERENCE) as reference:
+        reference.readline()
+        return [(int(herbs), int(carns), float(herb_weight), float(carn_weight))
+                for _, herbs, carns, herb_weight, carn_weight
+                in (line.strip().split(',') for line in reference)]
+
+
+def run_check_sim(years, **kwargs):
+    """Runs the check_sim scenario and returns the same columns as the reference."""
+    state.set_params(state.default_params())
+    sim = BioSim(island_map=geogr, ini_pop=ini_herbs, seed=123456, vis_years=0, **kwargs)
+    sim.set_animal_parameters('Herbivore', {'zeta': 3.2, 'xi': 1.8})
+    sim.set_animal_parameters('Carnivore', {'a_half': 70, 'phi_age': 0.5,
+                                            'omega': 0.3, 'F': 65,
+                                            'DeltaPhiMax': 9.})
+    sim.set_landscape_parameters('L', {'f_max': 700})
+
+    rows = []
+    for year in range(years):
+        if year == 100:
+            sim.add_population(population=ini_carns)
+        sim.simulate(num_years=1)
+        rows.append((sim.isle.total_herb_count(), sim.isle.total_carn_count(),
+                     sum(sim.isle.get_herb_weight()), sum(sim.isle.get_carn_weight())))
+    state.set_params(state.default_params())
+    return rows
+
+
+@pytest.mark.parametrize('fast, years', [(False, 110), (True, 200)])
+def test_check_sim_reproduced(fast, years):
+    """Tests that the engine reproduces the recorded trajectory exactly."""
+    assert run_check_sim(years, fast=fast) == read_reference()[:years]
@@ -0,0 +1,20 @@
+import numpy as np
+from biosim.shared import SharedArray
+
+
+def test_attach_sees_writes():
+    """Tests that an attached array shares memory with the original array."""
+    block = SharedArray((3, 4), 'int64')
+    other = SharedArray.attach(block.spec)
+    other.array[1, 2] = 7
+    assert block.array[1, 2] == 7
+    assert not other.owner
+    other.close()
+    block.unlink()
+
+
+def test_created_zero():
+    """Tests that a new shared array is filled with zeros."""
+    block = SharedArray((5,), 'float64')
+    assert np.all(block.array == 0)
+    block.unlink()
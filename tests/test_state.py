@@ -0,0 +1,166 @@
+import random
+import textwrap
+
+import pytest
+from biosim import state
+from biosim.animal import Carnivore
+from biosim.island import Island, SparseCells
+from biosim.simulation import BioSim
+
+geogr = """\
+           WWWWW
+           WLHLW
+           WDLLW
+           WWWWW"""
+geogr = textwrap.dedent(geogr)
+ini_pop = [{'loc': (2, 2),
+            'pop': [{'species': 'Herbivore', 'age': 5, 'weight': 20} for _ in range(50)]},
+           {'loc': (3, 3),
+            'pop': [{'species': 'Carnivore', 'age': 5, 'weight': 20} for _ in range(10)]}]
+
+
+def population_state(isle):
+    """Returns (loc, age, weight) of every animal in island order."""
+    return [(loc, a.age, a.weight) for loc, cell in isle.isle_map.items()
+            for a in cell.herb_pop + cell.carn_pop]
+
+
+def test_island_round_trip():
+    """Tests that converting an island to columns and back preserves every animal."""
+    random.seed(1)
+    isle = Island(geogr, ini_pop)
+    for _ in range(5):
+        isle.season()
+    copy = Island(geogr)
+    state.island_from_arrays(copy, state.island_to_arrays(isle))
+    assert population_state(copy) == population_state(isle)
+    assert copy.get_carn_fitness() == isle.get_carn_fitness()
+
+
+def test_rng_round_trip():
+    """Tests that the random module state survives conversion to arrays."""
+    random.seed(2)
+    random.gauss(0, 1)
+    saved = random.getstate()
+    restored = state.rng_from_arrays(*state.rng_to_arrays(saved))
+    assert restored == saved
+
+
+def test_resume_exact(tmp_path):
+    """Tests that resuming from a checkpoint reproduces the uninterrupted trajectory."""
+    path = str(tmp_path / 'check.npz')
+    sim = BioSim(geogr, ini_pop, seed=3, vis_years=0)
+    sim.simulate(10)
+    sim.save_checkpoint(path)
+    sim.simulate(10)
+
+    resumed = BioSim.load_checkpoint(path, vis_years=0)
+    assert resumed.year == 10
+    resumed.simulate(10)
+    assert population_state(resumed.isle) == population_state(sim.isle)
+
+
+def test_load_keeps_class_params(tmp_path):
+    """Tests that loading a checkpoint leaves the class parameters unchanged until simulating."""
+    path = str(tmp_path / 'check.npz')
+    sim = BioSim(geogr, ini_pop, seed=3, vis_years=0)
+    sim.set_animal_parameters('Carnivore', {'F': 1.0})
+    sim.save_checkpoint(path)
+    state.set_params(state.default_params())
+    before = state.get_params()
+    resumed = BioSim.load_checkpoint(path, vis_years=0)
+    assert state.get_params() == before
+    with state.preserved_params():
+        resumed.simulate(1)
+        assert state.get_params()['Carnivore']['F'] == 1.0
+
+
+def test_cell_streams_carried_over(tmp_path):
+    """Tests that forks and resumed simulations keep per-cell streams without arguments."""
+    path = str(tmp_path / 'check.npz')
+    sim = BioSim(geogr, ini_pop, seed=3, vis_years=0, cell_streams=True)
+    sim.simulate(3)
+    sim.save_checkpoint(path)
+    branch = sim.fork(vis_years=0)
+    resumed = BioSim.load_checkpoint(path, vis_years=0)
+    for other in (sim, branch, resumed):
+        other.simulate(5)
+    assert population_state(branch.isle) == population_state(sim.isle)
+    assert population_state(resumed.isle) == population_state(sim.isle)
+
+
+def test_automatic_checkpoint(tmp_path):
+    """Tests that checkpoints are written every checkpoint_years."""
+    path = str(tmp_path / 'auto.npz')
+    sim = BioSim(geogr, ini_pop, seed=4, vis_years=0, checkpoint_file=path,
+                 checkpoint_years=4)
+    sim.simulate(6)
+    assert BioSim.load_checkpoint(path, vis_years=0).year == 4
+
+
+def test_checkpoint_args():
+    """Tests that checkpoint_file without checkpoint_years raises ValueError."""
+    with pytest.raises(ValueError):
+        BioSim(geogr, ini_pop, seed=1, vis_years=0, checkpoint_file='check.npz')
+
+
+def test_fork_reproduces():
+    """Tests that a fork without seed continues exactly like the original simulation."""
+    sim = BioSim(geogr, ini_pop, seed=5, vis_years=0)
+    sim.simulate(5)
+    branch = sim.fork(vis_years=0)
+    assert branch.year == 5
+    sim.simulate(5)
+    branch.simulate(5)
+    assert population_state(branch.isle) == population_state(sim.isle)
+
+
+def test_fork_independent():
+    """Tests that population and parameter changes in a fork do not affect the original."""
+    sim = BioSim(geogr, ini_pop, seed=6, vis_years=0)
+    delta_phi_max = state.get_params()['Carnivore']['DeltaPhiMax']
+    sim.simulate(3)
+    before = population_state(sim.isle)
+    branch = sim.fork(seed=7, vis_years=0)
+    branch.set_animal_parameters('Carnivore', {'DeltaPhiMax': 2.0})
+    branch.add_population([{'loc': (2, 3), 'pop': [{'species': 'Carnivore', 'age': 5,
+                                                    'weight': 20}]}])
+    branch.simulate(3)
+    assert population_state(sim.isle) == before
+    sim.simulate(1)
+    assert state.get_params()['Carnivore']['DeltaPhiMax'] == delta_phi_max
+
+
+def test_class_params_after_construction():
+    """Tests that parameters set on the classes after construction are used by simulate."""
+    sim = BioSim(geogr, ini_pop, seed=6, vis_years=0)
+    params = state.get_params()
+    try:
+        Carnivore.set_params({'DeltaPhiMax': 2.0})
+        sim.simulate(1)
+        assert state.get_params()['Carnivore']['DeltaPhiMax'] == 2.0
+    finally:
+        state.set_params(params)
+
+
+def test_sparse_checkpoint_and_fork(tmp_path):
+    """Tests that sparse simulations stay sparse in forks and checkpoints, and fork exactly."""
+    path = str(tmp_path / 'check.npz')
+    sim = BioSim(geogr, ini_pop, seed=4, vis_years=0, sparse=True)
+    sim.simulate(5)
+    sim.save_checkpoint(path)
+    branch = sim.fork(vis_years=0)
+    dense = sim.fork(vis_years=0, sparse=False)
+    resumed = BioSim.load_checkpoint(path, vis_years=0)
+    assert isinstance(branch.isle.isle_map, SparseCells)
+    assert isinstance(resumed.isle.isle_map, SparseCells)
+    assert not isinstance(dense.isle.isle_map, SparseCells)
+    for other in (sim, branch, dense, resumed):
+        other.simulate(5)
+    for other in (branch, dense, resumed):
+        assert population_state(other.isle) == population_state(sim.isle)
+    parallel = sim.fork(vis_years=0, workers=1)
+    assert parallel.year == 10
+    parallel.isle.close()
+    with pytest.raises(ValueError):
+        BioSim(geogr, ini_pop, seed=4, vis_years=0, sparse=True, workers=2)
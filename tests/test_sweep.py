@@ -0,0 +1,63 @@
+import os
+import textwrap
+
+import numpy as np
+from biosim import sweep, ensemble, state
+
+geogr = """\
+           WWW
+           WLW
+           WWW"""
+geogr = textwrap.dedent(geogr)
+config = {'island_map': geogr,
+          'ini_pop': [{'loc': (2, 2),
+                       'pop': [{'species': 'Herbivore', 'age': 5, 'weight': 20}
+                               for _ in range(20)]}],
+          'num_years': 5}
+
+
+def test_grid():
+    """Tests that the grid holds every combination of values."""
+    points = sweep.grid({'Herbivore.zeta': [3.0, 3.5], 'L.f_max': [700, 800, 900]})
+    assert len(points) == 6
+    assert {'Herbivore.zeta': 3.5, 'L.f_max': 900} in points
+
+
+def test_latin_hypercube():
+    """Tests that every stratum of each parameter range is sampled once."""
+    points = sweep.latin_hypercube({'Carnivore.F': (40, 60), 'Herbivore.xi': (1.0, 2.0)}, 10,
+                                   seed=1)
+    strata = sorted(int((p['Carnivore.F'] - 40) / 2) for p in points)
+    assert strata == list(range(10))
+
+
+def test_point_config():
+    """Tests that point parameters end up in the right configuration groups."""
+    point_cfg = sweep.point_config(config, {'Herbivore.zeta': 3.2, 'L.f_max': 700})
+    assert point_cfg['animal_params'] == {'Herbivore': {'zeta': 3.2}}
+    assert point_cfg['landscape_params'] == {'L': {'f_max': 700}}
+    assert 'animal_params' not in config
+
+
+def test_cache_key_defaults():
+    """Tests that giving a parameter at its default value does not change the key."""
+    default_zeta = state.default_params()['Herbivore']['zeta']
+    point_cfg = sweep.point_config(config, {'Herbivore.zeta': default_zeta})
+    assert sweep.cache_key(point_cfg, 1) == sweep.cache_key(config, 1)
+    assert sweep.cache_key(config, 1) != sweep.cache_key(config, 2)
+
+
+def test_run_cached(tmp_path, mocker):
+    """Tests that results are cached and only missing points are computed."""
+    cache_dir = str(tmp_path / 'cache')
+    points = sweep.grid({'L.f_max': [600.0, 800.0]})
+    first = sweep.run(config, points, [1, 2], cache_dir, workers=1)
+    assert first.shape == (2, 2, 6, 2)
+    assert len(os.listdir(cache_dir)) == 4
+    np.testing.assert_array_equal(first[1, 0], ensemble.run_replicate(
+        sweep.point_config(config, points[1]), 1))
+
+    spy = mocker.spy(sweep, 'run_replicate')
+    extended = sweep.run(config, points + [{'L.f_max': 900.0}], [1, 2], cache_dir, workers=1)
+    assert spy.call_count == 2
+    np.testing.assert_array_equal(extended[:2], first)
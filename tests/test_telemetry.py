@@ -0,0 +1,140 @@
+import json
+import textwrap
+import threading
+
+import pytest
+from biosim.simulation import BioSim
+from biosim.telemetry import METRICS, TelemetryWriter, peak_rss, to_prometheus
+
+geogr = textwrap.dedent("""\
+                        WWWW
+                        WLHW
+                        WWWW""")
+ini_pop = [{'loc': (2, 2),
+            'pop': [{'species': 'Herbivore', 'age': 5, 'weight': 20} for _ in range(20)]
+            + [{'species': 'Carnivore', 'age': 5, 'weight': 20} for _ in range(3)]}]
+
+
+def read_samples(path):
+    """Reads a JSON lines telemetry file."""
+    with open(path) as telemetry:
+        return [json.loads(line) for line in telemetry]
+
+
+def test_record_and_sample(tmp_path):
+    """Tests that samples hold the totals of the recorded years."""
+    counts = iter([10, 30])
+    writer = TelemetryWriter(str(tmp_path / 'telemetry.jsonl'), interval=1e-9,
+                             count_animals=lambda: next(counts))
+    writer.record_year(1, 0.5, 0.25)
+    writer.record_year(2, 0.5)
+    sample = writer.sample()
+    assert set(METRICS) <= set(sample)
+    assert sample['biosim_year'] == 2
+    assert sample['biosim_years_total'] == 2
+    assert sample['biosim_animals'] == 30
+    assert sample['biosim_simulation_seconds_total'] == 1.0
+    assert sample['biosim_graphics_seconds_total'] == 0.25
+    assert writer.sample()['biosim_years_per_second'] == 0
+
+
+def test_prometheus_format(tmp_path):
+    """Tests that the Prometheus file holds help, type and value of every metric."""
+    path = tmp_path / 'biosim.prom'
+    writer = TelemetryWriter(str(path), count_animals=lambda: 10)
+    assert writer.fmt == 'prometheus'
+    writer.record_year(1, 0.5)
+    writer.write()
+    lines = path.read_text().splitlines()
+    values = dict(line.split() for line in lines if not line.startswith('#'))
+    assert values['biosim_animals'] == '10'
+    assert '# TYPE biosim_years_total counter' in lines
+    assert not list(tmp_path.glob('*.tmp'))
+
+
+def test_counts_once_per_interval(tmp_path):
+    """Tests that animals are counted once per interval and when stopping, not every year."""
+    counts = []
+
+    def count_animals():
+        counts.append(10 * (len(counts) + 1))
+        return counts[-1]
+
+    writer = TelemetryWriter(str(tmp_path / 'telemetry.jsonl'), interval=3600,
+                             count_animals=count_animals)
+    writer.start()
+    for year in range(1, 6):
+        writer.record_year(year, 0.1)
+    assert len(counts) == 1
+    assert writer.sample()['biosim_animals'] == 10
+    writer.stop()
+    assert len(counts) == 2
+    assert read_samples(tmp_path / 'telemetry.jsonl')[-1]['biosim_animals'] == 20
+
+
+def test_without_counts(tmp_path):
+    """Tests that the animal metrics are left out without count_animals."""
+    writer = TelemetryWriter(str(tmp_path / 'biosim.prom'))
+    writer.record_year(1, 0.5)
+    sample = writer.sample()
+    assert sample['biosim_animals'] is None
+    assert 'biosim_animals' not in to_prometheus(sample)
+
+
+def test_prometheus_skips_missing():
+    """Tests that metrics without a value are left out."""
+    text = to_prometheus({'biosim_peak_rss_bytes': None, 'biosim_year': 3})
+    assert 'biosim_peak_rss_bytes' not in text
+
+
+def test_prometheus_keeps_digits():
+    """Tests that large counts and byte values are written with all digits."""
+    text = to_prometheus({'biosim_year': 1234567, 'biosim_peak_rss_bytes': 987654321,
+                          'biosim_simulation_seconds_total': 1234567.125})
+    values = dict(line.split() for line in text.splitlines() if not line.startswith('#'))
+    assert values['biosim_year'] == '1234567'
+    assert values['biosim_peak_rss_bytes'] == '987654321'
+    assert float(values['biosim_simulation_seconds_total']) == 1234567.125
+
+
+def test_peak_rss():
+    """Tests that the peak memory is plausible where it is available."""
+    rss = peak_rss()
+    assert rss is None or rss > 1024 ** 2
+
+
+def test_invalid_arguments(tmp_path):
+    """Tests that invalid intervals and formats raise ValueError."""
+    with pytest.raises(ValueError):
+        TelemetryWriter(str(tmp_path / 'telemetry.jsonl'), interval=0)
+    with pytest.raises(ValueError):
+        TelemetryWriter(str(tmp_path / 'telemetry.jsonl'), fmt='csv')
+
+
+def test_timer_thread(tmp_path):
+    """Tests that samples are written while running and once more when stopped."""
+    path = tmp_path / 'telemetry.jsonl'
+    writer = TelemetryWriter(str(path), interval=0.01)
+    writer.start()
+    writer.record_year(1, 0.1)
+    while not path.exists():
+        threading.Event().wait(0.01)
+    writer.stop()
+    samples = read_samples(path)
+    assert len(samples) >= 2
+    assert samples[-1]['biosim_years_total'] == 1
+    assert not any(thread.name == 'biosim-telemetry' for thread in threading.enumerate())
+
+
+@pytest.mark.parametrize('timing', [False, True])
+def test_simulate_telemetry(tmp_path, timing):
+    """Tests that simulate writes telemetry and stops the thread when it returns."""
+    path = tmp_path / 'telemetry.jsonl'
+    sim = BioSim(geogr, ini_pop, seed=1, vis_years=0, telemetry_file=str(path), timing=timing)
+    sim.simulate(5)
+    sim.simulate(3)
+    samples = read_samples(path)
+    assert [sample['biosim_year'] for sample in samples][-1] == 8
+    assert samples[-1]['biosim_animals'] == sim.num_animals
+    assert samples[-1]['biosim_simulation_seconds_total'] > 0
+    assert not any(thread.name == 'biosim-telemetry' for thread in threading.enumerate())
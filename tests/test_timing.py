@@ -0,0 +1,78 @@
+import textwrap
+
+import matplotlib.pyplot as plt
+import pytest
+from biosim.island import Island
+from biosim.simulation import BioSim
+from biosim.timing import PhaseTimer
+
+geogr = """\
+           WWWWW
+           WLHDW
+           WLLLW
+           WWWWW"""
+geogr = textwrap.dedent(geogr)
+ini_pop = [{'loc': loc,
+            'pop': [{'species': 'Herbivore', 'age': 5, 'weight': 20} for _ in range(20)]
+            + [{'species': 'Carnivore', 'age': 5, 'weight': 20} for _ in range(4)]}
+           for loc in [(2, 2), (2, 3), (2, 4)]]
+
+
+def test_add_and_totals():
+    """Tests that times and calls are summed per phase and year."""
+    timer = PhaseTimer()
+    timer.start_year(1)
+    timer.add('mating', 0.5)
+    timer.add('mating', 0.25)
+    timer.start_year(2)
+    timer.start_year(2)
+    timer.add('dying', 1.0)
+    assert timer.years == [1, 2]
+    assert timer.times('mating').tolist() == [0.75, 0.0]
+    assert timer.calls('mating').tolist() == [2, 0]
+    assert timer.totals() == {'mating': 0.75, 'dying': 1.0}
+
+
+def test_island_phases():
+    """Tests that a timed island records every phase once per habitable cell and year."""
+    isle = Island(geogr, ini_pop)
+    isle.timer = PhaseTimer(by_cell_type=True)
+    for _ in range(3):
+        isle.season()
+    timer = isle.timer
+    assert timer.years == [1, 2, 3]
+    assert timer.calls('feeding_herbs').tolist() == [6, 6, 6]
+    assert timer.calls('migration').tolist() == [1, 1, 1]
+    assert timer.calls('feeding_herbs', 'Lowland').tolist() == [4, 4, 4]
+    assert timer.cell_types == ['Desert', 'Highland', 'Lowland']
+    assert all(timer.times('season') >= timer.times('feeding_carnivores'))
+
+
+@pytest.mark.parametrize('engine', [{}, {'fast': True}, {'cell_streams': True}])
+def test_same_result(engine):
+    """Tests that timing does not change the simulation."""
+    results = []
+    for timing in (False, True):
+        sim = BioSim(geogr, ini_pop, seed=4, vis_years=0, timing=timing, **engine)
+        sim.simulate(5)
+        results.append(sim.isle.get_herb_weight() + sim.isle.get_carn_weight())
+    assert results[0] == results[1]
+
+
+def test_biosim_steps(tmp_path):
+    """Tests that BioSim records logging and graphics outside the season."""
+    sim = BioSim(geogr, ini_pop, seed=4, vis_years=1, timing=True, img_dir=str(tmp_path),
+                 img_base='timing', log_file=str(tmp_path / 'log.csv'))
+    sim.simulate(2)
+    for phase in ('season', 'logging', 'graphics_update', 'graphics_save'):
+        assert sim.timer.calls(phase).tolist() == [1, 1]
+    assert 'graphics_save' in sim.timer.summary()
+    assert sim.timer.to_dict()['years'] == [1, 2]
+    plt.close('all')
+
+
+def test_disabled():
+    """Tests that no timer is attached by default."""
+    sim = BioSim(geogr, ini_pop, seed=4, vis_years=0)
+    assert sim.timer is None
+    assert sim.isle.timer is None
@@ -0,0 +1,77 @@
+import random
+import textwrap
+
+import numpy as np
+import scipy.stats as stats
+import pytest
+from biosim.vectorized import ReplicateIsland, fitness
+from biosim.island import Island
+from biosim.animal import Herbivore
+
+alpha = 0.01
+geogr = """\
+           WWW
+           WLW
+           WWW"""
+geogr = textwrap.dedent(geogr)
+ini_herbs = [{'loc': (2, 2),
+              'pop': [{'species': 'Herbivore', 'age': 5, 'weight': 20} for _ in range(50)]}]
+ini_carns = [{'loc': (2, 2),
+              'pop': [{'species': 'Carnivore', 'age': 5, 'weight': 20} for _ in range(20)]}]
+
+
+def test_fitness_matches_animal():
+    """Tests that the vectorized fitness equals the fitness of Animal instances."""
+    ages = np.array([0, 5, 40, 80])
+    weights = np.array([0.0, 8.0, 20.0, 35.0])
+    expected = [Herbivore(w, a).fitness for a, w in zip(ages.tolist(), weights.tolist())]
+    assert fitness(Herbivore, ages, weights) == pytest.approx(expected)
+
+
+def test_replicated_population():
+    """Tests that the initial population is placed in every replicate."""
+    isle = ReplicateIsland(geogr, ini_herbs + ini_carns, num_replicates=4, seed=1)
+    assert isle.total_herb_count().tolist() == [50] * 4
+    assert isle.carn_distribution()[:, 1, 1].tolist() == [20] * 4
+
+
+def test_reproducible():
+    """Tests that the same seed gives the same counts."""
+    counts = [ReplicateIsland(geogr, ini_herbs + ini_carns, 5, seed=2).simulate(10)
+              for _ in range(2)]
+    np.testing.assert_array_equal(counts[0], counts[1])
+
+
+def test_desert_no_fodder():
+    """Tests that herbivores in a Desert cell do not gain weight from feeding."""
+    isle = ReplicateIsland("WWW\nWDW\nWWW", [{'loc': (2, 2), 'pop': ini_herbs[0]['pop']}], 2)
+    isle.feeding_herbs()
+    assert np.all(isle.herbs.weight == 20)
+
+
+def test_no_migration_into_water():
+    """Tests that animals on a single-cell island stay in their cell."""
+    isle = ReplicateIsland(geogr, ini_herbs, 3, seed=3)
+    isle.herbs.fitness[:] = 1.0
+    isle.handle_migration()
+    assert np.all(isle.herbs.cell == 4)
+
+
+def test_same_model_as_island():
+    """
+    Statistical test comparing herbivore counts after 20 years with the object engine, using
+    Welch's t-test.
+
+    H0: Both engines give the same mean number of herbivores.
+    """
+    isle = ReplicateIsland(geogr, ini_herbs, num_replicates=200, seed=4)
+    vec_counts = isle.simulate(20)[:, -1, 0]
+    obj_counts = []
+    for seed in range(30):
+        random.seed(seed)
+        reference = Island(geogr, ini_herbs)
+        for _ in range(20):
+            reference.season()
+        obj_counts.append(reference.total_herb_count())
+    _, p = stats.ttest_ind(vec_counts, obj_counts, equal_var=False)
+    assert p > alpha